@@ -0,0 +1,124 @@
+import asyncio
+from dataclasses import dataclass, field
+from functools import cached_property
+import hashlib
+from io import BytesIO
+import logging
+import time
+from typing import Dict, Tuple
+
+from fastapi import UploadFile
+from openai import OpenAI
+
+from app import metrics
+from app.constants import OPENAI_FILE_CACHE_MAX_SIZE, OPENAI_FILE_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AttachmentBuffer:
+    """
+    Contents of an attachment, read from the uploaded file exactly once and shared by the storage upload and GroupGPT.
+    """
+    filename: str
+    content_type: str
+    content: bytes = field(repr=False)
+
+
+    @classmethod
+    async def from_upload(cls, upload: UploadFile) -> "AttachmentBuffer":
+        await upload.seek(0)  # Reset file pointer to beginning
+        return cls(filename=upload.filename, content_type=upload.content_type, content=await upload.read())
+
+
+    @cached_property
+    def sha256(self) -> str:
+        return hashlib.sha256(self.content).hexdigest()
+
+
+    def open(self) -> BytesIO:
+        """Returns a new stream over the contents, e.g., for a request body."""
+        stream = BytesIO(self.content)
+        stream.name = self.filename
+        return stream
+
+
+class OpenAIFileCache:
+    """
+    Maps the SHA-256 of attachment contents to files already uploaded to OpenAI, so that the same PDF is uploaded once.
+
+    Files unused for `OPENAI_FILE_CACHE_TTL_SECONDS`, or evicted once more than `OPENAI_FILE_CACHE_MAX_SIZE` files are
+    cached, are deleted from OpenAI. All remaining files are deleted on shutdown, since the mapping is not persisted.
+    """
+    def __init__(self, client: OpenAI):
+        self.client = client
+        self._files: Dict[str, Tuple[str, float]] = {}  # SHA-256 -> (file ID, last used), in order of last use
+        self._uploads: Dict[str, asyncio.Task] = {}  # In-flight uploads, by SHA-256
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+
+    async def get_file_id(self, attachment: AttachmentBuffer) -> str:
+        """Returns the OpenAI file ID of the attachment, uploading it if it has not been uploaded before."""
+        await self._delete_stale_files()
+
+        sha256 = attachment.sha256
+        if sha256 in self._files:
+            file_id, _ = self._files.pop(sha256)
+            self._files[sha256] = (file_id, time.monotonic())
+            metrics.increment("openai_file_cache_hits_total")
+            return file_id
+
+        metrics.increment("openai_file_cache_misses_total")
+
+        # Concurrent jobs attaching the same file share a single upload
+        if sha256 not in self._uploads:
+            self._uploads[sha256] = asyncio.create_task(self._upload(attachment))
+        try:
+            file_id = await asyncio.shield(self._uploads[sha256])
+        finally:
+            self._uploads.pop(sha256, None)
+
+        self._files[sha256] = (file_id, time.monotonic())
+        return file_id
+
+
+    async def _upload(self, attachment: AttachmentBuffer) -> str:
+        start_time = time.perf_counter()
+        uploaded = await asyncio.to_thread(
+            self.client.files.create,
+            file=attachment.open(),
+            purpose="assistants"
+        )
+        self.logger.debug(f"Uploaded {attachment.filename} ({len(attachment.content)} bytes) to OpenAI as {uploaded.id} in {time.perf_counter() - start_time:.2f}s")
+        return uploaded.id
+
+
+    async def _delete_stale_files(self) -> None:
+        # Files are ordered by last use, so expired and evicted files are always at the front
+        now = time.monotonic()
+        num_expired = 0
+        for _, last_used in self._files.values():
+            if now - last_used <= OPENAI_FILE_CACHE_TTL_SECONDS:
+                break
+            num_expired += 1
+
+        num_stale = max(num_expired, len(self._files) - OPENAI_FILE_CACHE_MAX_SIZE)
+        for sha256 in list(self._files)[:num_stale]:
+            file_id, _ = self._files.pop(sha256)
+            await self._delete_file(file_id)
+
+
+    async def _delete_file(self, file_id: str) -> None:
+        try:
+            await asyncio.to_thread(self.client.files.delete, file_id)
+            metrics.increment("openai_files_deleted_total")
+        except Exception as e:
+            self.logger.warning(f"Failed to delete OpenAI file {file_id}: {e}")
+
+
+    async def close(self) -> None:
+        """Deletes all cached files from OpenAI. Called on application shutdown."""
+        file_ids = [file_id for file_id, _ in self._files.values()]
+        self._files.clear()
+        await asyncio.gather(*[self._delete_file(file_id) for file_id in file_ids])
@@ -0,0 +1,139 @@
+import logging
+from threading import Lock
+from typing import Optional, Tuple
+
+from cachetools import TTLCache
+import jwt
+
+from app.constants import (
+    JWT_AUDIENCE,
+    JWT_LEEWAY_SECONDS,
+    USER_CACHE_MAX_SIZE,
+    USER_CACHE_TTL_SECONDS
+)
+from app.dependencies import get_async_supabase, get_settings
+
+logger = logging.getLogger(__name__)
+
+# auth_id -> (user_id, username)
+_user_cache: TTLCache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+_user_cache_lock = Lock()
+
+
+class AuthError(Exception):
+    """Raised when a request cannot be authenticated."""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def verify_token_locally(token: str) -> str:
+    """
+    Validates a Supabase-issued JWT against the project's JWT secret without any network calls.
+
+    Args:
+        token (str): The access token supplied by the client.
+
+    Returns:
+        str: The auth ID (`sub` claim) of the authenticated user.
+    """
+    settings = get_settings()
+    try:
+        claims = jwt.decode(
+            token,
+            settings.SUPABASE_JWT_SECRET_KEY,
+            algorithms=["HS256"],
+            audience=JWT_AUDIENCE,
+            leeway=JWT_LEEWAY_SECONDS,
+            options={"require": ["exp", "sub"]}
+        )
+    except jwt.ExpiredSignatureError:
+        raise AuthError(401, "Token has expired")
+    except jwt.InvalidTokenError as e:
+        logger.debug(f"Local JWT validation failed: {e}")
+        raise AuthError(401, "Invalid token")
+
+    return claims["sub"]
+
+
+async def verify_token_remotely(token: str) -> str:
+    """
+    Validates a JWT by calling the Supabase Auth server.
+
+    Args:
+        token (str): The access token supplied by the client.
+
+    Returns:
+        str: The auth ID of the authenticated user.
+    """
+    try:
+        supabase = get_async_supabase()
+        auth_user_response = await supabase.auth.get_user(token)
+        return auth_user_response.user.id
+    except Exception as e:
+        raise AuthError(401, e.detail if hasattr(e, 'detail') else "Invalid token")
+
+
+def get_cached_user(auth_id: str) -> Optional[Tuple[str, str]]:
+    with _user_cache_lock:
+        return _user_cache.get(auth_id)
+
+
+def cache_user(auth_id: str, user_id: str, username: str) -> None:
+    with _user_cache_lock:
+        _user_cache[auth_id] = (user_id, username)
+
+
+def invalidate_user(auth_id: str) -> None:
+    """Removes a user from the auth lookup cache, e.g., after the user has been deleted."""
+    with _user_cache_lock:
+        _user_cache.pop(auth_id, None)
+
+
+async def resolve_user(auth_id: str) -> Tuple[str, str]:
+    """
+    Maps an auth ID to the corresponding (user_id, username) in the users table, going through the cache first.
+
+    Args:
+        auth_id (str): The auth ID of the authenticated user.
+
+    Returns:
+        Tuple[str, str]: The user ID and username of the user.
+    """
+    cached_user = get_cached_user(auth_id)
+    if cached_user is not None:
+        return cached_user
+
+    try:
+        supabase = get_async_supabase()
+        user_response = await (
+            supabase
+            .from_("users")
+            .select("user_id, username")
+            .eq("auth_id", auth_id)
+            .execute()
+        )
+        user_id = user_response.data[0]["user_id"]
+        username = user_response.data[0]["username"]
+    except Exception:
+        raise AuthError(404, "User not found")
+
+    cache_user(auth_id, user_id, username)
+    return user_id, username
+
+
+async def authenticate(token: str) -> Tuple[str, str]:
+    """
+    Authenticates a bearer token and returns the (user_id, username) of its owner.
+
+    When local JWT verification is enabled and the user is cached, no network calls are made.
+    """
+    settings = get_settings()
+
+    if settings.SUPABASE_JWT_VERIFY_LOCALLY:
+        auth_id = verify_token_locally(token)
+    else:
+        auth_id = await verify_token_remotely(token)
+
+    return await resolve_user(auth_id)
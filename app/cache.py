@@ -0,0 +1,151 @@
+import asyncio
+from collections import defaultdict
+import logging
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from cachetools import TTLCache
+from supabase import AsyncClient
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Namespaces of cached reads, each scoped by a user or chatroom ID
+USER_CHATROOMS = "user_chatrooms"
+CHATROOM = "chatroom"
+CHATROOM_DOCUMENTS = "chatroom_documents"
+CHATROOM_MESSAGES = "chatroom_messages"
+
+# Namespaces invalidated by Realtime changes to each table, with the column holding the scope (None for the whole namespace)
+REALTIME_INVALIDATIONS = {
+    "messages": [(CHATROOM_MESSAGES, "chatroom_id")],
+    "documents": [(CHATROOM_DOCUMENTS, "chatroom_id")],
+    "chatrooms": [(CHATROOM, "chatroom_id"), (USER_CHATROOMS, None)],
+    "members": [(USER_CHATROOMS, "user_id")]
+}
+
+
+class ReadCache:
+    """
+    In-process read-through cache for the results of read endpoints, with TTL expiry and LRU eviction.
+
+    Entries are keyed by `(namespace, scope, params)`, e.g., `(CHATROOM_MESSAGES, chatroom_id, (limit, before))`,
+    so that a write can invalidate everything cached for a chatroom or user at once. The cache is safe to use from
+    worker threads (e.g., document pipelines running as background tasks).
+
+    Invalidations are stamped with a global, monotonic generation. A read-through takes the current `generation`
+    before reading from the database and passes it to `set`, which skips the write if its scope (or namespace) was
+    invalidated since, so that a result read before a concurrent write is not cached after it. Only the latest
+    invalidations are remembered; forgetting older ones raises the generation a write must be newer than, so a write
+    may be skipped needlessly, but a stale one is never accepted.
+    """
+    def __init__(self, max_size: int, ttl: float):
+        self._entries: TTLCache = TTLCache(maxsize=max_size, ttl=ttl)
+        self._generation = 0
+        # (namespace, scope or None) -> generation of its latest invalidation, oldest first
+        self._invalidated_at: Dict[Tuple[str, Optional[str]], int] = {}
+        self._max_invalidations = max_size
+        self._forgotten_up_to = 0  # Latest generation of invalidations no longer remembered
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._misses: Dict[str, int] = defaultdict(int)
+        self._lock = Lock()
+
+
+    def get(self, namespace: str, scope: str, params: Tuple[Hashable, ...] = ()) -> Optional[Any]:
+        """Returns the cached value, or None if there is none."""
+        with self._lock:
+            value = self._entries.get((namespace, scope, params))
+            if value is None:
+                self._misses[namespace] += 1
+            else:
+                self._hits[namespace] += 1
+
+        metrics.increment("read_cache_hits_total" if value is not None else "read_cache_misses_total")
+        return value
+
+
+    def generation(self) -> int:
+        """Returns the current generation, to be passed to `set` when caching a value read after this call."""
+        with self._lock:
+            return self._generation
+
+
+    def set(self, namespace: str, scope: str, value: Any, params: Tuple[Hashable, ...] = (), *, generation: int) -> None:
+        """Caches the value unless the scope has been invalidated since its `generation` was taken."""
+        with self._lock:
+            is_stale = max(
+                self._forgotten_up_to,
+                self._invalidated_at.get((namespace, None), 0),
+                self._invalidated_at.get((namespace, scope), 0)
+            ) > generation
+            if not is_stale:
+                self._entries[(namespace, scope, params)] = value
+
+        if is_stale:
+            metrics.increment("read_cache_stale_writes_total")
+
+
+    def invalidate(self, namespace: str, scope: Optional[str] = None) -> None:
+        """Drops the cached values of a scope within a namespace, or of the whole namespace if no scope is given."""
+        with self._lock:
+            self._generation += 1
+            self._invalidated_at.pop((namespace, scope), None)  # Re-inserted last, keeping the oldest first
+            self._invalidated_at[(namespace, scope)] = self._generation
+            while len(self._invalidated_at) > self._max_invalidations:
+                oldest_key = next(iter(self._invalidated_at))
+                self._forgotten_up_to = self._invalidated_at.pop(oldest_key)
+            stale_keys = [
+                key for key in list(self._entries.keys())
+                if key[0] == namespace and (scope is None or key[1] == scope)
+            ]
+            for key in stale_keys:
+                self._entries.pop(key, None)
+
+        if stale_keys:
+            metrics.increment("read_cache_invalidations_total", len(stale_keys))
+
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._invalidated_at.clear()
+            self._forgotten_up_to = self._generation
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self._entries.maxsize,
+                "ttl_seconds": self._entries.ttl,
+                "hits": dict(self._hits),
+                "misses": dict(self._misses)
+            }
+
+
+async def subscribe_to_invalidations(cache: ReadCache, supabase: AsyncClient) -> asyncio.Task:
+    """
+    Invalidates cached reads whenever the underlying tables change, including changes not made through this process
+    (e.g., by other workers or directly in the database). Requires Realtime to be enabled for the tables.
+
+    Returns the task listening to Realtime messages, which should be cancelled on shutdown.
+    """
+    def on_change(payload: Dict[str, Any]) -> None:
+        data = payload.get("data", payload)
+        # Delete events only carry the primary key unless the table's replica identity is FULL
+        record = data.get("record") or data.get("old_record") or {}
+
+        for namespace, column in REALTIME_INVALIDATIONS.get(data.get("table"), []):
+            cache.invalidate(namespace, record.get(column) if column else None)
+
+    await supabase.realtime.connect()
+
+    channel = supabase.channel("read-cache-invalidation")
+    for table in REALTIME_INVALIDATIONS:
+        channel.on_postgres_changes("*", table=table, callback=on_change)
+    await channel.subscribe()
+
+    logger.info(f"Subscribed to Realtime changes of {', '.join(REALTIME_INVALIDATIONS)} for read cache invalidation")
+    return asyncio.create_task(supabase.realtime.listen())
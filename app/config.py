@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -13,8 +15,47 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_SERVICE_ROLE_KEY: str
     SUPABASE_JWT_SECRET_KEY: str
+    SUPABASE_JWT_VERIFY_LOCALLY: bool = True  # Validate JWTs with the secret key instead of calling Supabase Auth
+
+    # Connection pool of the async Supabase client
+    SUPABASE_HTTP_MAX_CONNECTIONS: int = 100
+    SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    SUPABASE_HTTP_TIMEOUT_SECONDS: float = 30.0
+    SUPABASE_HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    SUPABASE_HTTP_CONNECT_RETRIES: int = 2
+
+    # In-process cache of read endpoint results
+    READ_CACHE_MAX_SIZE: int = 2048
+    READ_CACHE_TTL_SECONDS: float = 30.0
+    READ_CACHE_REALTIME_INVALIDATION: bool = False  # Also invalidate on Realtime changes, e.g., when running multiple workers
+
+    # Embeddings API, shared by document pipelines and chunk retrieval
+    OPENAI_EMBEDDINGS_BASE_URL: str | None = None  # E.g., a local fake embedding server for testing
+    EMBEDDING_REQUESTS_PER_MINUTE: int = 3_000
+    EMBEDDING_TOKENS_PER_MINUTE: int = 1_000_000
+
+    # Local cache of chunk embeddings, shared by all workers on the same host
+    EMBEDDING_CACHE_PATH: str = "cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_SIZE_MB: int = 512
+
+    # Chunk retrieval: hybrid_search in Supabase, or in-process over local shards of each chatroom's chunks
+    RETRIEVAL_BACKEND: Literal["supabase", "local"] = "supabase"
+    LOCAL_INDEX_PATH: str = "cache/local_index"
+    # Optional reranking of over-fetched chunk retrieval candidates; "cross-encoder" requires sentence-transformers
+    RERANKER: Literal["none", "lexical", "cross-encoder"] = "none"
+    RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+    METRICS_ADMIN_USER_IDS: list[str] = []  # Users allowed to read /api/metrics (JSON list of user IDs); nobody if empty
+
+    POSTGREST_PASSTHROUGH_RESPONSES: bool = False  # Stream list endpoints' PostgREST response bodies to clients without decoding them
 
     GROUPGPT_USER_ID: str
+    GROUPGPT_MAX_CONCURRENT_JOBS: int = 4  # Max. number of GroupGPT invocations running at the same time
+    GROUPGPT_MAX_PENDING_JOBS: int = 100  # Max. number of queued and running GroupGPT invocations before rejecting with 429
+    GROUPGPT_HISTORY_MAX_TOKENS: int = 32_000  # Max. number of tokens of chat history sent to the LLM, regardless of its context window
+    GROUPGPT_HISTORY_RECENT_TOKENS: int = 8_000  # Most recent tokens of chat history that are never replaced by the summary
+    GROUPGPT_STREAM_RESPONSES: bool = False  # Stream responses into the chatroom; requires clients to listen to UPDATE events on messages
 
     ANTHROPIC_API_KEY: str
     GEMINI_API_KEY: str
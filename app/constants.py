@@ -2,6 +2,43 @@
 DEFAULT_CHUNK_SIZE = 1024
 DEFAULT_CHUNK_OVERLAP = 200
 EMBEDDING_MODEL_NAME = "text-embedding-ada-002"
+EMBEDDING_MAX_INPUT_TOKENS = 8191  # Max. number of tokens per input of the embedding model; longer texts are split
+
+# Embedding service
+EMBEDDING_BATCH_MAX_INPUTS = 2048  # Max. number of inputs per embeddings request accepted by the OpenAI API
+EMBEDDING_BATCH_MAX_TOKENS = 300_000  # Max. number of tokens per embeddings request accepted by the OpenAI API
+EMBEDDING_BATCH_MIN_TOKENS = 2_000
+EMBEDDING_BATCH_INITIAL_TOKENS = 32_000
+EMBEDDING_BATCH_TARGET_LATENCY_SECONDS = 2.0  # Batches are shrunk once requests take longer than this
+EMBEDDING_BATCH_LINGER_MS = 20  # How long a batch waits for concurrent requests to join it
+EMBEDDING_MAX_CONCURRENT_BATCHES = 4
+EMBEDDING_MAX_RETRIES = 5
+EMBEDDING_RETRY_BASE_DELAY_SECONDS = 0.5
+EMBEDDING_RETRY_MAX_DELAY_SECONDS = 30
+EMBEDDING_REQUEST_TIMEOUT_SECONDS = 60
+EMBEDDING_RESULT_TIMEOUT_SECONDS = 600  # Max. time to wait for all embeddings of a submission, including queueing and retries
+
+# Query embeddings of the chunk retriever
+QUERY_EMBEDDING_CACHE_MAX_SIZE = 4096  # About 25 MB of float32 vectors with 1536 dimensions
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = 3600
+
+# Chunk retrieval (hybrid_search)
+HYBRID_SEARCH_RRF_K = 60
+HYBRID_SEARCH_VECTOR_WEIGHT = 1.0
+HYBRID_SEARCH_TEXT_WEIGHT = 1.0
+HYBRID_SEARCH_EF_SEARCH = 40  # HNSW candidate list size; raise for better recall in large knowledge bases
+HYBRID_SEARCH_QUANTIZATION = "halfvec"  # Index searched for vector candidates: "halfvec" or "binary"
+HYBRID_SEARCH_RERANK_FACTOR = 10  # Candidates per result found through the compact index, reranked on full precision
+LOCAL_INDEX_MAX_LOADED_CHATROOMS = 64  # Chatrooms whose contents and BM25 index are kept in memory by the local backend
+RETRIEVAL_CACHE_MAX_SIZE = 4096
+RETRIEVAL_CACHE_TTL_SECONDS = 600  # Bounds staleness when another worker changes a knowledge base
+
+# Reranking of chunk retrieval candidates (RERANKER setting)
+RERANK_CANDIDATE_FACTOR = 4  # Candidates fetched per requested chunk
+RERANK_MAX_CANDIDATES = 40
+RERANK_MIN_RELATIVE_SCORE = 0.6  # Chunks scoring below this fraction of the best chunk's score are dropped
+RERANK_LEXICAL_PRIOR_WEIGHT = 0.4  # Weight of the RRF score, which carries the semantic matches the lexical scorer misses
+RERANK_CROSS_ENCODER_PRIOR_WEIGHT = 0.1
 
 MAX_FILE_SIZE_MB = 5
 MAX_WORKERS = 5
@@ -10,3 +47,53 @@ MIN_USERNAME_LENGTH = 2
 MAX_USERNAME_LENGTH = 20
 
 GEMINI_25_MAX_INPUT_TOKENS = 1_048_576
+
+# Context window sizes (in tokens) of the chat models in app/llms.py
+MODEL_MAX_INPUT_TOKENS = {
+    "claude-3-5-haiku-20241022": 200_000,
+    "claude-3-5-sonnet-20241022": 200_000,
+    "claude-3-7-sonnet-20250219": 200_000,
+    "gemini-2.5-flash": GEMINI_25_MAX_INPUT_TOKENS,
+    "gemini-2.5-pro": GEMINI_25_MAX_INPUT_TOKENS,
+    "gpt-4.1-nano": 1_047_576,
+    "gpt-4.1-mini": 1_047_576,
+    "gpt-4o-mini": 128_000
+}
+
+# Authentication
+JWT_AUDIENCE = "authenticated"
+JWT_LEEWAY_SECONDS = 10
+USER_CACHE_MAX_SIZE = 1024
+USER_CACHE_TTL_SECONDS = 300
+
+# GroupGPT job queue
+FINISHED_JOBS_MAX_SIZE = 1024
+FINISHED_JOBS_TTL_SECONDS = 3600
+
+# GroupGPT tool calls
+TOOL_CALL_MAX_CONCURRENCY = 8
+TOOL_CALL_TIMEOUT_SECONDS = 30
+PYTHON_REPL_TIMEOUT_SECONDS = 20  # Below the tool call timeout, so that the model gets the REPL's own error
+
+# GroupGPT response streaming
+STREAM_FLUSH_EVERY_N_TOKENS = 20
+STREAM_FLUSH_INTERVAL_MS = 300
+STREAM_PLACEHOLDER_CONTENT = "..."
+
+# Message attachments
+ATTACHMENT_UPLOAD_MAX_CONCURRENCY = 4
+OPENAI_FILE_CACHE_MAX_SIZE = 256
+OPENAI_FILE_CACHE_TTL_SECONDS = 24 * 3600
+
+# Message pagination
+MESSAGES_PAGE_DEFAULT_SIZE = 50
+MESSAGES_PAGE_MAX_SIZE = 200
+
+# GroupGPT chat history
+HISTORY_CONTEXT_FRACTION = 0.8  # Set aside 20% of the context window for subsequent tool calls and responses
+HISTORY_CHARS_PER_TOKEN = 4  # Same approximation as `count_tokens_approximately`
+HISTORY_SUMMARY_MIN_NEW_TOKENS = 2_000  # Min. number of unsummarized tokens before the summary is updated
+HISTORY_SUMMARY_MAX_WORDS = 400
+HISTORY_CACHE_MAX_CHATROOMS = 256
+HISTORY_CACHE_TTL_SECONDS = 1800  # Bounds staleness after messages are deleted through another worker
+HISTORY_CURSOR_OVERLAP_SECONDS = 30  # Messages committed up to this long after their sent_at are still picked up
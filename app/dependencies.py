@@ -1,8 +1,26 @@
 from functools import lru_cache
 
-from supabase import create_client, Client
+import httpx
+from openai import OpenAI
+from supabase import AsyncClientOptions, create_client, Client
 
+from app.cache import ReadCache
 from app.config import Settings
+from app.constants import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_REQUEST_TIMEOUT_SECONDS,
+    LOCAL_INDEX_MAX_LOADED_CHATROOMS,
+    QUERY_EMBEDDING_CACHE_MAX_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    RERANK_CROSS_ENCODER_PRIOR_WEIGHT,
+    RERANK_LEXICAL_PRIOR_WEIGHT,
+    RERANK_MIN_RELATIVE_SCORE,
+    RETRIEVAL_CACHE_MAX_SIZE,
+    RETRIEVAL_CACHE_TTL_SECONDS
+)
+from app.embeddings import EmbeddingCache, EmbeddingService, QueryEmbeddingCache
+from app.retrieval import CrossEncoderReranker, LexicalReranker, LocalChunkIndex, Reranker, RetrievalCache
+from app.supabase_client import PooledAsyncClient
 
 
 @lru_cache
@@ -16,3 +34,109 @@ def get_supabase() -> Client:
 
     supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
     return supabase
+
+
+@lru_cache
+def get_async_supabase() -> PooledAsyncClient:
+    """
+    Returns the async Supabase client of the routers. Its PostgREST client keeps a connection pool (HTTP/2, keep-alive)
+    with the configured limits; Auth and Storage use their clients' default pools.
+    """
+    settings = get_settings()
+    timeout = httpx.Timeout(
+        settings.SUPABASE_HTTP_TIMEOUT_SECONDS,
+        connect=settings.SUPABASE_HTTP_CONNECT_TIMEOUT_SECONDS
+    )
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=settings.SUPABASE_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECONDS
+        ),
+        retries=settings.SUPABASE_HTTP_CONNECT_RETRIES
+    )
+
+    return PooledAsyncClient(
+        settings.SUPABASE_URL,
+        settings.SUPABASE_SERVICE_ROLE_KEY,
+        AsyncClientOptions(
+            postgrest_client_timeout=timeout,
+            storage_client_timeout=timeout
+        ),
+        transport=transport
+    )
+
+
+async def close_async_supabase() -> None:
+    """Closes the async Supabase client's HTTP connections. Called on application shutdown."""
+    if get_async_supabase.cache_info().currsize > 0:
+        await get_async_supabase().aclose()
+
+
+@lru_cache
+def get_read_cache() -> ReadCache:
+    settings = get_settings()
+    return ReadCache(max_size=settings.READ_CACHE_MAX_SIZE, ttl=settings.READ_CACHE_TTL_SECONDS)
+
+
+@lru_cache
+def get_embedding_cache() -> EmbeddingCache:
+    settings = get_settings()
+    return EmbeddingCache(path=settings.EMBEDDING_CACHE_PATH, max_size_bytes=settings.EMBEDDING_CACHE_MAX_SIZE_MB * 1_000_000)
+
+
+@lru_cache
+def get_embedding_service() -> EmbeddingService:
+    settings = get_settings()
+
+    # Retries are handled by the service, which also backs off the batches running concurrently
+    client = OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_EMBEDDINGS_BASE_URL,
+        timeout=EMBEDDING_REQUEST_TIMEOUT_SECONDS,
+        max_retries=0
+    )
+    return EmbeddingService(
+        client,
+        model=EMBEDDING_MODEL_NAME,
+        requests_per_minute=settings.EMBEDDING_REQUESTS_PER_MINUTE,
+        tokens_per_minute=settings.EMBEDDING_TOKENS_PER_MINUTE
+    )
+
+
+def close_embedding_service() -> None:
+    """Embeds all queued texts and stops the embedding service. Called on application shutdown."""
+    if get_embedding_service.cache_info().currsize > 0:
+        get_embedding_service().close()
+
+
+@lru_cache
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    return QueryEmbeddingCache(max_size=QUERY_EMBEDDING_CACHE_MAX_SIZE, ttl=QUERY_EMBEDDING_CACHE_TTL_SECONDS)
+
+
+@lru_cache
+def get_retrieval_cache() -> RetrievalCache:
+    return RetrievalCache(max_size=RETRIEVAL_CACHE_MAX_SIZE, ttl=RETRIEVAL_CACHE_TTL_SECONDS)
+
+
+@lru_cache
+def get_local_index() -> LocalChunkIndex:
+    settings = get_settings()
+    return LocalChunkIndex(root=settings.LOCAL_INDEX_PATH, supabase=get_supabase(), max_loaded_chatrooms=LOCAL_INDEX_MAX_LOADED_CHATROOMS)
+
+
+@lru_cache
+def get_reranker() -> Reranker | None:
+    """Returns the reranker of chunk retrieval candidates, or None if reranking is disabled."""
+    settings = get_settings()
+    if settings.RERANKER == "lexical":
+        return LexicalReranker(prior_weight=RERANK_LEXICAL_PRIOR_WEIGHT, min_relative_score=RERANK_MIN_RELATIVE_SCORE)
+    if settings.RERANKER == "cross-encoder":
+        return CrossEncoderReranker(
+            settings.RERANKER_MODEL,
+            prior_weight=RERANK_CROSS_ENCODER_PRIOR_WEIGHT,
+            min_relative_score=RERANK_MIN_RELATIVE_SCORE
+        )
+    return None
@@ -0,0 +1,2 @@
+from .cache import EmbeddingCache, QueryEmbeddingCache, encode_vector, hash_text, normalize_query
+from .service import EmbeddingService, TokenBucket
@@ -0,0 +1,234 @@
+import hashlib
+import logging
+from pathlib import Path
+import re
+import sqlite3
+from threading import Lock
+import time
+from typing import Dict, Iterable, List
+import unicodedata
+
+from cachetools import TTLCache
+from langchain_core.embeddings import Embeddings
+import numpy as np
+import orjson
+
+from app import metrics
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def encode_vector(embedding: List[float] | np.ndarray) -> str:
+    """
+    Encodes an embedding in pgvector's text format, with the shortest representation of each float32 component.
+
+    pgvector stores `vector` components as float32, so this is lossless while about half the size of a JSON list of
+    Python floats, which carry float64 digits.
+    """
+    return orjson.dumps(np.asarray(embedding, dtype=np.float32), option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes Unicode, case and whitespace, so that trivially different queries share an embedding."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", query)).strip().casefold()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of embeddings, keyed by (embedding model, SHA-256 of the embedded text).
+
+    Vectors are stored as float32 blobs in a local SQLite database that may be shared by multiple worker processes.
+    Once the stored vectors exceed `max_size_bytes`, the least recently used ones are evicted down to
+    `EVICTION_TARGET_RATIO` of the limit. The total size is kept up to date by triggers in a one-row table, so that
+    checking it does not scan the cache, and stays correct whichever process writes.
+    """
+    EVICTION_TARGET_RATIO = 0.9
+
+
+    def __init__(self, path: str | Path, max_size_bytes: int):
+        self.path = Path(path)
+        self.max_size_bytes = max_size_bytes
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # One transaction, so that the size is computed for existing caches exactly once, and in line with the triggers
+        self._conn.executescript(
+            """
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, content_hash)
+            );
+            CREATE INDEX IF NOT EXISTS embeddings_last_used_idx ON embeddings (last_used);
+            CREATE TABLE IF NOT EXISTS embeddings_size (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                total_bytes INTEGER NOT NULL,
+                num_rows INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO embeddings_size (id, total_bytes, num_rows)
+                SELECT 0, COALESCE(SUM(LENGTH(embedding)), 0), COUNT(*) FROM embeddings;
+            CREATE TRIGGER IF NOT EXISTS embeddings_size_insert AFTER INSERT ON embeddings BEGIN
+                UPDATE embeddings_size SET total_bytes = total_bytes + LENGTH(NEW.embedding), num_rows = num_rows + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS embeddings_size_update AFTER UPDATE OF embedding ON embeddings BEGIN
+                UPDATE embeddings_size SET total_bytes = total_bytes - LENGTH(OLD.embedding) + LENGTH(NEW.embedding);
+            END;
+            CREATE TRIGGER IF NOT EXISTS embeddings_size_delete AFTER DELETE ON embeddings BEGIN
+                UPDATE embeddings_size SET total_bytes = total_bytes - LENGTH(OLD.embedding), num_rows = num_rows - 1;
+            END;
+            COMMIT;
+            """
+        )
+
+        self._lock = Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+
+    def get_many(self, model: str, content_hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Returns the cached embeddings of the given content hashes, skipping those that are not cached."""
+        content_hashes = list(set(content_hashes))
+        found = {}
+
+        with self._lock:
+            # Stay below SQLite's limit on the number of query parameters
+            for i in range(0, len(content_hashes), 500):
+                batch = content_hashes[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT content_hash, embedding FROM embeddings WHERE model = ? AND content_hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch]
+                ).fetchall()
+                found.update({content_hash: np.frombuffer(blob, dtype=np.float32).tolist() for content_hash, blob in rows})
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND content_hash = ?",
+                    [(now, model, content_hash) for content_hash in found]
+                )
+                self._conn.commit()
+
+        return found
+
+
+    def put_many(self, model: str, embeddings: Dict[str, List[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE, whose implicit deletes do not fire the size trigger
+            self._conn.executemany(
+                """
+                INSERT INTO embeddings (model, content_hash, embedding, last_used) VALUES (?, ?, ?, ?)
+                ON CONFLICT (model, content_hash) DO UPDATE SET embedding = excluded.embedding, last_used = excluded.last_used
+                """,
+                [
+                    (model, content_hash, np.asarray(embedding, dtype=np.float32).tobytes(), now)
+                    for content_hash, embedding in embeddings.items()
+                ]
+            )
+            self._conn.commit()
+            self._evict()
+
+
+    def _evict(self) -> None:
+        """Evicts the least recently used embeddings if the cache exceeds its size limit. Must hold the lock."""
+        total_size, num_rows = self._conn.execute("SELECT total_bytes, num_rows FROM embeddings_size").fetchone()
+        metrics.set_gauge("embedding_cache_size_bytes", total_size)
+        if total_size <= self.max_size_bytes:
+            return
+
+        average_size = total_size / num_rows
+        num_evicted = int((total_size - self.EVICTION_TARGET_RATIO * self.max_size_bytes) / average_size) + 1
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (num_evicted,)
+        )
+        self._conn.commit()
+
+        metrics.increment("embedding_cache_evictions_total", num_evicted)
+        self.logger.info(f"Evicted {num_evicted} least recently used embeddings ({total_size / 1_000_000:.1f} MB cached, limit {self.max_size_bytes / 1_000_000:.1f} MB)")
+
+
+    def embed_documents(self, embedding_model: Embeddings, model: str, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds the texts with the given model, only sending texts whose embeddings are not cached to the API.
+
+        Args:
+            embedding_model (Embeddings): Model used to embed cache misses.
+            model (str): Name of the embedding model, as part of the cache key.
+            texts (List[str]): Texts to embed.
+
+        Returns:
+            List[List[float]]: Embeddings of the texts, in the same order.
+        """
+        content_hashes = [hash_text(text) for text in texts]
+        embeddings = self.get_many(model, content_hashes)
+
+        # Identical texts within the same document are only embedded once
+        missing = {content_hash: text for content_hash, text in zip(content_hashes, texts) if content_hash not in embeddings}
+        if missing:
+            new_embeddings = embedding_model.embed_documents(list(missing.values()))
+            new_embeddings = dict(zip(missing.keys(), new_embeddings))
+            self.put_many(model, new_embeddings)
+            embeddings.update(new_embeddings)
+
+        num_hits = sum(1 for content_hash in content_hashes if content_hash not in missing)
+        metrics.increment("embedding_cache_hits_total", num_hits)
+        metrics.increment("embedding_cache_misses_total", len(texts) - num_hits)
+        self.logger.debug(f"Embedded {len(texts)} texts with {model}: {num_hits} cached, {len(missing)} sent to the API")
+
+        return [embeddings[content_hash] for content_hash in content_hashes]
+
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU cache of query embeddings with TTL expiry, keyed by (embedding model, normalized query).
+
+    The normalized query is only the cache key; the query is embedded as given, since case and formatting can change
+    its embedding. Vectors are kept as float32 arrays, which take a quarter of the memory of lists of Python floats.
+    """
+    def __init__(self, max_size: int, ttl: float):
+        self._entries: TTLCache = TTLCache(maxsize=max_size, ttl=ttl)
+        self._lock = Lock()
+
+
+    def _get(self, model: str, query: str) -> np.ndarray | None:
+        with self._lock:
+            embedding = self._entries.get((model, query))
+
+        metrics.increment("query_embedding_cache_hits_total" if embedding is not None else "query_embedding_cache_misses_total")
+        return embedding
+
+
+    def _set(self, model: str, query: str, embedding: List[float]) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        embedding.flags.writeable = False  # Shared by all callers
+        with self._lock:
+            self._entries[(model, query)] = embedding
+        return embedding
+
+
+    def embed_query(self, embedding_model: Embeddings, model: str, query: str) -> np.ndarray:
+        """Returns the embedding of the query, only calling the embedding model if it is not cached."""
+        key = normalize_query(query)
+        embedding = self._get(model, key)
+        if embedding is None:
+            embedding = self._set(model, key, embedding_model.embed_query(query))
+        return embedding
+
+
+    async def aembed_query(self, embedding_model: Embeddings, model: str, query: str) -> np.ndarray:
+        key = normalize_query(query)
+        embedding = self._get(model, key)
+        if embedding is None:
+            embedding = self._set(model, key, await embedding_model.aembed_query(query))
+        return embedding
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self._entries.maxsize, "ttl_seconds": self._entries.ttl}
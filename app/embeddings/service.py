@@ -0,0 +1,368 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+import logging
+import random
+from threading import BoundedSemaphore, Condition, Lock, Thread
+import time
+from typing import Deque, List, Optional
+
+from langchain_core.embeddings import Embeddings
+import numpy as np
+from openai import APIConnectionError, APITimeoutError, InternalServerError, OpenAI, RateLimitError
+import tiktoken
+
+from app import metrics
+from app.constants import (
+    EMBEDDING_BATCH_INITIAL_TOKENS,
+    EMBEDDING_BATCH_LINGER_MS,
+    EMBEDDING_BATCH_MAX_INPUTS,
+    EMBEDDING_BATCH_MAX_TOKENS,
+    EMBEDDING_BATCH_MIN_TOKENS,
+    EMBEDDING_BATCH_TARGET_LATENCY_SECONDS,
+    EMBEDDING_MAX_CONCURRENT_BATCHES,
+    EMBEDDING_MAX_INPUT_TOKENS,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_RESULT_TIMEOUT_SECONDS,
+    EMBEDDING_RETRY_BASE_DELAY_SECONDS,
+    EMBEDDING_RETRY_MAX_DELAY_SECONDS
+)
+
+# Errors after which a batch is retried; all other errors fail the requests in the batch immediately
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+class TokenBucket:
+    """
+    Paces consumption of a per-minute budget (e.g., requests or tokens per minute), allowing bursts of up to one
+    minute's budget. Callers reserve their amount up front and sleep until it is covered, so waiting callers are served
+    in order.
+    """
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self._available = per_minute
+        self._updated_at = time.monotonic()
+        self._lock = Lock()
+
+
+    def acquire(self, amount: float) -> float:
+        """Blocks until the amount is available and returns the number of seconds waited."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._available = min(self.capacity, self._available + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._available -= amount
+            wait = max(0.0, -self._available / self.rate)
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+@dataclass
+class _EmbeddingRequest:
+    texts: List[str]
+    future: Future = field(default_factory=Future)
+    inputs: List["_Input"] = field(default_factory=list)
+    remaining: int = 0
+    lock: Lock = field(default_factory=Lock)  # Batches containing inputs of the request complete in different threads
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+    def embeddings(self) -> List[List[float]]:
+        """Combines the embeddings of the inputs into one embedding per text, once all inputs are embedded."""
+        parts: List[List[_Input]] = [[] for _ in self.texts]
+        for item in self.inputs:
+            parts[item.index].append(item)
+
+        embeddings = []
+        for text_parts in parts:
+            if len(text_parts) == 1:
+                embeddings.append(text_parts[0].embedding)
+                continue
+            # Like LangChain's OpenAIEmbeddings, a text split into several inputs gets the token-weighted average of
+            # their embeddings, normalized to unit length
+            average = np.average(
+                [item.embedding for item in text_parts],
+                axis=0,
+                weights=[item.num_tokens for item in text_parts]
+            )
+            embeddings.append((average / np.linalg.norm(average)).tolist())
+        return embeddings
+
+
+@dataclass
+class _Input:
+    request: _EmbeddingRequest
+    index: int  # Of the text within the request
+    text: str
+    num_tokens: int
+    embedding: Optional[List[float]] = None
+
+
+class EmbeddingService(Embeddings):
+    """
+    Embedding client shared by all document pipelines and queries of a process.
+
+    Texts submitted concurrently are queued and coalesced into batches bounded by their total token count, which is
+    adapted to the observed latency and rate limiting of the API. Requests are paced to stay within the requests and
+    tokens per minute budgets, and failed batches are retried with jittered exponential backoff.
+
+    Each request is validated before it joins a batch: empty texts fail the request, and texts over the model's
+    input limit are split into several inputs whose embeddings are averaged. If the API still rejects a batch, its
+    inputs are embedded one by one, so that only the requests with a rejected input fail.
+
+    Implements LangChain's `Embeddings` interface, so it can be used wherever an embedding model is expected.
+    """
+    def __init__(
+        self,
+        client: OpenAI,
+        model: str,
+        requests_per_minute: int,
+        tokens_per_minute: int
+    ):
+        self.client = client
+        self.model = model
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.batch_max_tokens = EMBEDDING_BATCH_INITIAL_TOKENS
+        self._paused_until = 0.0  # Set from the Retry-After header of rate limited responses
+
+        self._inputs: Deque[_Input] = deque()
+        self._queued_tokens = 0
+        self._condition = Condition()
+        self._closed = False
+
+        # Bounds the number of batches in flight, so that batches keep growing while the API is busy
+        self._batch_slots = BoundedSemaphore(EMBEDDING_MAX_CONCURRENT_BATCHES)
+        self._executor = ThreadPoolExecutor(max_workers=EMBEDDING_MAX_CONCURRENT_BATCHES, thread_name_prefix="embedding-batch")
+        self._dispatcher = Thread(target=self._dispatch, name="embedding-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queues the texts for embedding and returns a future of their embeddings, in the same order."""
+        request = _EmbeddingRequest(texts=list(texts))
+        if not request.texts:
+            request.future.set_result([])
+            return request.future
+
+        for i, text in enumerate(request.texts):
+            if not text:
+                request.future.set_exception(ValueError(f"Cannot embed an empty text (at index {i})"))
+                return request.future
+
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= EMBEDDING_MAX_INPUT_TOKENS:
+                request.inputs.append(_Input(request=request, index=i, text=text, num_tokens=len(tokens)))
+                continue
+
+            metrics.increment("embedding_split_texts_total")
+            for start in range(0, len(tokens), EMBEDDING_MAX_INPUT_TOKENS):
+                part = tokens[start:start + EMBEDDING_MAX_INPUT_TOKENS]
+                request.inputs.append(_Input(request=request, index=i, text=self.encoding.decode(part), num_tokens=len(part)))
+
+        inputs = request.inputs
+        request.remaining = len(inputs)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Embedding service is closed")
+            self._inputs.extend(inputs)
+            self._queued_tokens += sum(item.num_tokens for item in inputs)
+            metrics.set_gauge("embedding_queue_depth", len(self._inputs))
+            self._condition.notify()
+
+        return request.future
+
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.submit(texts).result(timeout=EMBEDDING_RESULT_TIMEOUT_SECONDS)
+
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.wait_for(asyncio.wrap_future(self.submit(texts)), EMBEDDING_RESULT_TIMEOUT_SECONDS)
+
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+    def _dispatch(self) -> None:
+        while True:
+            self._batch_slots.acquire()
+
+            with self._condition:
+                while not self._inputs and not self._closed:
+                    self._condition.wait()
+                if not self._inputs:
+                    self._batch_slots.release()
+                    return
+
+                # Give concurrent requests a moment to join the batch, unless it is already full
+                deadline = time.monotonic() + EMBEDDING_BATCH_LINGER_MS / 1000
+                while (
+                    self._queued_tokens < self.batch_max_tokens
+                    and len(self._inputs) < EMBEDDING_BATCH_MAX_INPUTS
+                    and not self._closed
+                ):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                batch = self._take_batch()
+
+            self._executor.submit(self._run_batch, batch)
+
+
+    def _take_batch(self) -> List[_Input]:
+        """Takes the next batch of inputs off the queue. Must hold the condition's lock."""
+        batch = [self._inputs.popleft()]  # An input exceeding the token limit is sent on its own
+        num_tokens = batch[0].num_tokens
+        while (
+            self._inputs
+            and len(batch) < EMBEDDING_BATCH_MAX_INPUTS
+            and num_tokens + self._inputs[0].num_tokens <= self.batch_max_tokens
+        ):
+            item = self._inputs.popleft()
+            batch.append(item)
+            num_tokens += item.num_tokens
+
+        self._queued_tokens -= num_tokens
+        metrics.set_gauge("embedding_queue_depth", len(self._inputs))
+        return batch
+
+
+    def _run_batch(self, batch: List[_Input]) -> None:
+        try:
+            self._embed_batch(batch)
+        finally:
+            self._batch_slots.release()
+
+
+    def _embed_batch(self, batch: List[_Input]) -> None:
+        try:
+            embeddings = self._embed_with_retry([item.text for item in batch], sum(item.num_tokens for item in batch))
+        except Exception as e:
+            if len(batch) > 1 and not isinstance(e, RETRYABLE_ERRORS):
+                # The API rejected one of the inputs (e.g., a text it cannot embed); find it instead of failing everyone
+                self.logger.warning(f"Failed to embed a batch of {len(batch)} texts ({e}), embedding them one by one")
+                metrics.increment("embedding_batch_splits_total")
+                for item in batch:
+                    self._embed_batch([item])
+                return
+
+            self.logger.error(f"Failed to embed a batch of {len(batch)} texts: {e}")
+            for item in batch:
+                with item.request.lock:
+                    if not item.request.future.done():
+                        item.request.future.set_exception(e)
+            return
+
+        for item, embedding in zip(batch, embeddings):
+            request = item.request
+            with request.lock:
+                item.embedding = embedding
+                request.remaining -= 1  # Only one batch contains each input, but a request may span several batches
+                if request.remaining == 0 and not request.future.done():
+                    metrics.observe("embedding_request_latency_seconds", time.perf_counter() - request.enqueued_at)
+                    request.future.set_result(request.embeddings())
+
+
+    def _embed_with_retry(self, texts: List[str], num_tokens: int) -> List[List[float]]:
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            self._wait_for_budget(num_tokens)
+
+            start_time = time.perf_counter()
+            try:
+                response = self.client.embeddings.create(model=self.model, input=texts, encoding_format="float")
+            except RETRYABLE_ERRORS as e:
+                self._shrink_batches()
+                if attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+
+                # Full jitter spreads out the retries of concurrent batches
+                delay = random.uniform(0, min(EMBEDDING_RETRY_MAX_DELAY_SECONDS, EMBEDDING_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+                retry_after = self._get_retry_after(e)
+                if retry_after is not None:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                    delay = max(delay, retry_after)
+
+                metrics.increment("embedding_retries_total")
+                self.logger.warning(f"Embedding request of {len(texts)} texts failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+
+            latency = time.perf_counter() - start_time
+            metrics.increment("embedding_batches_total")
+            metrics.observe("embedding_batch_latency_seconds", latency)
+            metrics.observe("embedding_batch_tokens", num_tokens)
+            self._adapt_batches(num_tokens, latency)
+
+            return [data.embedding for data in sorted(response.data, key=lambda data: data.index)]
+
+
+    def _wait_for_budget(self, num_tokens: int) -> None:
+        waited = max(0.0, self._paused_until - time.monotonic())
+        if waited > 0:
+            time.sleep(waited)
+        waited += self.request_bucket.acquire(1)
+        waited += self.token_bucket.acquire(num_tokens)
+        if waited > 0:
+            metrics.observe("embedding_rate_limit_wait_seconds", waited)
+
+
+    def _adapt_batches(self, num_tokens: int, latency: float) -> None:
+        """Grows the batch token limit while full batches are fast, and shrinks it once they get slow."""
+        if latency > EMBEDDING_BATCH_TARGET_LATENCY_SECONDS:
+            self.batch_max_tokens = max(EMBEDDING_BATCH_MIN_TOKENS, int(self.batch_max_tokens * 0.75))
+        elif num_tokens >= self.batch_max_tokens / 2:
+            self.batch_max_tokens = min(EMBEDDING_BATCH_MAX_TOKENS, int(self.batch_max_tokens * 1.25))
+        metrics.set_gauge("embedding_batch_max_tokens", self.batch_max_tokens)
+
+
+    def _shrink_batches(self) -> None:
+        self.batch_max_tokens = max(EMBEDDING_BATCH_MIN_TOKENS, self.batch_max_tokens // 2)
+        metrics.set_gauge("embedding_batch_max_tokens", self.batch_max_tokens)
+
+
+    def _get_retry_after(self, error: Exception) -> Optional[float]:
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        try:
+            return float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "model": self.model,
+                "queued_inputs": len(self._inputs),
+                "queued_tokens": self._queued_tokens,
+                "batch_max_tokens": self.batch_max_tokens
+            }
+
+
+    def close(self) -> None:
+        """Embeds all queued texts and stops the dispatcher. Called on application shutdown."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
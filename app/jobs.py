@@ -0,0 +1,174 @@
+import asyncio
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+import logging
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from uuid import uuid4
+
+from cachetools import TTLCache
+
+from app.constants import FINISHED_JOBS_MAX_SIZE, FINISHED_JOBS_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+JobFunction = Callable[[], Awaitable[Any]]
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted to a queue that has no capacity left."""
+
+
+@dataclass
+class Job:
+    chatroom_id: str
+    job_id: str = field(default_factory=lambda: str(uuid4()))
+    status: str = "queued"  # "queued", "running", "completed" or "failed"
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        job_dict = asdict(self)
+        for key in ("created_at", "started_at", "finished_at"):
+            job_dict[key] = job_dict[key].isoformat() if job_dict[key] else None
+        return job_dict
+
+
+class GroupGPTJobQueue:
+    """
+    Bounded in-process queue for GroupGPT invocations.
+
+    - At most `max_concurrency` jobs run at the same time across all chatrooms.
+    - Jobs of the same chatroom run one at a time, in submission order.
+    - At most `max_pending` jobs may be reserved, queued or running; further reservations raise `QueueFullError`.
+    """
+    def __init__(self, max_concurrency: int, max_pending: int):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._chatroom_queues: Dict[str, Deque[Tuple[Job, JobFunction]]] = {}
+        self._chatroom_workers: Dict[str, asyncio.Task] = {}
+        self._active_jobs: Dict[str, Job] = {}
+        self._finished_jobs: TTLCache = TTLCache(maxsize=FINISHED_JOBS_MAX_SIZE, ttl=FINISHED_JOBS_TTL_SECONDS)
+        self._num_running = 0
+
+
+    @property
+    def is_saturated(self) -> bool:
+        return len(self._active_jobs) >= self.max_pending
+
+
+    def reserve(self, chatroom_id: str) -> Job:
+        """
+        Reserves a slot for a job of the given chatroom, to be passed to `submit` or `release` later. Reserving before
+        doing work the job depends on (e.g., storing the triggering message) guarantees that the job can be queued.
+
+        Raises:
+            QueueFullError: If `max_pending` jobs are already reserved, queued or running.
+        """
+        if self.is_saturated:
+            raise QueueFullError(f"Job queue is full ({self.max_pending} pending jobs)")
+
+        job = Job(chatroom_id=chatroom_id)
+        self._active_jobs[job.job_id] = job
+        return job
+
+
+    def release(self, job: Job) -> None:
+        """Gives up a reserved slot whose job will not be submitted."""
+        self._active_jobs.pop(job.job_id, None)
+
+
+    def submit(self, chatroom_id: str, job_fn: JobFunction, job: Optional[Job] = None) -> Job:
+        """
+        Queues a job for the given chatroom.
+
+        Args:
+            chatroom_id (str): ID of the chatroom the job belongs to. Jobs of the same chatroom run in FIFO order.
+            job_fn (JobFunction): Zero-argument coroutine function that performs the work.
+            job (Optional[Job]): Job reserved with `reserve`; a slot is reserved now if None.
+
+        Returns:
+            Job: The queued job, whose status can be polled with `get_job`.
+        """
+        if job is None:
+            job = self.reserve(chatroom_id)
+        self._chatroom_queues.setdefault(chatroom_id, deque()).append((job, job_fn))
+
+        if chatroom_id not in self._chatroom_workers:
+            self._chatroom_workers[chatroom_id] = asyncio.create_task(self._drain_chatroom(chatroom_id))
+
+        return job
+
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        return self._active_jobs.get(job_id) or self._finished_jobs.get(job_id)
+
+
+    def stats(self) -> dict:
+        return {
+            "running": self._num_running,
+            "pending": len(self._active_jobs),
+            "max_concurrency": self.max_concurrency,
+            "max_pending": self.max_pending
+        }
+
+
+    async def _drain_chatroom(self, chatroom_id: str) -> None:
+        """Runs the jobs of a single chatroom one after another until its queue is empty."""
+        queue = self._chatroom_queues[chatroom_id]
+        try:
+            while queue:
+                job, job_fn = queue.popleft()
+                async with self._semaphore:
+                    await self._run_job(job, job_fn)
+        finally:
+            del self._chatroom_workers[chatroom_id]
+            if not queue:
+                del self._chatroom_queues[chatroom_id]
+
+
+    async def _run_job(self, job: Job, job_fn: JobFunction) -> None:
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+        self._num_running += 1
+
+        try:
+            await job_fn()
+            job.status = "completed"
+        except Exception as e:
+            logger.exception(f"Job {job.job_id} in chatroom {job.chatroom_id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "Cancelled"
+            raise
+        finally:
+            self._num_running -= 1
+            job.finished_at = datetime.now(timezone.utc)
+            self._active_jobs.pop(job.job_id, None)
+            self._finished_jobs[job.job_id] = job
+
+            logger.debug(f"Job {job.job_id} finished with status '{job.status}' in {(job.finished_at - job.started_at).total_seconds():.2f}s")
+
+
+    async def shutdown(self) -> None:
+        """Cancels all queued and running jobs, and marks them as failed."""
+        workers = list(self._chatroom_workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        # Running jobs were marked by `_run_job`; the remaining ones were reserved or queued and never started
+        finished_at = datetime.now(timezone.utc)
+        for job in list(self._active_jobs.values()):
+            job.status = "failed"
+            job.error = "Cancelled"
+            job.finished_at = finished_at
+            self._finished_jobs[job.job_id] = job
+        self._active_jobs.clear()
+        self._chatroom_queues.clear()
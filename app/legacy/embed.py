@@ -1,19 +1,17 @@
 import os
 
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import CharacterTextSplitter
 from PyPDF2 import PdfReader
 from supabase import create_client, Client
 
-from app.constants import EMBEDDING_MODEL_NAME
+from app.dependencies import get_embedding_service
 from app.llms import gpt_4o_mini
 
 load_dotenv()
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 supabase: Client = create_client(url, key)
-embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL_NAME)
 
 
 def download_pdf(topic: str, file_name: str):
@@ -76,11 +74,13 @@ def embed_document(topic: str, file_name: str):
     )
     texts = text_splitter.split_text(raw_text)
 
+    # Create the embeddings of all chunks at once, so that they are batched by the embedding service
+    chunk_embeddings = get_embedding_service().embed_documents(texts)
+
     # Insert each text chunk and its embedding into Supabase
     count = 0
-    for text in texts:
+    for text, embedding in zip(texts, chunk_embeddings):
         count += 1
-        embedding = embeddings.embed_query(text)  # Create the embedding for the chunk
         insert_embedding_into_supabase(text, embedding, topic)
         print(f"Document {topic}/{file_name} embedding {count} done")
 
@@ -2,23 +2,21 @@ import os
 
 from dotenv import load_dotenv
 from langchain.schema import Document
-from langchain_openai import OpenAIEmbeddings
 from langchain.chains.question_answering import load_qa_chain
 from supabase import create_client, Client
 
-from app.constants import EMBEDDING_MODEL_NAME
+from app.dependencies import get_embedding_service
 from app.llms import gpt_4o_mini
 
 load_dotenv()
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 supabase: Client = create_client(url, key)
-embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL_NAME)
 
 
 def get_rag_answer(topic: str, query: str):
     # Get the embedding for the query
-    query_embedding = embeddings.embed_query(query)
+    query_embedding = get_embedding_service().embed_query(query)
 
     # Query the Supabase vector table for nearest neighbors
     response = supabase.rpc(
@@ -14,9 +14,10 @@ settings = get_settings()
 logger = logging.getLogger(__name__)
 
 
-def safe_init_chat_model(model_name: str, temperature: float = 0) -> ChatOpenAI | ChatVertexAI:
+def safe_init_chat_model(model_name: str, temperature: float = 0, streaming: bool = False) -> ChatOpenAI | ChatVertexAI:
     try:
-        return init_chat_model(model_name, temperature=temperature, disable_streaming=True)     # No need for streaming since responses are directly written to DB
+        # Streaming is only needed by models whose responses are streamed into the chatroom; the rest write complete responses to DB
+        return init_chat_model(model_name, temperature=temperature, disable_streaming=not streaming)
     except Exception as e:
         logger.exception(f"Initialization of LLM '{model_name}' failed with error: {e}")
         return None
@@ -30,7 +31,7 @@ gemini_25_flash = safe_init_chat_model("gemini-2.5-flash")
 gemini_25_pro = safe_init_chat_model("gemini-2.5-pro")
 
 gpt_41_nano = safe_init_chat_model("gpt-4.1-nano")
-gpt_41_mini = safe_init_chat_model("gpt-4.1-mini")
+gpt_41_mini = safe_init_chat_model("gpt-4.1-mini", streaming=settings.GROUPGPT_STREAM_RESPONSES)  # Used by ResponseGenerator
 gpt_4o_mini = safe_init_chat_model("gpt-4o-mini")
 
 # Direct API clients
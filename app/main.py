@@ -1,25 +1,31 @@
+import asyncio
 from contextlib import asynccontextmanager
 import logging
 import os
+import time
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
-from starlette.middleware.base import BaseHTTPMiddleware
 
 load_dotenv()  # Load environment variables before all other imports
 
-from app.dependencies import get_settings
+from app.attachments import OpenAIFileCache
+from app.cache import subscribe_to_invalidations
+from app.dependencies import close_async_supabase, close_embedding_service, get_async_supabase, get_read_cache, get_reranker, get_settings
+from app.jobs import GroupGPTJobQueue
+from app.llms import openai_client
 from app.logger import setup_logging
-from app.middlewares import auth_middleware
+from app.middlewares import AuthMiddleware
 from app.routers import (
     chatrooms,
     documents,
     invites,
     legacy,
     messages,
+    metrics,
     users
 )
 from app.workflows import GroupGPTGraph
@@ -34,8 +40,14 @@ os.makedirs("static", exist_ok=True)  # Ensure static directory exists
 async def lifespan(app: FastAPI):
     # Startup tasks
     logger.info("Starting application...")
+
+    # Build the GroupGPT graph once per process; it is shared by all GroupGPT invocations
+    start_time = time.perf_counter()
+    app.state.groupgpt_graph = GroupGPTGraph()
+    logger.info(f"Built GroupGPT graph in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+
     try:
-        compiled_graph = GroupGPTGraph().graph
+        compiled_graph = app.state.groupgpt_graph.graph
         graph_repr = compiled_graph.get_graph()
         graph_image = graph_repr.draw_mermaid_png()
 
@@ -46,22 +58,52 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"Failed to generate GroupGPT graph visualization: {e}")
 
+    app.state.groupgpt_jobs = GroupGPTJobQueue(
+        max_concurrency=settings.GROUPGPT_MAX_CONCURRENT_JOBS,
+        max_pending=settings.GROUPGPT_MAX_PENDING_JOBS
+    )
+
+    app.state.openai_files = OpenAIFileCache(openai_client)
+
+    if settings.RERANKER != "none":
+        # Load the reranker's model before the first chunk retrieval, off the event loop
+        start_time = time.perf_counter()
+        await asyncio.to_thread(get_reranker)
+        logger.info(f"Loaded {settings.RERANKER} reranker in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+
+    app.state.read_cache_listener = None
+    if settings.READ_CACHE_REALTIME_INVALIDATION:
+        try:
+            app.state.read_cache_listener = await subscribe_to_invalidations(get_read_cache(), get_async_supabase())
+        except Exception as e:
+            logger.exception(f"Failed to subscribe to Realtime changes, read cache relies on TTL and local invalidation only: {e}")
+
     yield
 
     # Shutdown tasks
     logger.info("Shutting down application...")
-    pass
+    await app.state.groupgpt_jobs.shutdown()
+    await app.state.groupgpt_graph.history_summarizer.shutdown()
+    await app.state.openai_files.close()
+    if app.state.read_cache_listener is not None:
+        app.state.read_cache_listener.cancel()
+        await get_async_supabase().realtime.close()
+    await close_async_supabase()
+    await asyncio.to_thread(close_embedding_service)
 
 app = FastAPI(
     title=settings.title,
     summary=settings.summary,
     description=settings.description,
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 logger.info("Successfully started application")
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Added before CORSMiddleware so that CORS wraps it and preflight/error responses carry CORS headers
+app.add_middleware(AuthMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
@@ -69,13 +111,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
-app.add_middleware(BaseHTTPMiddleware, dispatch=auth_middleware)
 
 app.include_router(chatrooms.router)
 app.include_router(documents.router)
 app.include_router(invites.router)
 app.include_router(legacy.router)
 app.include_router(messages.router)
+app.include_router(metrics.router)
 app.include_router(users.router)
 
 @app.get("/")
@@ -0,0 +1,37 @@
+from collections import defaultdict
+from threading import Lock
+from typing import Dict
+
+# In-process counters, gauges and timing summaries, keyed by metric name
+_counters: Dict[str, float] = defaultdict(float)
+_gauges: Dict[str, float] = {}
+_observations: Dict[str, Dict[str, float]] = {}
+_lock = Lock()
+
+
+def increment(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, value: float) -> None:
+    """Records a single observation (e.g., a latency in seconds) into a count/sum/max summary."""
+    with _lock:
+        summary = _observations.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+        summary["count"] += 1
+        summary["sum"] += value
+        summary["max"] = max(summary["max"], value)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "observations": {name: dict(summary) for name, summary in _observations.items()}
+        }
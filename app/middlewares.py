@@ -1,63 +1,66 @@
-from fastapi import HTTPException, Request, Response, status
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from app.dependencies import get_supabase
+from app.auth import AuthError, authenticate
 
+# Allow unauthenticated access to root and documentation endpoints
+ALLOWED_PATHS = frozenset({"/", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json"})
+STATIC_PATH_PREFIX = "/static/"
 
-async def auth_middleware(request: Request, call_next) -> Response:
+
+class AuthMiddleware:
     """
-    Authenticates the request based on the JWT supplied in the header.
+    Pure ASGI middleware that authenticates requests based on the JWT supplied in the header.
 
-    Args:
-        request (Request): The request sent by the client.
+    On success, the user's ID and username are exposed to route handlers as `request.state.user_id` and `request.state.username`.
     """
-    # Allow unauthenticated access to root and documentation endpoints
-    ALLOWED_PATHS = {"/", "/docs", "redoc", "/openapi.json"}
-    if request.url.path in ALLOWED_PATHS:
-        return await call_next(request)
-
-    # Allow unauthenticated access to static files
-    if request.url.path.startswith("/static/"):
-        return await call_next(request)
-
-    auth_header = request.headers.get("Authorization", None)
-    if not auth_header:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Missing Authorization header in request"
-        )
-    
-    if not auth_header.startswith("Bearer "):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid Authorization header format"
-        )
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-    try:
-        token = auth_header.split(' ')[1]
-        supabase = get_supabase()
-        auth_user_response = supabase.auth.get_user(token)  # JWT validation with Supabase
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=e.detail if hasattr(e, 'detail') else "Invalid token"
-        )
 
-    try:
-        user_response = (
-            supabase
-            .from_("users")
-            .select("user_id, username")
-            .eq("auth_id", auth_user_response.user.id)
-            .execute()
-        )
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        request.state.user_id = user_response.data[0]["user_id"]
-        request.state.username = user_response.data[0]["username"]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+        path = scope["path"]
+        if path in ALLOWED_PATHS or path.startswith(STATIC_PATH_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        auth_header = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth_header = value.decode("latin-1")
+                break
 
-    response = await call_next(request)
-    return response
+        if not auth_header:
+            await self._reject(scope, receive, send, status.HTTP_401_UNAUTHORIZED, "Missing Authorization header in request")
+            return
+
+        if not auth_header.startswith("Bearer "):
+            await self._reject(scope, receive, send, status.HTTP_401_UNAUTHORIZED, "Invalid Authorization header format")
+            return
+
+        try:
+            token = auth_header.split(' ')[1]
+            user_id, username = await authenticate(token)  # Local JWT validation if enabled, cached user lookup
+        except AuthError as e:
+            await self._reject(scope, receive, send, e.status_code, e.detail)
+            return
+
+        # Backs `request.state` in Starlette
+        state = scope.setdefault("state", {})
+        state["user_id"] = user_id
+        state["username"] = username
+
+        await self.app(scope, receive, send)
+
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send, status_code: int, detail: str) -> None:
+        response = JSONResponse(
+            status_code=status_code,
+            content={"detail": detail}
+        )
+        await response(scope, receive, send)
@@ -7,7 +7,6 @@ from typing import List, Tuple
 
 from langchain_core.exceptions import OutputParserException
 from langchain_core.messages import AIMessage, HumanMessage
-from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from PIL import Image
 from tiktoken import encoding_for_model
@@ -17,7 +16,9 @@ from app.constants import (
     DEFAULT_CHUNK_OVERLAP,
     EMBEDDING_MODEL_NAME
 )
-from app.dependencies import get_settings, get_supabase
+from app.cache import CHATROOM_DOCUMENTS
+from app.dependencies import get_embedding_cache, get_embedding_service, get_local_index, get_read_cache, get_settings, get_supabase
+from app.embeddings import encode_vector
 from app.llms import gpt_41_mini
 from app.prompts import IMAGE_DESCRIPTION_PROMPT
 
@@ -38,7 +39,7 @@ class BasePipeline:
         self.uploader_id = uploader_id
         self.chatroom_id = chatroom_id
 
-        self.embedding_model = OpenAIEmbeddings(model=EMBEDDING_MODEL_NAME)
+        self.embedding_model = get_embedding_service()
         self.encoding = encoding_for_model(EMBEDDING_MODEL_NAME)
 
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -111,8 +112,8 @@ class BasePipeline:
         # Split text into chunks for subsequent embedding
         contents = self.text_splitter.split_text(text)
 
-        # Create embeddings for each of the text chunks
-        embeddings = self.embedding_model.embed_documents(contents)
+        # Create embeddings for each of the text chunks, reusing those of chunks that have been embedded before
+        embeddings = get_embedding_cache().embed_documents(self.embedding_model, EMBEDDING_MODEL_NAME, contents)
 
         return contents, embeddings
 
@@ -129,18 +130,20 @@ class BasePipeline:
                 })
                 .execute()
             )
+            get_read_cache().invalidate(CHATROOM_DOCUMENTS, self.chatroom_id)
             return response
         except Exception as e:
             raise RuntimeError(f"Document entry insertion failed with error: {e}")
 
-    def _insert_embeddings(self, document_id: str, contents: List[str], embeddings: List[List[float]]) -> dict:
+    def _insert_embeddings(self, document_id: str, filename: str, contents: List[str], embeddings: List[List[float]]) -> dict:
         try:
             payload = [
                 {
                     "document_id": document_id,
+                    "chatroom_id": self.chatroom_id,
                     "chunk_index": i,
                     "content": content,
-                    "embedding": embedding
+                    "embedding": encode_vector(embedding)  # Compact text encoding instead of a list of floats
                 }
                 for i, (content, embedding) in enumerate(zip(contents, embeddings))
             ]
@@ -150,6 +153,15 @@ class BasePipeline:
                 .insert(payload)
                 .execute()
             )
+            if get_settings().RETRIEVAL_BACKEND == "local":
+                get_local_index().add_document(
+                    self.chatroom_id,
+                    document_id,
+                    filename,
+                    chunk_ids=[chunk["chunk_id"] for chunk in response.data],
+                    contents=contents,
+                    embeddings=embeddings
+                )
 
             return response
         except Exception as e:
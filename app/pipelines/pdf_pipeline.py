@@ -187,7 +187,7 @@ class PdfPipeline(BasePipeline):
 
             self._insert_document(document_id, filename)
 
-            self._insert_embeddings(document_id, contents, embeddings)
+            self._insert_embeddings(document_id, filename, contents, embeddings)
 
             self._upload_document_to_supabase(document_id, path)
 
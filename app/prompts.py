@@ -98,4 +98,32 @@ Bad examples:
 - "According to the quarterly report, sales increased by 15%." (missing citation)
 - "Sales increased by 15% (from Q3 report)." (improper citation format)
 </citation_examples>
-"""
\ No newline at end of file
+"""
+CONVERSATION_SUMMARY_PROMPT = """
+<conversation_summary>
+The following is a summary of the earlier part of the conversation, which is no longer included in full in the conversation history. Use it for context, but prefer the conversation history when they conflict.
+
+{summary}
+</conversation_summary>
+"""
+
+HISTORY_SUMMARIZER_PROMPT = """
+You maintain a running summary of an educational group chat between university students and an AI assistant called GroupGPT.
+
+Update the existing summary with the new messages below. The users' messages are formatted as "{{username}}: {{message_content}}".
+
+<instructions>
+1. Keep track of each user's questions, goals and any decisions or conclusions reached.
+2. Keep important facts, figures, names of documents and sources cited by GroupGPT.
+3. Drop greetings, small talk and details that are unlikely to matter later.
+4. Write in concise third-person prose of at most {max_words} words. Respond with the updated summary only.
+</instructions>
+
+<existing_summary>
+{summary}
+</existing_summary>
+
+<new_messages>
+{new_messages}
+</new_messages>
+"""
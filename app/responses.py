@@ -0,0 +1,32 @@
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.dependencies import get_async_supabase
+
+
+async def stream_rpc_response(function_name: str, params: dict) -> StreamingResponse:
+    """
+    Calls a PostgREST RPC function and streams its JSON response body to the client as is.
+
+    The body is never decoded into Python objects and re-encoded, so this is only suitable for endpoints that return
+    the RPC result unchanged. Error responses of PostgREST are raised as an HTTPException with the upstream status code
+    and body, which the routers re-raise as is.
+    """
+    # The PostgREST client of the pooled Supabase client, and with it its session, lives as long as the app; unlike
+    # supabase-py's default client, it is not replaced on auth state changes
+    session = get_async_supabase().postgrest.session
+    request = session.build_request("POST", f"/rpc/{function_name}", json=params)
+    response = await session.send(request, stream=True)
+
+    if response.is_error:
+        body = await response.aread()
+        await response.aclose()
+        raise HTTPException(status_code=response.status_code, detail=body.decode(errors="replace"))
+
+    return StreamingResponse(
+        response.aiter_bytes(),
+        status_code=response.status_code,
+        media_type="application/json",
+        background=BackgroundTask(response.aclose)
+    )
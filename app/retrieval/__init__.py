@@ -0,0 +1,3 @@
+from .cache import RetrievalCache
+from .local_index import BM25Index, LocalChunkIndex, reciprocal_rank_fusion
+from .reranker import CrossEncoderReranker, LexicalReranker, Reranker
@@ -0,0 +1,42 @@
+from threading import Lock
+from typing import Hashable, List, Optional
+
+from cachetools import TTLCache
+
+from app import metrics
+from app.embeddings import normalize_query
+
+
+class RetrievalCache:
+    """
+    In-process cache of hybrid search results, keyed by (chatroom ID, knowledge base version, normalized query,
+    match count).
+
+    The version identifies the searched chunks and is read by callers before searching, from where every worker sees
+    it: the chatroom's `knowledge_base_version` column, bumped by triggers on every change to its chunks, or the shard
+    files of the local index. Once a change is committed, later searches read a new version and miss the results
+    cached for earlier ones, which are left to expire. Results of a search racing with a change are stored under the
+    version read before it, so they can only be served to searches that read that same version.
+    """
+    def __init__(self, max_size: int, ttl: float):
+        self._entries: TTLCache = TTLCache(maxsize=max_size, ttl=ttl)
+        self._lock = Lock()
+
+
+    def get(self, chatroom_id: str, version: Hashable, query: str, match_count: int) -> Optional[List[dict]]:
+        """Returns the cached results, or None if there are none."""
+        with self._lock:
+            results = self._entries.get((chatroom_id, version, normalize_query(query), match_count))
+
+        metrics.increment("retrieval_cache_hits_total" if results is not None else "retrieval_cache_misses_total")
+        return results
+
+
+    def set(self, chatroom_id: str, version: Hashable, query: str, match_count: int, results: List[dict]) -> None:
+        with self._lock:
+            self._entries[(chatroom_id, version, normalize_query(query), match_count)] = results
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self._entries.maxsize, "ttl_seconds": self._entries.ttl}
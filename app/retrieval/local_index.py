@@ -0,0 +1,309 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+import logging
+import math
+import os
+from pathlib import Path
+import re
+import shutil
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from cachetools import LRUCache
+import numpy as np
+import orjson
+from supabase import Client
+
+from app import metrics
+from app.retrieval.stemmer import stem
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Common English words ignored by the lexical search, like the 'english' text search configuration of hybrid_search
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both but by
+can did do does doing down during each few for from further had has have having he her here hers herself him himself
+his how i if in into is it its itself just me more most my myself no nor not now of off on once only or other our ours
+ourselves out over own same she should so some such than that the their theirs them themselves then there these they
+this those through to too under until up very was we were what when where which while who whom why will with you your
+yours yourself yourselves
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into stemmed, lowercase terms without stopwords, like `to_tsvector('english', ...)`, so that e.g.
+    "running" and "run" match. Unlike PostgreSQL's parser, words are split at every non-word character, e.g., within
+    URLs, file paths and hyphenated words.
+    """
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.casefold()) if token not in STOPWORDS]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Tuple[Sequence[int], float]], rrf_k: int) -> Dict[int, float]:
+    """Fuses rankings of row indices, each given with its weight, into RRF scores by row index."""
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking, weight in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row] += weight / (rrf_k + rank)
+    return scores
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over the chunks of a chatroom. Like `plainto_tsquery` in hybrid_search, only chunks containing
+    all query terms match.
+    """
+    K1 = 1.2
+    B = 0.75
+
+
+    def __init__(self, texts: Sequence[str]):
+        postings: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[row] = len(tokens)
+            for token in tokens:
+                postings[token][row] += 1
+
+        self.num_rows = len(texts)
+        self.lengths = lengths
+        self.average_length = float(lengths.mean()) if len(texts) else 0.0
+        # Term -> (row indices, term frequencies), as arrays for vectorized scoring
+        self.postings = {
+            term: (np.fromiter(rows.keys(), dtype=np.int32), np.fromiter(rows.values(), dtype=np.float32))
+            for term, rows in postings.items()
+        }
+
+
+    def search(self, query: str, limit: int) -> List[int]:
+        """Returns the indices of the best matching rows, best first."""
+        terms = set(tokenize(query))
+        if not terms or any(term not in self.postings for term in terms):
+            return []
+
+        scores = np.zeros(self.num_rows, dtype=np.float32)
+        num_matched_terms = np.zeros(self.num_rows, dtype=np.int32)
+        length_norm = self.K1 * (1 - self.B + self.B * self.lengths / max(self.average_length, 1.0))
+        for term in terms:
+            rows, frequencies = self.postings[term]
+            idf = math.log(1 + (self.num_rows - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * frequencies * (self.K1 + 1) / (frequencies + length_norm[rows])
+            num_matched_terms[rows] += 1
+
+        matches = np.flatnonzero(num_matched_terms == len(terms))
+        top = matches[np.argsort(-scores[matches], kind="stable")[:limit]]
+        return top.tolist()
+
+
+@dataclass
+class _ChatroomIndex:
+    """Shards of a chatroom loaded for searching, valid as long as the shard files are unchanged."""
+    stamp: Tuple[Tuple[str, int], ...]
+    embeddings: List[np.ndarray]  # Memory-mapped, normalized float32 matrices, one per document
+    chunk_ids: List[str] = field(default_factory=list)
+    filenames: List[str] = field(default_factory=list)
+    contents: List[str] = field(default_factory=list)
+    bm25: Optional[BM25Index] = None
+
+
+class LocalChunkIndex:
+    """
+    In-process alternative to hybrid_search, for deployments where the Supabase round trip dominates retrieval latency.
+
+    Each document's chunk embeddings are stored as a normalized float32 `.npy` shard under `<root>/<chatroom_id>/`,
+    next to a JSON file with the chunk IDs, filename and contents. Shards are memory-mapped and scored with a single
+    matrix product per document, and a BM25 index over the contents is built in memory on first use. Both rankings
+    are fused with RRF like hybrid_search, and results have the same shape.
+
+    Shards are written when documents are embedded and removed when documents or chatrooms are deleted. Chatrooms
+    indexed for the first time are synced from Supabase once, so that documents uploaded before enabling the local
+    backend are included. Workers on the same host share the shards and reload them when their files change.
+    """
+    SYNCED_MARKER = ".synced"
+    SYNC_PAGE_SIZE = 1000
+
+
+    def __init__(self, root: str | Path, supabase: Client, max_loaded_chatrooms: int):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.supabase = supabase
+
+        self._loaded: LRUCache = LRUCache(maxsize=max_loaded_chatrooms)
+        self._lock = Lock()
+        self._sync_locks: Dict[str, Lock] = defaultdict(Lock)
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+
+    def _chatroom_dir(self, chatroom_id: str) -> Path:
+        return self.root / chatroom_id
+
+
+    def add_document(
+        self,
+        chatroom_id: str,
+        document_id: str,
+        filename: str,
+        chunk_ids: List[str],
+        contents: List[str],
+        embeddings: List[List[float]]
+    ) -> None:
+        chatroom_dir = self._chatroom_dir(chatroom_id)
+        chatroom_dir.mkdir(parents=True, exist_ok=True)
+
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(contents), -1)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+        # Write the metadata first and replace atomically, so that a shard is only visible once complete
+        metadata_path = chatroom_dir / f"{document_id}.json"
+        with open(metadata_path.with_suffix(".json.tmp"), "wb") as f:
+            f.write(orjson.dumps({"filename": filename, "chunk_ids": chunk_ids, "contents": contents}))
+        os.replace(metadata_path.with_suffix(".json.tmp"), metadata_path)
+
+        shard_path = chatroom_dir / f"{document_id}.npy"
+        with open(shard_path.with_suffix(".npy.tmp"), "wb") as f:
+            np.save(f, matrix)
+        os.replace(shard_path.with_suffix(".npy.tmp"), shard_path)
+
+        self.logger.debug(f"Added shard of {len(contents)} chunks of document {document_id} to chatroom {chatroom_id}")
+
+
+    def remove_document(self, chatroom_id: str, document_id: str) -> None:
+        chatroom_dir = self._chatroom_dir(chatroom_id)
+        (chatroom_dir / f"{document_id}.npy").unlink(missing_ok=True)
+        (chatroom_dir / f"{document_id}.json").unlink(missing_ok=True)
+
+
+    def remove_chatroom(self, chatroom_id: str) -> None:
+        shutil.rmtree(self._chatroom_dir(chatroom_id), ignore_errors=True)
+        with self._lock:
+            self._loaded.pop(chatroom_id, None)
+
+
+    def sync_chatroom(self, chatroom_id: str) -> None:
+        """Rebuilds the chatroom's shards from the chunks stored in Supabase."""
+        chunks_by_document: Dict[str, List[dict]] = defaultdict(list)
+        filenames: Dict[str, str] = {}
+        start = 0
+        while True:
+            response = (
+                self.supabase.table("chunks")
+                .select("chunk_id, document_id, chunk_index, content, embedding, documents(filename)")
+                .eq("chatroom_id", chatroom_id)
+                .order("chunk_id")
+                .range(start, start + self.SYNC_PAGE_SIZE - 1)
+                .execute()
+            )
+            for chunk in response.data:
+                chunks_by_document[chunk["document_id"]].append(chunk)
+                filenames[chunk["document_id"]] = chunk["documents"]["filename"]
+            if len(response.data) < self.SYNC_PAGE_SIZE:
+                break
+            start += self.SYNC_PAGE_SIZE
+
+        chatroom_dir = self._chatroom_dir(chatroom_id)
+        chatroom_dir.mkdir(parents=True, exist_ok=True)
+        for shard_path in chatroom_dir.glob("*.npy"):
+            if shard_path.stem not in chunks_by_document:
+                self.remove_document(chatroom_id, shard_path.stem)
+
+        for document_id, chunks in chunks_by_document.items():
+            chunks.sort(key=lambda chunk: chunk["chunk_index"])
+            self.add_document(
+                chatroom_id,
+                document_id,
+                filenames[document_id],
+                chunk_ids=[chunk["chunk_id"] for chunk in chunks],
+                contents=[chunk["content"] for chunk in chunks],
+                # PostgREST returns vectors in their text representation, which happens to be a JSON array
+                embeddings=[orjson.loads(chunk["embedding"]) for chunk in chunks]
+            )
+
+        (chatroom_dir / self.SYNCED_MARKER).touch()
+        metrics.increment("local_index_syncs_total")
+        self.logger.info(f"Synced {sum(len(chunks) for chunks in chunks_by_document.values())} chunks of chatroom {chatroom_id} from Supabase")
+
+
+    def version(self, chatroom_id: str) -> Tuple[Tuple[str, int], ...]:
+        """Returns the names and modification times of the chatroom's shards, which change with every added or removed document."""
+        try:
+            with os.scandir(self._chatroom_dir(chatroom_id)) as entries:
+                shard_entries = sorted((entry for entry in entries if entry.name.endswith(".npy")), key=lambda entry: entry.name)
+                return tuple((entry.name, entry.stat().st_mtime_ns) for entry in shard_entries)
+        except FileNotFoundError:
+            return ()
+
+
+    def _load(self, chatroom_id: str) -> _ChatroomIndex:
+        chatroom_dir = self._chatroom_dir(chatroom_id)
+        if not (chatroom_dir / self.SYNCED_MARKER).exists():
+            with self._sync_locks[chatroom_id]:
+                if not (chatroom_dir / self.SYNCED_MARKER).exists():
+                    self.sync_chatroom(chatroom_id)
+
+        stamp = self.version(chatroom_id)
+        with self._lock:
+            index = self._loaded.get(chatroom_id)
+        if index is not None and index.stamp == stamp:
+            return index
+
+        index = _ChatroomIndex(stamp=stamp, embeddings=[])
+        for name, _ in stamp:
+            shard_path = chatroom_dir / name
+            try:
+                with open(shard_path.with_suffix(".json"), "rb") as f:
+                    metadata = orjson.loads(f.read())
+                embeddings = np.load(shard_path, mmap_mode="r")
+            except FileNotFoundError:
+                continue  # Removed concurrently
+
+            index.embeddings.append(embeddings)
+            index.chunk_ids.extend(metadata["chunk_ids"])
+            index.filenames.extend([metadata["filename"]] * len(metadata["chunk_ids"]))
+            index.contents.extend(metadata["contents"])
+
+        with self._lock:
+            self._loaded[chatroom_id] = index
+        metrics.increment("local_index_loads_total")
+        return index
+
+
+    def search(
+        self,
+        chatroom_id: str,
+        query_embedding: np.ndarray,
+        query: str,
+        match_count: int,
+        rrf_k: int,
+        vector_weight: float,
+        text_weight: float
+    ) -> List[dict]:
+        """Returns the chatroom's chunks best matching the query, in the same format as hybrid_search."""
+        index = self._load(chatroom_id)
+        if not index.embeddings:
+            return []
+        num_candidates = match_count * 3
+
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        query_embedding = query_embedding / max(float(np.linalg.norm(query_embedding)), 1e-12)
+        similarities = np.concatenate([shard @ query_embedding for shard in index.embeddings])
+        num_vector_candidates = min(num_candidates, len(similarities))
+        vector_candidates = np.argpartition(-similarities, num_vector_candidates - 1)[:num_vector_candidates]
+        vector_ranking = vector_candidates[np.argsort(-similarities[vector_candidates], kind="stable")].tolist()
+
+        if index.bm25 is None:
+            index.bm25 = BM25Index(index.contents)
+        text_ranking = index.bm25.search(query, num_candidates)
+
+        scores = reciprocal_rank_fusion([(vector_ranking, vector_weight), (text_ranking, text_weight)], rrf_k)
+        top_rows = sorted((row for row, score in scores.items() if score > 0), key=lambda row: -scores[row])[:match_count]
+
+        return [
+            {
+                "chunk_id": index.chunk_ids[row],
+                "filename": index.filenames[row],
+                "content": index.contents[row],
+                "rrf_score": scores[row]
+            }
+            for row in top_rows
+        ]
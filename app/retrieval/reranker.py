@@ -0,0 +1,145 @@
+from abc import ABC, abstractmethod
+import logging
+from threading import Lock
+import time
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from app import metrics
+from app.retrieval.local_index import tokenize
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:
+    CrossEncoder = None
+
+
+class Reranker(ABC):
+    """
+    Reorders over-fetched hybrid search candidates by a relevance score of each (query, chunk content) pair, and keeps
+    the best `top_k` of them.
+
+    The relevance scores (between 0 and 1) are blended with the candidates' RRF scores, normalized by the best one,
+    with `prior_weight`. Candidates scoring below `min_relative_score` times the best candidate's score are dropped, so
+    that fewer but more relevant chunks reach the prompt.
+    """
+    name = "reranker"
+
+
+    def __init__(self, prior_weight: float, min_relative_score: float):
+        self.prior_weight = prior_weight
+        self.min_relative_score = min_relative_score
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+
+    @abstractmethod
+    def score(self, query: str, contents: Sequence[str]) -> np.ndarray:
+        """Returns the relevance of each content to the query, between 0 and 1."""
+
+
+    def rerank(self, query: str, chunks: List[dict], top_k: int) -> List[dict]:
+        """Returns the `top_k` most relevant chunks (in the format of hybrid_search), with their `rerank_score`."""
+        if not chunks:
+            return []
+
+        start_time = time.perf_counter()
+        relevance = self.score(query, [chunk["content"] for chunk in chunks])
+        prior = np.array([chunk["rrf_score"] for chunk in chunks], dtype=np.float32)
+        prior /= max(float(prior.max()), 1e-12)
+        scores = (1 - self.prior_weight) * relevance + self.prior_weight * prior
+
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        threshold = self.min_relative_score * scores[order[0]]
+        reranked = [{**chunks[i], "rerank_score": float(scores[i])} for i in order if scores[i] >= threshold]
+
+        metrics.observe("rerank_seconds", time.perf_counter() - start_time)
+        metrics.increment("rerank_candidates_total", len(chunks))
+        metrics.increment("rerank_results_total", len(reranked))
+        return reranked
+
+
+    def stats(self) -> dict:
+        return {"type": self.name, "prior_weight": self.prior_weight, "min_relative_score": self.min_relative_score}
+
+
+class LexicalReranker(Reranker):
+    """
+    Scores candidates by how well their content covers the query, computed over all candidates at once:
+    - Term score: BM25-saturated frequencies of the query terms, weighted by their IDF among the candidates and
+      normalized to [0, 1], so that chunks containing the rare query terms rank first.
+    - Phrase score: Fraction of the query's consecutive term pairs that also occur consecutively in the content.
+
+    Needs no model and takes well under a millisecond for a few dozen candidates, but cannot recognize paraphrases;
+    the RRF prior keeps the semantic matches of the vector search in play.
+    """
+    name = "lexical"
+    K1 = 1.2
+    B = 0.75
+    PHRASE_WEIGHT = 0.25
+
+
+    def score(self, query: str, contents: Sequence[str]) -> np.ndarray:
+        query_tokens = tokenize(query)
+        terms: Dict[str, int] = {}
+        for token in query_tokens:
+            terms.setdefault(token, len(terms))
+        if not terms:
+            return np.zeros(len(contents), dtype=np.float32)
+
+        term_frequencies = np.zeros((len(contents), len(terms)), dtype=np.float32)
+        lengths = np.zeros(len(contents), dtype=np.float32)
+        bigrams = {(terms[first], terms[second]) for first, second in zip(query_tokens, query_tokens[1:])}
+        phrase_matches = np.zeros(len(contents), dtype=np.float32)
+        for row, content in enumerate(contents):
+            column_ids = [terms.get(token, -1) for token in tokenize(content)]
+            lengths[row] = len(column_ids)
+            matched = np.array([column for column in column_ids if column >= 0], dtype=np.int64)
+            np.add.at(term_frequencies[row], matched, 1)
+            if bigrams:
+                phrase_matches[row] = len(bigrams & set(zip(column_ids, column_ids[1:])))
+
+        document_frequencies = (term_frequencies > 0).sum(axis=0)
+        idf = np.log1p((len(contents) - document_frequencies + 0.5) / (document_frequencies + 0.5))
+        length_norms = 1 - self.B + self.B * lengths / max(float(lengths.mean()), 1.0)
+        saturated = term_frequencies * (self.K1 + 1) / (term_frequencies + self.K1 * length_norms[:, None])
+        term_scores = saturated @ idf / ((self.K1 + 1) * max(float(idf.sum()), 1e-12))
+
+        if not bigrams:
+            return term_scores
+        return (1 - self.PHRASE_WEIGHT) * term_scores + self.PHRASE_WEIGHT * phrase_matches / len(bigrams)
+
+
+class CrossEncoderReranker(Reranker):
+    """
+    Scores candidates with a small cross-encoder (e.g., an MS MARCO MiniLM), which reads query and content together
+    on the CPU. Requires the optional `sentence-transformers` package; the model is downloaded on first use.
+    """
+    name = "cross-encoder"
+
+
+    def __init__(self, model_name: str, prior_weight: float, min_relative_score: float, batch_size: int = 32):
+        super().__init__(prior_weight, min_relative_score)
+        if CrossEncoder is None:
+            raise RuntimeError('RERANKER="cross-encoder" requires sentence-transformers: pip install sentence-transformers')
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = CrossEncoder(model_name, device="cpu")
+        # Concurrent predictions would only compete for the same CPU cores
+        self._lock = Lock()
+
+
+    def score(self, query: str, contents: Sequence[str]) -> np.ndarray:
+        with self._lock:
+            logits = self.model.predict(
+                [(query, content) for content in contents],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            )
+        return 1 / (1 + np.exp(-np.asarray(logits, dtype=np.float32)))
+
+
+    def stats(self) -> dict:
+        return {**super().stats(), "model": self.model_name}
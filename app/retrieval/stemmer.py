@@ -0,0 +1,150 @@
+from functools import lru_cache
+from typing import Optional
+
+# Snowball English ("Porter2") stemmer, as used by the 'english' text search configuration of PostgreSQL, so that the
+# local lexical search matches the same word forms as plainto_tsquery('english', ...) in hybrid_search.
+# Tokens never contain apostrophes (see `tokenize`), so the apostrophe handling of the algorithm is left out.
+# https://snowballstem.org/algorithms/english/stemmer.html
+
+VOWELS = frozenset("aeiouy")
+DOUBLES = ("bb", "dd", "ff", "gg", "mm", "nn", "pp", "rr", "tt")
+LI_ENDINGS = frozenset("cdeghkmnrt")
+
+EXCEPTIONS = {
+    "skis": "ski", "skies": "sky", "dying": "die", "lying": "lie", "tying": "tie",
+    "idly": "idl", "gently": "gentl", "ugly": "ugli", "early": "earli", "only": "onli", "singly": "singl",
+    "sky": "sky", "news": "news", "howe": "howe", "atlas": "atlas", "cosmos": "cosmos", "bias": "bias", "andes": "andes"
+}
+# Left unchanged after step 1a
+INVARIANTS = frozenset({"inning", "outing", "canning", "herring", "earring", "proceed", "exceed", "succeed"})
+R1_PREFIXES = ("gener", "commun", "arsen")
+
+STEP_2_SUFFIXES = [
+    ("ization", "ize"), ("ational", "ate"), ("fulness", "ful"), ("ousness", "ous"), ("iveness", "ive"),
+    ("tional", "tion"), ("biliti", "ble"), ("lessli", "less"), ("entli", "ent"), ("ation", "ate"), ("alism", "al"),
+    ("aliti", "al"), ("ousli", "ous"), ("iviti", "ive"), ("fulli", "ful"), ("enci", "ence"), ("anci", "ance"),
+    ("abli", "able"), ("izer", "ize"), ("ator", "ate"), ("alli", "al"), ("bli", "ble"), ("ogi", "og"), ("li", "")
+]
+STEP_3_SUFFIXES = [
+    ("ational", "ate"), ("tional", "tion"), ("alize", "al"), ("icate", "ic"), ("iciti", "ic"), ("ative", ""),
+    ("ical", "ic"), ("ness", ""), ("ful", "")
+]
+STEP_4_SUFFIXES = [
+    "ement", "ance", "ence", "able", "ible", "ment", "ant", "ent", "ism", "ate", "iti", "ous", "ive", "ize", "ion",
+    "al", "er", "ic"
+]
+
+
+def _is_vowel(word: str, i: int) -> bool:
+    return word[i] in VOWELS
+
+
+def _region_start(word: str, start: int) -> int:
+    """Returns the start of the region after the first non-vowel following a vowel, from `start` on."""
+    for i in range(start + 1, len(word)):
+        if not _is_vowel(word, i) and _is_vowel(word, i - 1):
+            return i + 1
+    return len(word)
+
+
+def _ends_with_short_syllable(word: str) -> bool:
+    if len(word) == 2:
+        return _is_vowel(word, 0) and not _is_vowel(word, 1)
+    return (
+        len(word) > 2
+        and not _is_vowel(word, -3)
+        and _is_vowel(word, -2)
+        and not _is_vowel(word, -1)
+        and word[-1] not in "wxY"
+    )
+
+
+def _longest_suffix(word: str, suffixes) -> Optional[str]:
+    return max((suffix for suffix in suffixes if word.endswith(suffix)), key=len, default=None)
+
+
+@lru_cache(maxsize=65_536)
+def stem(word: str) -> str:
+    """Returns the stem of a lowercase English word."""
+    if len(word) <= 2:
+        return word
+    if word in EXCEPTIONS:
+        return EXCEPTIONS[word]
+
+    # Consonant y's are marked as Y
+    chars = list(word)
+    for i, char in enumerate(chars):
+        if char == "y" and (i == 0 or chars[i - 1] in VOWELS):
+            chars[i] = "Y"
+    word = "".join(chars)
+
+    r1 = next((len(prefix) for prefix in R1_PREFIXES if word.startswith(prefix)), None)
+    if r1 is None:
+        r1 = _region_start(word, 0)
+    r2 = _region_start(word, r1)
+
+    # Step 1a: Plurals
+    suffix = _longest_suffix(word, ("sses", "ied", "ies", "us", "ss", "s"))
+    if suffix == "sses":
+        word = word[:-2]
+    elif suffix in ("ied", "ies"):
+        word = word[:-3] + ("i" if len(word) > 4 else "ie")
+    elif suffix == "s" and any(_is_vowel(word, i) for i in range(len(word) - 2)):
+        word = word[:-1]
+
+    if word in INVARIANTS:
+        return word
+
+    # Step 1b: Past tense and gerunds
+    suffix = _longest_suffix(word, ("eed", "eedly", "ed", "edly", "ing", "ingly"))
+    if suffix in ("eed", "eedly"):
+        if len(word) - len(suffix) >= r1:
+            word = word[:-len(suffix)] + "ee"
+    elif suffix is not None:
+        stem_part = word[:-len(suffix)]
+        if any(_is_vowel(stem_part, i) for i in range(len(stem_part))):
+            word = stem_part
+            if word.endswith(("at", "bl", "iz")):
+                word += "e"
+            elif word.endswith(DOUBLES):
+                word = word[:-1]
+            elif r1 >= len(word) and _ends_with_short_syllable(word):
+                word += "e"
+
+    # Step 1c
+    if len(word) > 2 and word[-1] in "yY" and not _is_vowel(word, -2):
+        word = word[:-1] + "i"
+
+    # Step 2: Derivational suffixes
+    suffix = _longest_suffix(word, [suffix for suffix, _ in STEP_2_SUFFIXES])
+    if suffix is not None and len(word) - len(suffix) >= r1:
+        replacement = dict(STEP_2_SUFFIXES)[suffix]
+        if suffix == "ogi":
+            if word[-4:-3] == "l":
+                word = word[:-3] + replacement
+        elif suffix == "li":
+            if word[-3:-2] in LI_ENDINGS and len(word) > 2:
+                word = word[:-2]
+        else:
+            word = word[:-len(suffix)] + replacement
+
+    # Step 3
+    suffix = _longest_suffix(word, [suffix for suffix, _ in STEP_3_SUFFIXES])
+    if suffix is not None and len(word) - len(suffix) >= r1:
+        if suffix != "ative" or len(word) - len(suffix) >= r2:
+            word = word[:-len(suffix)] + dict(STEP_3_SUFFIXES)[suffix]
+
+    # Step 4
+    suffix = _longest_suffix(word, STEP_4_SUFFIXES)
+    if suffix is not None and len(word) - len(suffix) >= r2:
+        if suffix != "ion" or word[-4:-3] in ("s", "t"):
+            word = word[:-len(suffix)]
+
+    # Step 5
+    if word.endswith("e"):
+        if len(word) - 1 >= r2 or (len(word) - 1 >= r1 and not _ends_with_short_syllable(word[:-1])):
+            word = word[:-1]
+    elif word.endswith("ll") and len(word) - 1 >= r2:
+        word = word[:-1]
+
+    return word.replace("Y", "y")
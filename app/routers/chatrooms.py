@@ -1,10 +1,14 @@
 import logging
+from typing import List
 
 from fastapi import APIRouter, HTTPException, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
+from supabase import AsyncClient
 
-from app.dependencies import get_supabase
+from app.cache import CHATROOM, CHATROOM_DOCUMENTS, CHATROOM_MESSAGES, USER_CHATROOMS
+from app.dependencies import get_async_supabase, get_local_index, get_read_cache, get_settings
+from app.responses import stream_rpc_response
 
 router = APIRouter(
     prefix="/api/chatrooms",
@@ -22,24 +26,52 @@ class EditChatroomRequest(BaseModel):
     name: str
 
 
+async def _get_member_ids(supabase: AsyncClient, chatroom_id: str) -> List[str]:
+    """Returns the user IDs of the chatroom's members, whose cached chatroom lists include the chatroom."""
+    response = await (
+        supabase.table("members")
+        .select("user_id")
+        .eq("chatroom_id", chatroom_id)
+        .execute()
+    )
+    return [member["user_id"] for member in response.data or []]
+
+
 @router.get("")
 async def get_chatrooms(request: Request) -> JSONResponse:
     """Retrieves the chatrooms for a specific user."""
     try:
         user_id = request.state.user_id
-        supabase = get_supabase()
+        supabase = get_async_supabase()
+        read_cache = get_read_cache()
+
+        generation = read_cache.generation()
+        cached_chatrooms = read_cache.get(USER_CHATROOMS, user_id)
+        if cached_chatrooms is not None:
+            logger.debug(f"GET - {router.prefix}\nFound {len(cached_chatrooms)} cached chatroom{'s' if len(cached_chatrooms) != 1 else ''} for user {user_id}")
+            return ORJSONResponse(
+                status_code=status.HTTP_200_OK,
+                content=cached_chatrooms
+            )
 
-        response = supabase.rpc("get_user_chatrooms_ordered", {"p_user_id": user_id}).execute()
+        if get_settings().POSTGREST_PASSTHROUGH_RESPONSES:
+            logger.debug(f"GET - {router.prefix}\nStreaming chatrooms for user {user_id}")
+            return await stream_rpc_response("get_user_chatrooms_ordered", {"p_user_id": user_id})
+
+        response = await supabase.rpc("get_user_chatrooms_ordered", {"p_user_id": user_id}).execute()
 
         if response.data is None:
             response.data = []
 
+        read_cache.set(USER_CHATROOMS, user_id, response.data, generation=generation)
         logger.debug(f"GET - {router.prefix}\nFound {len(response.data)} chatroom{'s' if len(response.data) != 1 else ''} for user {user_id}")
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
             content=response.data
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"GET - {router.prefix}\nError fetching chatrooms: {str(e)}")
         raise HTTPException(
@@ -52,9 +84,19 @@ async def get_chatrooms(request: Request) -> JSONResponse:
 async def get_chatroom(chatroom_id: str) -> JSONResponse:
     """Retrieves a specific chatroom."""
     try:
-        supabase = get_supabase()
+        supabase = get_async_supabase()
+        read_cache = get_read_cache()
+
+        generation = read_cache.generation()
+        cached_chatroom = read_cache.get(CHATROOM, chatroom_id)
+        if cached_chatroom is not None:
+            logger.debug(f"GET - {router.prefix}/{chatroom_id}\nFound cached chatroom: {cached_chatroom['name']}")
+            return JSONResponse(
+                status_code=status.HTTP_200_OK,
+                content=cached_chatroom
+            )
 
-        response = (
+        response = await (
             supabase.table("chatrooms")
             .select("chatroom_id, name, creator_id")
             .eq("chatroom_id", chatroom_id)
@@ -69,7 +111,8 @@ async def get_chatroom(chatroom_id: str) -> JSONResponse:
                 detail="Chatroom not found"
             )
 
-        logger.debug(f"GET - {router.prefix}/{chatroom_id}\nFound chatroom: {response.data.name}")
+        read_cache.set(CHATROOM, chatroom_id, response.data, generation=generation)
+        logger.debug(f"GET - {router.prefix}/{chatroom_id}\nFound chatroom: {response.data['name']}")
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -88,10 +131,10 @@ async def create_chatroom(request: Request, body: CreateChatroomRequest) -> JSON
     """Creates a new chatroom."""
     try:
         user_id = request.state.user_id
-        supabase = get_supabase()
+        supabase = get_async_supabase()
 
         # Insert new chatroom entry into DB
-        chatroom_response = (
+        chatroom_response = await (
             supabase.table("chatrooms")
             .insert({
                 "creator_id": user_id,
@@ -103,10 +146,11 @@ async def create_chatroom(request: Request, body: CreateChatroomRequest) -> JSON
         # Add creator as member of the chatroom
         if chatroom_response.data:
             chatroom_id = chatroom_response.data[0]["chatroom_id"]
-            supabase.table("members").insert({
+            await supabase.table("members").insert({
                 "chatroom_id": chatroom_id,
                 "user_id": user_id
             }).execute()
+            get_read_cache().invalidate(USER_CHATROOMS, user_id)
 
         logger.debug(f"POST - {router.prefix}\nUser {user_id} created chatroom: {body.name}")
 
@@ -126,9 +170,9 @@ async def create_chatroom(request: Request, body: CreateChatroomRequest) -> JSON
 async def edit_chatroom(chatroom_id: str, body: EditChatroomRequest) -> JSONResponse:
     """Edits an existing chatroom."""
     try:
-        supabase = get_supabase()
+        supabase = get_async_supabase()
 
-        response = (
+        response = await (
             supabase.table("chatrooms")
             .update({"name": body.name})
             .eq("chatroom_id", chatroom_id)
@@ -142,6 +186,12 @@ async def edit_chatroom(chatroom_id: str, body: EditChatroomRequest) -> JSONResp
                 detail="Chatroom not found"
             )
 
+        # Chatroom name is part of every member's chatroom list
+        read_cache = get_read_cache()
+        read_cache.invalidate(CHATROOM, chatroom_id)
+        for member_id in await _get_member_ids(supabase, chatroom_id):
+            read_cache.invalidate(USER_CHATROOMS, member_id)
+
         logger.debug(f"PUT - {router.prefix}/{chatroom_id}\nUpdated chatroom name to: {body.name}")
 
         return JSONResponse(
@@ -164,10 +214,10 @@ async def edit_chatroom(chatroom_id: str, body: EditChatroomRequest) -> JSONResp
 async def delete_chatroom(chatroom_id: str) -> JSONResponse:
     """Deletes a chatroom."""
     try:
-        supabase = get_supabase()
+        supabase = get_async_supabase()
 
         # Clean up remaining document files in the chatroom (raw files)
-        documents_response = (
+        documents_response = await (
             supabase.table("documents")
             .select("document_id")
             .eq("chatroom_id", chatroom_id)
@@ -176,33 +226,44 @@ async def delete_chatroom(chatroom_id: str) -> JSONResponse:
 
         documents_paths = [f"{chatroom_id}/{doc['document_id']}" for doc in documents_response.data]
         documents_paths.append(chatroom_id)  # Delete chatroom folder from storage
-        (
+        await (
             supabase.storage
             .from_("knowledge-bases")
             .remove(documents_paths)
         )
 
         # Clean up remaining attachment files in the chatroom (raw files)
-        attachments_response = supabase.rpc("get_chatroom_attachments", {"p_chatroom_id": chatroom_id}).execute()
+        attachments_response = await supabase.rpc("get_chatroom_attachments", {"p_chatroom_id": chatroom_id}).execute()
 
         if attachments_response.data:
             attachments_paths = [f"{chatroom_id}/{att['attachment_id']}" for att in attachments_response.data]
             attachments_paths.append(chatroom_id)  # Delete chatroom folder from storage
-            (
+            await (
                 supabase.storage
                 .from_("attachments")
                 .remove(attachments_paths)
             )
 
+        # Memberships are deleted along with the chatroom
+        member_ids = await _get_member_ids(supabase, chatroom_id)
+
         # Delete the chatroom entry in DB
         # Deletion of other associated data such as messages, invites, and document entries are cascaded
-        (
+        await (
             supabase.table("chatrooms")
             .delete()
             .eq("chatroom_id", chatroom_id)
             .execute()
         )
 
+        read_cache = get_read_cache()
+        for namespace in (CHATROOM, CHATROOM_DOCUMENTS, CHATROOM_MESSAGES):
+            read_cache.invalidate(namespace, chatroom_id)
+        for member_id in member_ids:
+            read_cache.invalidate(USER_CHATROOMS, member_id)
+        if get_settings().RETRIEVAL_BACKEND == "local":
+            get_local_index().remove_chatroom(chatroom_id)
+
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
@@ -223,10 +284,10 @@ async def delete_chatroom(chatroom_id: str) -> JSONResponse:
 async def remove_member(chatroom_id: str, user_id: str) -> JSONResponse:
     """Removes a user from a chatroom (i.e., leaving the chatroom)."""
     try:
-        supabase = get_supabase()
+        supabase = get_async_supabase()
 
         # Delete user from chatroom members
-        response = (
+        response = await (
             supabase.table("members")
             .delete()
             .eq("chatroom_id", chatroom_id)
@@ -241,6 +302,8 @@ async def remove_member(chatroom_id: str, user_id: str) -> JSONResponse:
                 detail="User not found"
             )
 
+        get_read_cache().invalidate(USER_CHATROOMS, user_id)
+
         logger.debug(f"DELETE - {router.prefix}/{chatroom_id}/user/{user_id}\nRemoved user {user_id} from chatroom {chatroom_id}")
 
         return JSONResponse(
@@ -14,11 +14,13 @@ from fastapi import (
     status,
     UploadFile
 )
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 
+from app.cache import CHATROOM_DOCUMENTS
 from app.constants import MAX_FILE_SIZE_MB
-from app.dependencies import get_supabase
+from app.dependencies import get_async_supabase, get_local_index, get_read_cache, get_settings
 from app.pipelines import ImagePipeline, PdfPipeline
+from app.responses import stream_rpc_response
 
 router = APIRouter(
     prefix="/api/documents",
@@ -100,19 +102,36 @@ async def upload_document(
 async def get_documents(chatroom_id: str) -> JSONResponse:
     """Retrieves all documents for a specific chatroom."""
     try:
-        supabase = get_supabase()
+        supabase = get_async_supabase()
+        read_cache = get_read_cache()
 
-        response = supabase.rpc("get_chatroom_documents", {"p_chatroom_id": chatroom_id}).execute()
+        generation = read_cache.generation()
+        cached_documents = read_cache.get(CHATROOM_DOCUMENTS, chatroom_id)
+        if cached_documents is not None:
+            logger.debug(f"GET - {router.prefix}\nRetrieved {len(cached_documents)} cached document{'s' if len(cached_documents) != 1 else ''}")
+            return ORJSONResponse(
+                status_code=status.HTTP_200_OK,
+                content=cached_documents
+            )
+
+        if get_settings().POSTGREST_PASSTHROUGH_RESPONSES:
+            logger.debug(f"GET - {router.prefix}\nStreaming documents for chatroom {chatroom_id}")
+            return await stream_rpc_response("get_chatroom_documents", {"p_chatroom_id": chatroom_id})
+
+        response = await supabase.rpc("get_chatroom_documents", {"p_chatroom_id": chatroom_id}).execute()
 
         if response.data is None:
             response.data = []
 
+        read_cache.set(CHATROOM_DOCUMENTS, chatroom_id, response.data, generation=generation)
         logger.debug(f"GET - {router.prefix}\nRetrieved {len(response.data)} document{'s' if len(response.data) != 1 else ''}")
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
             content=response.data
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"GET - {router.prefix}\nError: {e}")
         raise HTTPException(
@@ -124,10 +143,10 @@ async def get_documents(chatroom_id: str) -> JSONResponse:
 async def delete_document(document_id: str) -> JSONResponse:
     """Deletes a document (both the DB entry and the raw file)."""
     try:
-        supabase = get_supabase()
+        supabase = get_async_supabase()
 
         # Delete document entry in DB
-        document_response = (
+        document_response = await (
             supabase.table("documents")
             .delete()
             .eq("document_id", document_id)
@@ -135,12 +154,16 @@ async def delete_document(document_id: str) -> JSONResponse:
         )
 
         # Delete raw document file from storage
-        (
+        await (
             supabase.storage
             .from_("knowledge-bases")
             .remove([f"{document_response.data[0]['chatroom_id']}/{document_id}"])
         )
 
+        get_read_cache().invalidate(CHATROOM_DOCUMENTS, document_response.data[0]['chatroom_id'])
+        if get_settings().RETRIEVAL_BACKEND == "local":
+            get_local_index().remove_document(document_response.data[0]['chatroom_id'], document_id)
+
         logger.debug(f"DELETE - {router.prefix}/{document_id}\nDeleted document")
 
         return JSONResponse(
@@ -1,10 +1,12 @@
 import logging
 
 from fastapi import APIRouter, HTTPException, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
 
-from app.dependencies import get_supabase
+from app.cache import USER_CHATROOMS
+from app.dependencies import get_async_supabase, get_read_cache, get_settings
+from app.responses import stream_rpc_response
 
 router = APIRouter(
     prefix="/api/invites",
@@ -37,20 +39,26 @@ async def get_pending_invites(request: Request) -> JSONResponse:
     """Get all pending invites for a user"""
     try:
         user_id = request.state.user_id
-        supabase = get_supabase()
+        supabase = get_async_supabase()
 
-        response = supabase.rpc("get_user_pending_invites", {"p_user_id": user_id}).execute()
+        if get_settings().POSTGREST_PASSTHROUGH_RESPONSES:
+            logger.debug(f"GET - {router.prefix}\nStreaming pending invites for {user_id}")
+            return await stream_rpc_response("get_user_pending_invites", {"p_user_id": user_id})
+
+        response = await supabase.rpc("get_user_pending_invites", {"p_user_id": user_id}).execute()
 
         if response.data is None:
             response.data = []
 
         logger.debug(f"GET - {router.prefix}\nFound {len(response.data)} pending invite{'s' if len(response.data) != 1 else ''} for {user_id}")
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
             content=response.data
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"GET - {router.prefix}\nError fetching invites: {str(e)}")
         raise HTTPException(
@@ -64,12 +72,12 @@ async def send_invite(request: Request, body: SendInviteRequest) -> JSONResponse
     """Send an invite to a user"""
     try:
         user_id = request.state.user_id
-        supabase = get_supabase()
+        supabase = get_async_supabase()
 
         logger.debug(f"POST - {router.prefix}\nSending invite from {user_id} to {body.recipient_username} for chatroom {body.chatroom_id}")
 
         # Get recipient user ID by username
-        user_response = (
+        user_response = await (
             supabase.table("users")
             .select("user_id")
             .eq("username", body.recipient_username)
@@ -92,7 +100,7 @@ async def send_invite(request: Request, body: SendInviteRequest) -> JSONResponse
             )
 
         # Check if recipient is already a member
-        member_response = (
+        member_response = await (
             supabase.table("members")
             .select("user_id")
             .eq("user_id", recipient_id)
@@ -107,7 +115,7 @@ async def send_invite(request: Request, body: SendInviteRequest) -> JSONResponse
             )
 
         # Check if there's already a pending invite for the current chatroom
-        existing_invite_response = (
+        existing_invite_response = await (
             supabase.table("invites")
             .select("invite_id")
             .eq("recipient_id", recipient_id)
@@ -123,7 +131,7 @@ async def send_invite(request: Request, body: SendInviteRequest) -> JSONResponse
             )
 
         # Create the invite
-        invite_response = (
+        invite_response = await (
             supabase.table("invites")
             .insert({
                 "sender_id": user_id,
@@ -163,7 +171,7 @@ async def update_invite(request: Request, invite_id: str, body: UpdateInviteRequ
     """Update the status of an invite (ACCEPTED or REJECTED)"""
     try:
         user_id = request.state.user_id
-        supabase = get_supabase()
+        supabase = get_async_supabase()
 
         logger.debug(f"PUT - {router.prefix}/{invite_id}\nUser {user_id} updating invite {invite_id} to {body.status}")
 
@@ -174,7 +182,7 @@ async def update_invite(request: Request, invite_id: str, body: UpdateInviteRequ
             )
 
         # Verify the invite belongs to the current user and is pending
-        invite_check = (
+        invite_check = await (
             supabase.table("invites")
             .select("status, recipient_id")
             .eq("invite_id", invite_id)
@@ -204,7 +212,7 @@ async def update_invite(request: Request, invite_id: str, body: UpdateInviteRequ
             )
 
         # Update the invite status
-        response = (
+        response = await (
             supabase.table("invites")
             .update({
                 "status": body.status
@@ -221,7 +229,7 @@ async def update_invite(request: Request, invite_id: str, body: UpdateInviteRequ
 
         if body.status == "ACCEPTED":
             # Check if user is already a member (race condition protection)
-            existing_member = (
+            existing_member = await (
                 supabase.table("members")
                 .select("user_id")
                 .eq("user_id", user_id)
@@ -236,7 +244,7 @@ async def update_invite(request: Request, invite_id: str, body: UpdateInviteRequ
                 )
             else:
                 # Add user to members table
-                member_response = (
+                member_response = await (
                     supabase.table("members")
                     .insert({
                         "user_id": user_id,
@@ -247,7 +255,7 @@ async def update_invite(request: Request, invite_id: str, body: UpdateInviteRequ
 
                 if not member_response.data:
                     # Rollback invite status if member insertion fails
-                    supabase.table("invites").update({
+                    await supabase.table("invites").update({
                         "status": "PENDING"
                     }).eq("invite_id", invite_id).execute()
 
@@ -255,6 +263,8 @@ async def update_invite(request: Request, invite_id: str, body: UpdateInviteRequ
                         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                         detail="Failed to add user to chatroom"
                     )
+
+                get_read_cache().invalidate(USER_CHATROOMS, user_id)
         elif body.status == "REJECTED":
             # No additional action needed for rejection
             pass
@@ -1,22 +1,37 @@
+import asyncio
 import base64
-from io import BytesIO
+import binascii
+from datetime import datetime
+from functools import partial
+import json
 import logging
 from pathlib import Path
-from typing import Dict, List, Optional
+import time
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
 
 from fastapi import (
     APIRouter,
     File,
     Form,
     HTTPException,
+    Query,
     Request,
     status,
     UploadFile
 )
-from fastapi.responses import JSONResponse
-
-from app.dependencies import get_supabase
-from app.llms import openai_client
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.attachments import AttachmentBuffer, OpenAIFileCache
+from app.cache import CHATROOM_MESSAGES
+from app.constants import (
+    ATTACHMENT_UPLOAD_MAX_CONCURRENCY,
+    MESSAGES_PAGE_DEFAULT_SIZE,
+    MESSAGES_PAGE_MAX_SIZE
+)
+from app.dependencies import get_async_supabase, get_read_cache, get_settings
+from app.jobs import QueueFullError
+from app.responses import stream_rpc_response
 from app.workflows.graph import GroupGPTGraph
 
 router = APIRouter(
@@ -38,12 +53,32 @@ async def send_message(
     content: str = Form(...),
     attachments: Optional[List[UploadFile]] = File(None)
 ) -> JSONResponse:
-    """Sends a message to a chatroom, handling both regular messages and GroupGPT invocations."""
+    """
+    Sends a message to a chatroom, handling both regular messages and GroupGPT invocations.
+
+    GroupGPT invocations are handed to the background job queue; the response is returned as soon as the message is stored.
+    GroupGPT's answer is inserted into the chatroom when the job completes.
+    """
+    is_groupgpt_message = "@groupgpt" in content.lower()  # Check for GroupGPT mention
+    groupgpt_jobs = request.app.state.groupgpt_jobs
+
+    # Reserve the GroupGPT job before storing the message, so that the client can safely retry and a stored
+    # invocation is never left without a reply
+    groupgpt_job = None
+    if is_groupgpt_message:
+        try:
+            groupgpt_job = groupgpt_jobs.reserve(chatroom_id)
+        except QueueFullError:
+            logger.warning(f"POST - {router.prefix}\nGroupGPT job queue is saturated: {groupgpt_jobs.stats()}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="GroupGPT is handling too many requests. Please try again later."
+            )
+
     try:
         username = request.state.username
         user_id = request.state.user_id
-        supabase = get_supabase()
-        is_groupgpt_message = "@groupgpt" in content.lower()  # Check for GroupGPT mention
+        supabase = get_async_supabase()
 
         logger.debug(
             f"POST - {router.prefix}\n" +
@@ -64,7 +99,7 @@ async def send_message(
                 })
 
         # Insert message with attachments into DB in a single atomic transaction
-        message_response = supabase.rpc("insert_message_with_attachments", {
+        message_response = await supabase.rpc("insert_message_with_attachments", {
             "p_sender_id": user_id,
             "p_chatroom_id": chatroom_id,
             "p_content": content.strip(),
@@ -77,30 +112,45 @@ async def send_message(
                 detail="Failed to insert message into database"
             )
 
+        get_read_cache().invalidate(CHATROOM_MESSAGES, chatroom_id)
+
         message_id = message_response.data["message_record"]["message_id"]
         attachments_entries = message_response.data.get("attachments", [])
         attachments_map = {att["filename"]: att["attachment_id"] for att in attachments_entries}
 
+        # GroupGPT needs the attachments' contents after the uploaded files are closed, so they are read once and shared
+        # with the storage upload; otherwise each file is only read when its upload starts
+        attachment_buffers = []
+        if is_groupgpt_message and attachments:
+            attachment_buffers = [await AttachmentBuffer.from_upload(att) for att in attachments]
+
         # Upload attachments to Supabase storage
+        failed_attachments = []
         if attachments and len(attachments) > 0:
-            await _upload_attachments(
+            failed_attachments = await _upload_attachments(
                 chatroom_id=chatroom_id,
-                attachments=attachments,
+                attachments=attachment_buffers or attachments,
                 attachments_map=attachments_map
             )
 
-        # Handle GroupGPT invocation if needed
-        if is_groupgpt_message:
-            try:
-                await _invoke_groupgpt(
+        # Queue GroupGPT invocation if needed
+        groupgpt_job_id = None
+        if groupgpt_job is not None:
+            groupgpt_jobs.submit(
+                chatroom_id,
+                partial(
+                    _invoke_groupgpt,
+                    graph=request.app.state.groupgpt_graph,
                     username=username,
                     chatroom_id=chatroom_id,
                     content=content,
-                    attachments=attachments
-                )
-            except Exception as e:
-                logger.error(f"GroupGPT invocation failed: {str(e)}")
-                # Message is not rolled back since it is still a valid user message
+                    openai_files=request.app.state.openai_files,
+                    attachments=attachment_buffers
+                ),
+                job=groupgpt_job
+            )
+            groupgpt_job_id = groupgpt_job.job_id
+            groupgpt_job = None  # Submitted, so no longer released on errors below
 
         logger.debug(f"POST - {router.prefix}\nMessage sent successfully (ID: {message_id})")
 
@@ -108,10 +158,14 @@ async def send_message(
             status_code=status.HTTP_201_CREATED,
             content={
                 "message": "Message sent successfully",
-                "message_id": message_id
+                "message_id": message_id,
+                "groupgpt_job_id": groupgpt_job_id,
+                "failed_attachments": failed_attachments
             }
         )
     except Exception as e:
+        if groupgpt_job is not None:
+            groupgpt_jobs.release(groupgpt_job)
         logger.error(f"POST - {router.prefix}\nError sending message: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -121,34 +175,58 @@ async def send_message(
 
 async def _upload_attachments(
     chatroom_id: str,
-    attachments: List[UploadFile],
+    attachments: List[UploadFile] | List[AttachmentBuffer],
     attachments_map: Dict[str, str]
-) -> None:
-    """Helper function for uploading attachment files into Supabase storage."""
-    supabase = get_supabase()
+) -> List[Dict[str, str]]:
+    """
+    Helper function for uploading attachment files into Supabase storage.
+
+    Up to `ATTACHMENT_UPLOAD_MAX_CONCURRENCY` files are uploaded at the same time. Attachments that have already been
+    read are uploaded from their buffers, and uploaded files are only read right before their upload. Returns the
+    attachments that failed to upload, with their errors.
+    """
+    bucket = get_async_supabase().storage.from_("attachments")
+    semaphore = asyncio.Semaphore(ATTACHMENT_UPLOAD_MAX_CONCURRENCY)
+
+    async def upload(att: UploadFile | AttachmentBuffer) -> None:
+        attachment_id = attachments_map[att.filename]
+        async with semaphore:
+            buffer = att if isinstance(att, AttachmentBuffer) else await AttachmentBuffer.from_upload(att)
+            await bucket.upload(
+                f"{chatroom_id}/{attachment_id}",
+                buffer.content,
+                {"content-type": att.content_type, "upsert": "true"}
+            )
 
+    failed_attachments = []
+    uploads = []
     for att in attachments:
         if att.filename not in attachments_map:
             logger.error(f"No database entry found for filename: {att.filename}")
+            failed_attachments.append({"attachment_id": None, "filename": att.filename, "error": "No database entry found"})
             continue
+        uploads.append(att)
 
-        attachment_id = attachments_map[att.filename]
-        await att.seek(0)  # Reset file pointer to beginning
-        file_content = await att.read()
-
-        # Upload to Supabase storage
-        storage_path = f"{chatroom_id}/{attachment_id}"
-        supabase.storage.from_("attachments").upload(
-            path=storage_path,
-            file=file_content,
-            file_options={
-                "content-type": att.headers["content-type"],
-                "upsert": "true"
-            }
-        )
+    start_time = time.perf_counter()
+    results = await asyncio.gather(*[upload(att) for att in uploads], return_exceptions=True)
+
+    for att, result in zip(uploads, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to upload attachment {att.filename} (ID: {attachments_map[att.filename]}): {result}")
+            failed_attachments.append({"attachment_id": attachments_map[att.filename], "filename": att.filename, "error": str(result)})
+
+    logger.debug(f"Uploaded {len(uploads) - len(failed_attachments)} of {len(attachments)} attachments in {time.perf_counter() - start_time:.2f}s")
+    return failed_attachments
 
 
-async def _invoke_groupgpt(username: str, chatroom_id: str, content: str, attachments: Optional[List[UploadFile]] = None) -> str:
+async def _invoke_groupgpt(
+    graph: GroupGPTGraph,
+    username: str,
+    chatroom_id: str,
+    content: str,
+    openai_files: OpenAIFileCache,
+    attachments: Optional[List[AttachmentBuffer]] = None
+) -> str:
     """Helper function for invoking GroupGPT with the provided message and attachments."""
     # Remove @groupgpt mention from content
     content_without_mention = content.replace("@groupgpt", "", 1).strip()
@@ -157,8 +235,7 @@ async def _invoke_groupgpt(username: str, chatroom_id: str, content: str, attach
     files_data = []
     if attachments:
         for att in attachments:
-            await att.seek(0)  # Reset file pointer to beginning
-            file_content = await att.read()
+            file_content = att.content
             # Vertex AI requires PDFs to be uploaded as files
             # base64_content = base64.b64encode(file_content).decode("utf-8")
 
@@ -169,18 +246,12 @@ async def _invoke_groupgpt(username: str, chatroom_id: str, content: str, attach
             #     "data": base64_content
             # })
 
-            # Handling for PDF files upload to OpenAI files endpoint
+            # Handling for PDF files upload to OpenAI files endpoint; identical PDFs are only uploaded once
             if att.content_type == "application/pdf":
-                file_obj = BytesIO(file_content)
-                file_obj.name = att.filename or "attachment.pdf"
-                uploaded = openai_client.files.create(
-                    file=file_obj,
-                    purpose="assistants"
-                )
                 files_data.append({
                     "type": "file",
                     "file": {
-                        "file_id": uploaded.id
+                        "file_id": await openai_files.get_file_id(att)
                     }
                 })
             else:
@@ -193,31 +264,159 @@ async def _invoke_groupgpt(username: str, chatroom_id: str, content: str, attach
                 })
 
     # Invoke GroupGPT
-    graph = GroupGPTGraph()
+    start_time = time.perf_counter()
     response = await graph.process_query(
         username=username,
         chatroom_id=chatroom_id,
         content=content_without_mention,
         files_data=files_data
     )
+    logger.debug(f"GroupGPT invocation for chatroom {chatroom_id} took {time.perf_counter() - start_time:.2f}s")
 
     return response
 
 
+@router.get("/jobs/{job_id}")
+async def get_groupgpt_job(request: Request, job_id: str) -> JSONResponse:
+    """Retrieves the status of a queued GroupGPT invocation."""
+    groupgpt_jobs = request.app.state.groupgpt_jobs
+    job = groupgpt_jobs.get_job(job_id)
+
+    if job is None:
+        logger.warning(f"GET - {router.prefix}/jobs/{job_id}\nJob not found")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            **job.to_dict(),
+            "queue": groupgpt_jobs.stats()
+        }
+    )
+
+
+def _encode_cursor(message: dict) -> str:
+    """Encodes the position of a message into an opaque pagination cursor."""
+    cursor = json.dumps([message["sent_at"], message["message_id"]])
+    return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decodes a pagination cursor into the `sent_at` and `message_id` of a message."""
+    try:
+        decoded_cursor = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not (isinstance(decoded_cursor, list) and len(decoded_cursor) == 2 and all(isinstance(value, str) for value in decoded_cursor)):
+            raise ValueError("Cursor is not a [sent_at, message_id] pair")
+
+        sent_at, message_id = decoded_cursor
+        datetime.fromisoformat(sent_at)
+        UUID(message_id)
+        return sent_at, message_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
 @router.get("")
-async def get_messages(chatroom_id: str) -> JSONResponse:
+async def get_messages(
+    chatroom_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MESSAGES_PAGE_MAX_SIZE),
+    before: Optional[str] = None
+) -> JSONResponse:
+    """
+    Retrieves messages for a specific chatroom.
+
+    Without `limit` and `before`, all messages are returned as a list. Otherwise, up to `limit` of the newest messages
+    sent before the `before` cursor are returned together with a `next_cursor` for loading older messages, which is
+    null once the oldest message has been reached.
+    """
+    if limit is None and before is None:
+        return await _get_all_messages(chatroom_id)
+
+    before_sent_at, before_message_id = _decode_cursor(before) if before is not None else (None, None)
+    limit = limit or MESSAGES_PAGE_DEFAULT_SIZE
+
+    try:
+        supabase = get_async_supabase()
+        read_cache = get_read_cache()
+
+        generation = read_cache.generation()
+        cached_page = read_cache.get(CHATROOM_MESSAGES, chatroom_id, (limit, before))
+        if cached_page is not None:
+            logger.debug(f"GET - {router.prefix}\nFound {len(cached_page['messages'])} cached message{'s' if len(cached_page['messages']) != 1 else ''} for chatroom {chatroom_id} (limit {limit})")
+            return ORJSONResponse(
+                status_code=status.HTTP_200_OK,
+                content=cached_page
+            )
+
+        messages_response = await supabase.rpc("get_chatroom_messages_page", {
+            "p_chatroom_id": chatroom_id,
+            "p_limit": limit + 1,  # Fetch one extra message to find out whether there are older messages
+            "p_before_sent_at": before_sent_at,
+            "p_before_message_id": before_message_id
+        }).execute()
+
+        messages = messages_response.data or []
+        next_cursor = None
+        if len(messages) > limit:
+            messages = messages[1:]
+            next_cursor = _encode_cursor(messages[0])
+
+        page = {
+            "messages": messages,
+            "next_cursor": next_cursor
+        }
+        read_cache.set(CHATROOM_MESSAGES, chatroom_id, page, (limit, before), generation=generation)
+
+        logger.debug(f"GET - {router.prefix}\nFound {len(messages)} message{'s' if len(messages) != 1 else ''} for chatroom {chatroom_id} (limit {limit}, has more: {next_cursor is not None})")
+
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content=page
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"GET - {router.prefix}\nError retrieving messages: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=e.detail if hasattr(e, 'detail') else str(e)
+        )
+
+
+async def _get_all_messages(chatroom_id: str) -> JSONResponse:
     """Retrieves all messages for a specific chatroom."""
     try:
-        supabase = get_supabase()
+        supabase = get_async_supabase()
+        read_cache = get_read_cache()
+
+        generation = read_cache.generation()
+        cached_messages = read_cache.get(CHATROOM_MESSAGES, chatroom_id)
+        if cached_messages is not None:
+            logger.debug(f"GET - {router.prefix}\nFound {len(cached_messages)} cached message{'s' if len(cached_messages) != 1 else ''} for chatroom {chatroom_id}")
+            return ORJSONResponse(
+                status_code=status.HTTP_200_OK,
+                content=cached_messages
+            )
 
-        messages_response = supabase.rpc("get_chatroom_messages", {"p_chatroom_id": chatroom_id}).execute()
+        if get_settings().POSTGREST_PASSTHROUGH_RESPONSES:
+            logger.debug(f"GET - {router.prefix}\nStreaming messages for chatroom {chatroom_id}")
+            return await stream_rpc_response("get_chatroom_messages", {"p_chatroom_id": chatroom_id})
+
+        messages_response = await supabase.rpc("get_chatroom_messages", {"p_chatroom_id": chatroom_id}).execute()
 
         if messages_response.data is None:
             messages_response.data = []
 
+        read_cache.set(CHATROOM_MESSAGES, chatroom_id, messages_response.data, generation=generation)
         logger.debug(f"GET - {router.prefix}\nFound {len(messages_response.data)} message{'s' if len(messages_response.data) != 1 else ''} for chatroom {chatroom_id}")
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
             content=messages_response.data
         )
@@ -230,13 +429,13 @@ async def get_messages(chatroom_id: str) -> JSONResponse:
 
 
 @router.delete("/{message_id}")
-async def delete_message(message_id: str) -> JSONResponse:
+async def delete_message(request: Request, message_id: str) -> JSONResponse:
     """Deletes the specified message from a specific chatroom."""
     try:
-        supabase = get_supabase()
+        supabase = get_async_supabase()
 
         # Fetch message attachments
-        attachments_response = (
+        attachments_response = await (
             supabase.table("attachments")
             .select("attachment_id")
             .eq("message_id", message_id)
@@ -244,17 +443,25 @@ async def delete_message(message_id: str) -> JSONResponse:
         )
 
         # Delete message entry in DB
-        delete_message_response = (
+        delete_message_response = await (
             supabase.table("messages")
             .delete()
             .eq("message_id", message_id)
             .execute()
         )
 
+        if delete_message_response.data:
+            # Cached messages, history and summary of the chatroom no longer match the database
+            deleted_message = delete_message_response.data[0]
+            get_read_cache().invalidate(CHATROOM_MESSAGES, deleted_message['chatroom_id'])
+            groupgpt_graph = request.app.state.groupgpt_graph
+            groupgpt_graph.history_fetcher.invalidate(deleted_message['chatroom_id'])
+            await groupgpt_graph.history_summarizer.invalidate(deleted_message['chatroom_id'], deleted_message['sent_at'])
+
         if attachments_response.data and delete_message_response.data:
             chatroom_id = delete_message_response.data[0]['chatroom_id']
             attachments_paths = [f"{chatroom_id}/{att['attachment_id']}" for att in attachments_response.data]
-            (
+            await (
                 supabase.storage
                 .from_("attachments")
                 .remove(attachments_paths)
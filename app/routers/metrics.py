@@ -0,0 +1,45 @@
+import logging
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import ORJSONResponse
+
+from app import metrics
+from app.dependencies import get_embedding_service, get_query_embedding_cache, get_read_cache, get_reranker, get_retrieval_cache, get_settings
+
+router = APIRouter(
+    prefix="/api/metrics",
+    tags=["metrics"],
+)
+
+logger = logging.getLogger(__name__)
+
+
+@router.get("")
+async def get_metrics(request: Request) -> ORJSONResponse:
+    """
+    Retrieves the in-process metrics of this worker, including read cache, embedding service and GroupGPT job queue
+    statistics. Only available to the users listed in METRICS_ADMIN_USER_IDS.
+    """
+    if request.state.user_id not in get_settings().METRICS_ADMIN_USER_IDS:
+        logger.warning(f"GET - {router.prefix}\nUser {request.state.user_id} is not allowed to retrieve metrics")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to retrieve metrics"
+        )
+
+    logger.debug(f"GET - {router.prefix}\nRetrieving metrics")
+    # Only report a reranker that is already in use, instead of loading its model here
+    reranker = get_reranker() if get_reranker.cache_info().currsize > 0 else None
+
+    return ORJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            **metrics.snapshot(),
+            "read_cache": get_read_cache().stats(),
+            "embedding_service": get_embedding_service().stats(),
+            "query_embedding_cache": get_query_embedding_cache().stats(),
+            "retrieval_cache": get_retrieval_cache().stats(),
+            "reranker": reranker.stats() if reranker is not None else None,
+            "groupgpt_jobs": request.app.state.groupgpt_jobs.stats()
+        }
+    )
@@ -3,7 +3,8 @@ import logging
 from fastapi import APIRouter, HTTPException, status
 from fastapi.responses import JSONResponse
 
-from app.dependencies import get_supabase
+from app.auth import invalidate_user
+from app.dependencies import get_async_supabase, get_read_cache
 
 router = APIRouter(
     prefix="/api/users",
@@ -30,13 +31,13 @@ async def delete_user(user_id: str) -> JSONResponse:
     Returns:
         JSONResponse: A response indicating success or failure of the deletion.
     """
-    supabase = get_supabase()
+    supabase = get_async_supabase()
 
     try:
         logger.debug(f"DELETE - {router.prefix}/users\nReceived request to delete user {user_id}")
 
         # Delete all document files from bucket in all chatrooms owned by the user
-        documents_response = (
+        documents_response = await (
             supabase.rpc("get_documents_in_chatrooms_owned_by_user", {"p_user_id": user_id})
             .execute()
         )
@@ -47,14 +48,14 @@ async def delete_user(user_id: str) -> JSONResponse:
             f"{doc['chatroom_id']}" for doc in documents_response.data
         ]
         if len(documents_paths) > 0:
-            (
+            await (
                 supabase.storage
                 .from_("knowledge-bases")
                 .remove(documents_paths)
             )
 
         # Delete all attachment files from bucket in all chatrooms owned by the user
-        attachments_response = (
+        attachments_response = await (
             supabase.rpc("get_attachments_in_chatrooms_owned_by_user", {"p_user_id": user_id})
             .execute()
         )
@@ -64,14 +65,14 @@ async def delete_user(user_id: str) -> JSONResponse:
             f"{att['chatroom_id']}" for att in attachments_response.data
         ]
         if len(attachments_paths) > 0:
-            (
+            await (
                 supabase.storage
                 .from_("attachments")
                 .remove(attachments_paths)
             )
 
         # Delete all chatrooms owned by the user
-        (
+        await (
             supabase.table("chatrooms")
             .delete()
             .eq("creator_id", user_id)
@@ -79,7 +80,7 @@ async def delete_user(user_id: str) -> JSONResponse:
         )
 
         # Delete user from Supabase public.users table
-        delete_user_response = (
+        delete_user_response = await (
             supabase.table("users")
             .delete()
             .eq("user_id", user_id)
@@ -88,7 +89,9 @@ async def delete_user(user_id: str) -> JSONResponse:
 
         # Delete user from Supabase using supabase.auth.admin.delete_user()
         auth_id = delete_user_response.data[0].get("auth_id")
-        supabase.auth.admin.delete_user(auth_id)
+        await supabase.auth.admin.delete_user(auth_id)
+        invalidate_user(auth_id)
+        get_read_cache().clear()  # Owned chatrooms are gone from every member's cached reads
 
         logger.debug(f"DELETE - {router.prefix}/users\nSuccessfully deleted user {user_id}.")
 
@@ -0,0 +1,70 @@
+from typing import Dict, Optional
+
+import httpx
+from postgrest import AsyncPostgrestClient
+from storage3 import AsyncStorageClient
+from supabase import AsyncClient, AsyncClientOptions
+
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """
+    PostgREST client whose HTTP session sends requests through the given transport, which holds the connection pool
+    (limits, keep-alive and connect retries).
+    """
+    def __init__(self, base_url: str, *, transport: httpx.AsyncHTTPTransport, **kwargs):
+        self.transport = transport
+        super().__init__(base_url, **kwargs)
+
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: int | float | httpx.Timeout,
+        verify: bool = True,
+        proxy: Optional[str] = None
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=self.transport,
+            follow_redirects=True
+        )
+
+
+class PooledAsyncClient(AsyncClient):
+    """
+    Async Supabase client whose PostgREST and Storage clients are created once and closed by `aclose`.
+
+    supabase-py drops and lazily recreates these clients on every auth state change, without closing the previous
+    ones. This client only ever acts with the service role key, so it keeps the same clients for its whole lifetime.
+    """
+    def __init__(self, supabase_url: str, supabase_key: str, options: AsyncClientOptions, transport: httpx.AsyncHTTPTransport):
+        super().__init__(supabase_url, supabase_key, options)
+        headers = dict(self.options.headers)  # Auth state changes update the options' headers in place
+        self._pooled_postgrest = PooledPostgrestClient(
+            self.rest_url,
+            headers=headers,
+            schema=self.options.schema,
+            timeout=self.options.postgrest_client_timeout,
+            transport=transport
+        )
+        self._pooled_storage = AsyncStorageClient(self.storage_url, headers, self.options.storage_client_timeout)
+
+
+    @property
+    def postgrest(self) -> PooledPostgrestClient:
+        return self._pooled_postgrest
+
+
+    @property
+    def storage(self) -> AsyncStorageClient:
+        return self._pooled_storage
+
+
+    async def aclose(self) -> None:
+        """Closes the HTTP connections of the PostgREST, Storage and Auth clients."""
+        await self._pooled_postgrest.aclose()
+        await self._pooled_storage.aclose()
+        await self.auth.close()
@@ -3,19 +3,21 @@ from typing import Dict, List, Optional
 
 from langgraph.graph import END, START, StateGraph
 
-from app.dependencies import get_supabase
-from app.llms import gpt_41_mini
+from app.dependencies import get_async_supabase
+from app.llms import gpt_41_mini, gpt_41_nano
 
-from .nodes import FilesAttacher, HistoryFetcher, ResponseGenerator
+from .nodes import FilesAttacher, HistoryFetcher, HistorySummarizer, ResponseGenerator
+from .nodes.history_fetcher import get_history_token_budget
 from .state import ChatState
 
 
 class GroupGPTGraph:
     def __init__(self):
-        self.supabase = get_supabase()  # Initialize Supabase client for DB operations
+        self.supabase = get_async_supabase()  # Initialize Supabase client for DB operations
 
         self.files_attacher = FilesAttacher()  # Responsible for attaching files to messages
-        self.history_fetcher = HistoryFetcher(supabase=self.supabase)  # Responsible for fetching chat history
+        self.history_fetcher = HistoryFetcher(supabase=self.supabase, max_tokens=get_history_token_budget(gpt_41_mini))  # Responsible for fetching chat history
+        self.history_summarizer = HistorySummarizer(supabase=self.supabase, llm=gpt_41_nano)  # Responsible for summarizing older chat history
         self.response_generator = ResponseGenerator(supabase=self.supabase, llm=gpt_41_mini)  # Responsible for generating responses
 
         # Build graph
@@ -35,16 +37,17 @@ class GroupGPTGraph:
         """
         workflow = StateGraph(ChatState)
 
-        # TODO: To summarize or not to summarize? Summarizing reduces the amount of data passed to the LLM, but may lose some details.
         # Add nodes
         workflow.add_node("files_attacher", self.files_attacher)
         workflow.add_node("history_fetcher", self.history_fetcher)
+        workflow.add_node("history_summarizer", self.history_summarizer)
         workflow.add_node("response_generator", self.response_generator)
 
         ### Workflow Structure ###
         workflow.add_edge(START, "history_fetcher")
+        workflow.add_edge("history_fetcher", "history_summarizer")
         workflow.add_conditional_edges(
-            "history_fetcher",
+            "history_summarizer",
             self._should_attach_files,
             {
                 "has_attached_files": "files_attacher",
@@ -69,7 +72,8 @@ class GroupGPTGraph:
             chatroom_id=chatroom_id,
             query=content,
             files_data=files_data,
-            chat_history=[]
+            chat_history=[],
+            conversation_summary=""
         )
 
         final_state = await self.graph.ainvoke(initial_state)
@@ -1,3 +1,4 @@
 from .files_attacher import FilesAttacher
 from .history_fetcher import HistoryFetcher
+from .history_summarizer import HistorySummarizer
 from .response_generator import ResponseGenerator
@@ -10,7 +10,7 @@ class FilesAttacher:
         self.logger = logging.getLogger(self.__class__.__name__)
 
 
-    def __call__(self, state: ChatState) -> dict:
+    async def __call__(self, state: ChatState) -> dict:
         """
         Attaches any files sent by the user to the input message.
         """
@@ -1,78 +1,173 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 import logging
+from typing import Dict, List, Optional
 
-from langchain_core.messages import AIMessage, HumanMessage, trim_messages
+from cachetools import TTLCache
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.messages.utils import count_tokens_approximately
-from supabase import Client
-
-from app.constants import GEMINI_25_MAX_INPUT_TOKENS
+from supabase import AsyncClient
+
+from app import metrics
+from app.constants import (
+    GEMINI_25_MAX_INPUT_TOKENS,
+    HISTORY_CACHE_MAX_CHATROOMS,
+    HISTORY_CACHE_TTL_SECONDS,
+    HISTORY_CHARS_PER_TOKEN,
+    HISTORY_CONTEXT_FRACTION,
+    HISTORY_CURSOR_OVERLAP_SECONDS,
+    MODEL_MAX_INPUT_TOKENS
+)
+from app.dependencies import get_settings
 from app.workflows.state import ChatState
 
 
+def get_history_token_budget(llm: BaseChatModel) -> int:
+    """
+    Returns the number of tokens of chat history that may be sent to the given model.
+
+    This is the configured `GROUPGPT_HISTORY_MAX_TOKENS`, capped to a fraction of the model's context window.
+    """
+    model_name = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+    max_input_tokens = MODEL_MAX_INPUT_TOKENS.get(model_name, GEMINI_25_MAX_INPUT_TOKENS)
+    return min(get_settings().GROUPGPT_HISTORY_MAX_TOKENS, int(HISTORY_CONTEXT_FRACTION * max_input_tokens))
+
+
+@dataclass
+class ChatroomHistory:
+    """
+    Cached conversation history of a single chatroom.
+
+    Consecutive messages from users (or from GroupGPT) are combined into a single HumanMessage (or AIMessage),
+    whose `response_metadata["last_sent_at"]` is the `sent_at` of the newest message in the group, and whose
+    `response_metadata["message_offsets"]` lists the `sent_at` and the offset in the content of each message.
+    """
+    cursor_sent_at: Optional[datetime] = None  # sent_at of the newest message seen so far
+    recent_message_ids: Dict[str, datetime] = field(default_factory=dict)  # Messages seen within the cursor overlap
+    messages: List[AIMessage | HumanMessage] = field(default_factory=list)
+    token_counts: List[int] = field(default_factory=list)
+    total_tokens: int = 0
+
+
 class HistoryFetcher:
-    def __init__(self, supabase: Client):
+    """
+    Fetches the chat history of a chatroom, caching it per chatroom and only fetching messages newer than the cache.
+
+    `sent_at` is set when a message is inserted, not when its transaction commits, so a message may become visible
+    after newer ones. Every fetch therefore re-reads the last `HISTORY_CURSOR_OVERLAP_SECONDS` before the cursor and
+    skips messages already seen; a message that shows up behind the cursor makes the history be rebuilt in order.
+
+    The cache is per process: deleting a message invalidates it in the worker handling the deletion only, and other
+    workers serve the deleted message until their entry expires after `HISTORY_CACHE_TTL_SECONDS`.
+    """
+    def __init__(self, supabase: AsyncClient, max_tokens: int):
         self.supabase = supabase
+        self.max_tokens = max_tokens  # Token budget of the chat history; see `get_history_token_budget`
+        self.cache: TTLCache = TTLCache(maxsize=HISTORY_CACHE_MAX_CHATROOMS, ttl=HISTORY_CACHE_TTL_SECONDS)
         self.logger = logging.getLogger(self.__class__.__name__)
 
 
-    def __call__(self, state: ChatState) -> dict:
+    def invalidate(self, chatroom_id: str) -> None:
+        """Drops the cached history of a chatroom, e.g., after one of its messages has been deleted."""
+        self.cache.pop(chatroom_id, None)
+
+
+    def _append_message(self, history: ChatroomHistory, username: str, content: str, sent_at: str) -> None:
+        """Appends a message to the history, combining it with the last message if both are from the same side."""
+        message_cls = AIMessage if username == "GroupGPT" else HumanMessage
+        line = f"{username}: {content}"
+        message_offsets = [(sent_at, 0)]
+
+        if history.messages and isinstance(history.messages[-1], message_cls):
+            history.total_tokens -= history.token_counts.pop()
+            previous_message = history.messages.pop()
+            message_offsets = previous_message.response_metadata["message_offsets"] + [(sent_at, len(previous_message.content) + 1)]
+            line = f"{previous_message.content}\n{line}"
+
+        message = message_cls(content=line, response_metadata={"last_sent_at": sent_at, "message_offsets": message_offsets})
+        token_count = count_tokens_approximately([message])
+
+        history.messages.append(message)
+        history.token_counts.append(token_count)
+        history.total_tokens += token_count
+
+
+    def _trim(self, history: ChatroomHistory) -> None:
+        """Drops the oldest messages until the history fits within the token budget."""
+        while history.messages and history.total_tokens > self.max_tokens:
+            history.messages.pop(0)
+            history.total_tokens -= history.token_counts.pop(0)
+
+
+    async def _fetch(self, chatroom_id: str, after_sent_at: Optional[datetime]) -> List[dict]:
+        response = await (
+            self.supabase.rpc("get_chatroom_messages_within_budget", {
+                "p_chatroom_id": chatroom_id,
+                "p_max_chars": self.max_tokens * HISTORY_CHARS_PER_TOKEN,
+                "p_after_sent_at": after_sent_at.isoformat() if after_sent_at else None
+            })
+            .execute()
+        )
+        return response.data or []
+
+
+    async def __call__(self, state: ChatState) -> dict:
         """
         Fetches conversation history from Supabase database.
+
+        Only messages newer than the chatroom's cached cursor are fetched, so the cost is proportional to the number of new messages.
+        The database only returns the newest messages that fit within the token budget, so the payload stays bounded
+        regardless of how old the chatroom is.
         """
         chatroom_id = state["chatroom_id"]
 
         try:
-            response = (
-                self.supabase.rpc("get_chatroom_messages", { "p_chatroom_id": chatroom_id })
-                .execute()
-            )
-
-            messages = response.data
-            chat_history = []
-            # Separate user messages and GroupGPT's messages
-            current_user_messages = []
-            current_groupgpt_messages = []
-
-            for msg in messages:
-                username = msg["username"]
-                content = msg["content"]
-
-                if username == "GroupGPT":  # Current message is from GroupGPT
-                    # Add accumulated user messages first (if any)
-                    if current_user_messages:
-                        combined_user_messages = "\n".join(current_user_messages)
-                        chat_history.append(HumanMessage(content=combined_user_messages))
-                        current_user_messages = []
-
-                    # Accumulate GroupGPT's messages
-                    current_groupgpt_messages.append(f"{username}: {content}")
-                else:  # Current message is from a user
-                    # Add accumulated GroupGPT messages first (if any)
-                    if current_groupgpt_messages:
-                        combined_groupgpt_messages = "\n".join(current_groupgpt_messages)
-                        chat_history.append(AIMessage(content=combined_groupgpt_messages))
-                        current_groupgpt_messages = []
-
-                    # Accumulate user messages
-                    current_user_messages.append(f"{username}: {content}")
-
-            # If there are any remaining user messages, add them to the chat history
-            if current_user_messages:
-                combined_user_messages = "\n".join(current_user_messages)
-                chat_history.append(HumanMessage(content=combined_user_messages))
-
-            length_before_trim = len(chat_history)
-            chat_history = trim_messages(
-                chat_history,
-                max_tokens=0.8 * GEMINI_25_MAX_INPUT_TOKENS,  # Set aside 20% for subsequent tool calls and responses
-                strategy="last",
-                token_counter=count_tokens_approximately,
-                allow_partial=False
-            )
-            length_after_trim = len(chat_history)
-
-            self.logger.debug(f"Successfully fetched conversation history. Length before trim: {length_before_trim}, after trim: {length_after_trim}")
+            history = self.cache.get(chatroom_id)
+            if history is None:
+                history = ChatroomHistory()
+                metrics.increment("history_cache_misses_total")
+            else:
+                metrics.increment("history_cache_hits_total")
+
+            overlap = timedelta(seconds=HISTORY_CURSOR_OVERLAP_SECONDS)
+            fetched_messages = await self._fetch(chatroom_id, history.cursor_sent_at - overlap if history.cursor_sent_at else None)
+
+            if fetched_messages and fetched_messages[0]["is_truncated"]:
+                # Messages between the cached history and the new ones were left out, so the cached history is stale
+                history = ChatroomHistory()
+
+            new_messages = [msg for msg in fetched_messages if msg["message_id"] not in history.recent_message_ids]
+            if history.cursor_sent_at and any(datetime.fromisoformat(msg["sent_at"]) < history.cursor_sent_at for msg in new_messages):
+                # A message committed after newer ones were fetched; rebuild the history to keep it in order
+                metrics.increment("history_late_messages_total")
+                history = ChatroomHistory()
+                new_messages = await self._fetch(chatroom_id, None)
+
+            for msg in new_messages:
+                self._append_message(history, msg["username"], msg["content"], msg["sent_at"])
+                sent_at = datetime.fromisoformat(msg["sent_at"])
+                history.recent_message_ids[msg["message_id"]] = sent_at
+                history.cursor_sent_at = max(history.cursor_sent_at or sent_at, sent_at)
+
+            if history.cursor_sent_at:
+                history.recent_message_ids = {
+                    message_id: sent_at for message_id, sent_at in history.recent_message_ids.items()
+                    if sent_at >= history.cursor_sent_at - overlap
+                }
+
+            self._trim(history)
+            self.cache[chatroom_id] = history
+
+            # Trailing GroupGPT messages are left out so that the history ends with the users' messages
+            chat_history = list(history.messages)
+            if chat_history and isinstance(chat_history[-1], AIMessage):
+                chat_history.pop()
+
+            self.logger.debug(f"Successfully fetched conversation history. New messages: {len(new_messages)}, history length: {len(chat_history)}, approx. tokens: {history.total_tokens}")
         except Exception as e:
             self.logger.exception(f"Error fetching chat history for chatroom {chatroom_id}: {e}")
+            self.invalidate(chatroom_id)
             chat_history = []
 
         return {"chat_history": chat_history}
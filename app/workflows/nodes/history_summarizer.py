@@ -0,0 +1,252 @@
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import logging
+from typing import Dict, List, Optional
+
+from cachetools import TTLCache
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_google_vertexai.chat_models import ChatVertexAI
+from langchain_openai.chat_models.base import ChatOpenAI
+from supabase import AsyncClient
+
+from app import metrics
+from app.constants import (
+    HISTORY_CACHE_MAX_CHATROOMS,
+    HISTORY_CACHE_TTL_SECONDS,
+    HISTORY_SUMMARY_MAX_WORDS,
+    HISTORY_SUMMARY_MIN_NEW_TOKENS
+)
+from app.dependencies import get_settings
+from app.prompts import HISTORY_SUMMARIZER_PROMPT
+from app.workflows.state import ChatState
+
+
+@dataclass
+class ChatroomSummary:
+    summary: str
+    summarized_until: datetime  # `sent_at` of the newest message covered by the summary
+    updated_at: datetime
+
+
+def _parse_timestamp(timestamp: str) -> datetime:
+    return datetime.fromisoformat(timestamp)
+
+
+def _uncovered_part(message: AIMessage | HumanMessage, summarized_until: datetime) -> Optional[AIMessage | HumanMessage]:
+    """
+    Returns the part of a grouped history message (see `ChatroomHistory`) sent after `summarized_until`, or None if
+    the summary covers all of it. A group may be covered in part when messages were appended to it after it was
+    summarized.
+    """
+    message_offsets = message.response_metadata["message_offsets"]
+    for i, (sent_at, offset) in enumerate(message_offsets):
+        if _parse_timestamp(sent_at) > summarized_until:
+            if offset == 0:
+                return message
+            return message.__class__(
+                content=message.content[offset:],
+                response_metadata={
+                    **message.response_metadata,
+                    "message_offsets": [(sent_at, later_offset - offset) for sent_at, later_offset in message_offsets[i:]]
+                }
+            )
+    return None
+
+
+class HistorySummarizer:
+    """
+    Replaces the older part of the chat history with a rolling, per-chatroom summary.
+
+    Turns already covered by the chatroom's summary are dropped in favour of the summary. Of the remaining turns, the
+    newest `GROUPGPT_HISTORY_RECENT_TOKENS` tokens are kept verbatim; older turns are kept verbatim as well, and folded
+    into the summary in the background, so responses never wait for it.
+
+    Deleting a message bumps the chatroom's generation (see `invalidate`); a background summarization started before
+    does not persist its summary, which may cover the deleted message.
+    """
+    def __init__(self, supabase: AsyncClient, llm: ChatOpenAI | ChatVertexAI):
+        self.supabase = supabase
+        self.llm = llm
+        self.cache: TTLCache = TTLCache(maxsize=HISTORY_CACHE_MAX_CHATROOMS, ttl=HISTORY_CACHE_TTL_SECONDS)
+        self.tasks: Dict[str, asyncio.Task] = {}  # Running background summarizations, by chatroom ID
+        self.generations: Dict[str, int] = defaultdict(int)  # Bumped by `invalidate`, by chatroom ID
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+
+    async def invalidate(self, chatroom_id: str, sent_at: str) -> None:
+        """Deletes the chatroom's summary if it covers a message sent at `sent_at`, e.g., after that message has been deleted."""
+        self.generations[chatroom_id] += 1
+
+        if chatroom_id in self.cache:
+            summary = self.cache[chatroom_id]
+            if summary is None or summary.summarized_until < _parse_timestamp(sent_at):
+                return  # No summary, or one that does not cover the message
+
+        self.cache.pop(chatroom_id, None)
+        await self._delete_summary(chatroom_id, sent_at)
+
+
+    async def _delete_summary(self, chatroom_id: str, covering_sent_at: str) -> None:
+        await (
+            self.supabase.table("chatroom_summaries")
+            .delete()
+            .eq("chatroom_id", chatroom_id)
+            .gte("summarized_until", covering_sent_at)
+            .execute()
+        )
+
+
+    async def shutdown(self) -> None:
+        """Cancels the running background summarizations."""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+    async def _load_summary(self, chatroom_id: str) -> Optional[ChatroomSummary]:
+        if chatroom_id in self.cache:
+            return self.cache[chatroom_id]
+
+        response = await (
+            self.supabase.table("chatroom_summaries")
+            .select("summary, summarized_until, updated_at")
+            .eq("chatroom_id", chatroom_id)
+            .execute()
+        )
+
+        summary = None
+        if response.data:
+            row = response.data[0]
+            summary = ChatroomSummary(
+                summary=row["summary"],
+                summarized_until=_parse_timestamp(row["summarized_until"]),
+                updated_at=_parse_timestamp(row["updated_at"])
+            )
+
+        self.cache[chatroom_id] = summary
+        return summary
+
+
+    def _split_recent(self, chat_history: List[AIMessage | HumanMessage]) -> int:
+        """Returns the index of the first message within the most recent `GROUPGPT_HISTORY_RECENT_TOKENS` tokens."""
+        recent_tokens_budget = get_settings().GROUPGPT_HISTORY_RECENT_TOKENS
+        recent_tokens = 0
+
+        split_index = len(chat_history)
+        while split_index > 0:
+            recent_tokens += count_tokens_approximately([chat_history[split_index - 1]])
+            if recent_tokens > recent_tokens_budget:
+                break
+            split_index -= 1
+
+        return split_index
+
+
+    async def _update_summary(
+        self,
+        chatroom_id: str,
+        summary: Optional[ChatroomSummary],
+        new_messages: List[AIMessage | HumanMessage]
+    ) -> None:
+        """Folds `new_messages` into the chatroom's summary and persists it."""
+        generation = self.generations[chatroom_id]
+        try:
+            prompt = HISTORY_SUMMARIZER_PROMPT.format(
+                max_words=HISTORY_SUMMARY_MAX_WORDS,
+                summary=summary.summary if summary else "(none)",
+                new_messages="\n".join(message.content for message in new_messages)
+            )
+            response = await self.llm.ainvoke(prompt)
+
+            updated_summary = ChatroomSummary(
+                summary=response.content.strip(),
+                summarized_until=_parse_timestamp(new_messages[-1].response_metadata["last_sent_at"]),
+                updated_at=datetime.now(timezone.utc)
+            )
+
+            if self.generations[chatroom_id] != generation:
+                self.logger.debug(f"Discarded summary of chatroom {chatroom_id}, whose messages were deleted while summarizing")
+                return
+
+            await (
+                self.supabase.table("chatroom_summaries")
+                .upsert({
+                    "chatroom_id": chatroom_id,
+                    "summary": updated_summary.summary,
+                    "summarized_until": updated_summary.summarized_until.isoformat(),
+                    "updated_at": updated_summary.updated_at.isoformat()
+                })
+                .execute()
+            )
+            if self.generations[chatroom_id] != generation:
+                # A message was deleted while the summary was being written; its deletion may have run first
+                await self._delete_summary(chatroom_id, updated_summary.summarized_until.isoformat())
+                return
+            self.cache[chatroom_id] = updated_summary
+
+            metrics.increment("history_summaries_updated_total")
+            self.logger.debug(f"Updated summary of chatroom {chatroom_id} with {len(new_messages)} messages")
+        except Exception as e:
+            metrics.increment("history_summaries_failed_total")
+            self.logger.exception(f"Error updating summary of chatroom {chatroom_id}: {e}")
+
+
+    def _schedule_update(
+        self,
+        chatroom_id: str,
+        summary: Optional[ChatroomSummary],
+        new_messages: List[AIMessage | HumanMessage]
+    ) -> None:
+        if chatroom_id in self.tasks:
+            return  # The next invocation picks up whatever the running summarization does not cover
+
+        task = asyncio.create_task(self._update_summary(chatroom_id, summary, new_messages))
+        self.tasks[chatroom_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(chatroom_id, None))
+
+
+    async def __call__(self, state: ChatState) -> dict:
+        """
+        Replaces summarized turns in the chat history with the chatroom's summary, and schedules a summary update
+        once enough older turns have not been summarized yet.
+        """
+        chatroom_id = state["chatroom_id"]
+        chat_history = state.get("chat_history", [])
+
+        try:
+            summary = await self._load_summary(chatroom_id)
+
+            if summary is not None:
+                uncovered_messages = [
+                    part for part in (_uncovered_part(message, summary.summarized_until) for message in chat_history)
+                    if part is not None
+                ]
+
+                tokens_saved = count_tokens_approximately(chat_history) - count_tokens_approximately(uncovered_messages) - count_tokens_approximately([summary.summary])
+                metrics.increment("history_summary_tokens_saved_total", max(tokens_saved, 0))
+                metrics.observe("history_summary_staleness_seconds", (datetime.now(timezone.utc) - summary.updated_at).total_seconds())
+            else:
+                uncovered_messages = chat_history
+
+            split_index = self._split_recent(uncovered_messages)
+            unsummarized_messages, recent_messages = uncovered_messages[:split_index], uncovered_messages[split_index:]
+
+            unsummarized_tokens = count_tokens_approximately(unsummarized_messages)
+            metrics.observe("history_summary_unsummarized_tokens", unsummarized_tokens)
+
+            if unsummarized_tokens >= HISTORY_SUMMARY_MIN_NEW_TOKENS:
+                self._schedule_update(chatroom_id, summary, unsummarized_messages)
+
+            self.logger.debug(f"Chat history of chatroom {chatroom_id}: {len(unsummarized_messages)} unsummarized and {len(recent_messages)} recent messages, summary: {summary is not None}")
+
+            return {
+                "chat_history": unsummarized_messages + recent_messages,
+                "conversation_summary": summary.summary if summary else ""
+            }
+        except Exception as e:
+            self.logger.exception(f"Error summarizing chat history of chatroom {chatroom_id}: {e}")
+            return {"conversation_summary": ""}
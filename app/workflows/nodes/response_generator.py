@@ -1,15 +1,21 @@
+import asyncio
 import logging
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
 
-from langchain_core.messages import SystemMessage, ToolMessage
+from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import message_chunk_to_message
 from langchain_google_vertexai.chat_models import ChatVertexAI
 from langchain_openai.chat_models.base import ChatOpenAI
-from supabase import Client
+from supabase import AsyncClient
 
-from app.dependencies import get_settings
-from app.prompts import RESPONSE_GENERATOR_PROMPT
+from app import metrics
+from app.cache import CHATROOM_MESSAGES
+from app.constants import TOOL_CALL_MAX_CONCURRENCY, TOOL_CALL_TIMEOUT_SECONDS
+from app.dependencies import get_read_cache, get_settings
+from app.prompts import CONVERSATION_SUMMARY_PROMPT, RESPONSE_GENERATOR_PROMPT
 from app.workflows.state import ChatState
+from app.workflows.streaming import ChatroomResponseStreamer
 from app.workflows.tools import (
     ArxivSearchTool,
     ChunkRetrieverTool,
@@ -20,9 +26,11 @@ from app.workflows.tools import (
 
 class ResponseGenerator:
     MAX_TOOL_CALLS = 10
+    # python_repl runs each call in its own process, so it can overlap with other tool calls as well
+    PARALLEL_SAFE_TOOLS = {"arxiv_search", "chunk_retriever", "python_repl", "web_search"}
 
 
-    def __init__(self, supabase: Client, llm: ChatOpenAI | ChatVertexAI):
+    def __init__(self, supabase: AsyncClient, llm: ChatOpenAI | ChatVertexAI):
         self.supabase = supabase
 
         # Initialize tools
@@ -40,26 +48,26 @@ class ResponseGenerator:
         self.logger = logging.getLogger(self.__class__.__name__)
 
 
-    def _execute_tool_calls(self, tool_call: Dict[str, str], chatroom_id: str) -> ToolMessage:
+    async def _execute_tool_calls(self, tool_call: Dict[str, str], chatroom_id: str) -> ToolMessage:
         """
         Executes a single tool call and returns the result as a ToolMessage.
         """
         try:
             if tool_call['name'] == 'web_search':
-                tool_result = self.web_search_tool._run(
+                tool_result = await self.web_search_tool._arun(
                     query=tool_call['args']['query'],
                     num_results=tool_call['args'].get('num_results', 5)
                 )
             elif tool_call['name'] == 'python_repl':
-                tool_result = self.python_repl_tool._run(
+                tool_result = await self.python_repl_tool._arun(
                     code=tool_call['args']['code']
                 )
             elif tool_call['name'] == 'arxiv_search':
-                tool_result = self.arxiv_search_tool._run(
+                tool_result = await self.arxiv_search_tool._arun(
                     query=tool_call['args']['query']
                 )
             elif tool_call['name'] == 'chunk_retriever':
-                tool_result = self.chunk_retriever_tool._run(
+                tool_result = await self.chunk_retriever_tool._arun(
                     chatroom_id=chatroom_id,
                     query=tool_call['args']['query'],
                     num_chunks=tool_call['args'].get('num_chunks', 5)
@@ -80,20 +88,85 @@ class ResponseGenerator:
             )
 
 
-    def _handle_tool_calls(self, messages: List, chatroom_id: str) -> List:
+    async def _execute_turn_tool_calls(self, tool_calls: List[Dict[str, str]], chatroom_id: str) -> List[ToolMessage]:
+        """
+        Executes all tool calls of a single model turn, running independent tool calls concurrently.
+
+        Returns the ToolMessages in the same order as `tool_calls`.
+        """
+        tool_messages = [None] * len(tool_calls)
+        parallel_indices = [i for i, tool_call in enumerate(tool_calls) if tool_call['name'] in self.PARALLEL_SAFE_TOOLS]
+
+        if len(parallel_indices) < 2:
+            parallel_indices = []  # Nothing to overlap with, execute everything inline
+
+        semaphore = asyncio.Semaphore(TOOL_CALL_MAX_CONCURRENCY)
+
+        async def execute_with_timeout(tool_call: Dict[str, str]) -> ToolMessage:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self._execute_tool_calls(tool_call, chatroom_id), TOOL_CALL_TIMEOUT_SECONDS)
+                except asyncio.TimeoutError:
+                    self.logger.warning(f"Tool {tool_call['name']} timed out after {TOOL_CALL_TIMEOUT_SECONDS} seconds")
+                    metrics.increment("tool_calls_timed_out_total")
+                    return ToolMessage(
+                        content=f"Error executing {tool_call['name']}: timed out after {TOOL_CALL_TIMEOUT_SECONDS} seconds",
+                        tool_call_id=tool_call['id']
+                    )
+
+        # Start parallel-safe tool calls first so that they are in flight while the remaining ones execute one by one
+        tasks = {i: asyncio.create_task(execute_with_timeout(tool_calls[i])) for i in parallel_indices}
+
+        for i, tool_call in enumerate(tool_calls):
+            if i not in tasks:
+                tool_messages[i] = await execute_with_timeout(tool_call)
+
+        for i, task in tasks.items():
+            tool_messages[i] = await task
+
+        metrics.increment("tool_turns_total")
+        if tasks:
+            metrics.increment("tool_turns_parallel_total")
+            self.logger.debug(f"Executed {len(tasks)} of {len(tool_calls)} tool calls in parallel")
+
+        return tool_messages
+
+
+    async def _stream_turn(self, messages: List, streamer: ChatroomResponseStreamer) -> AIMessage:
+        """
+        Streams a single model turn, forwarding its text tokens to the chatroom unless the turn turns out to be a tool call.
+        """
+        response_chunk = None
+        async for chunk in self.llm.astream(messages):
+            response_chunk = chunk if response_chunk is None else response_chunk + chunk
+
+            if response_chunk.tool_call_chunks:
+                await streamer.discard()
+            elif isinstance(chunk.content, str):
+                await streamer.append(chunk.content)
+
+        if response_chunk is None:
+            self.logger.warning("Model turn streamed no chunks")
+            return AIMessage(content="")
+        return message_chunk_to_message(response_chunk)
+
+
+    async def _handle_tool_calls(self, messages: List, chatroom_id: str, streamer: Optional[ChatroomResponseStreamer] = None) -> List:
         """Handle tool calls and add tool responses to message history."""
         iteration = 0
 
         while iteration < self.MAX_TOOL_CALLS:
             # Get the latest response
-            response = self.llm.invoke(messages)
+            if streamer is not None:
+                response = await self._stream_turn(messages, streamer)
+            else:
+                response = await self.llm.ainvoke(messages)
             messages.append(response)
 
             # Check if the response contains tool calls
             if hasattr(response, 'tool_calls') and response.tool_calls:
-                for tool_call in response.tool_calls:
-                    tool_message = self._execute_tool_calls(tool_call, chatroom_id)
-                    messages.append(tool_message)
+                tool_messages = await self._execute_turn_tool_calls(response.tool_calls, chatroom_id)
+                messages.extend(tool_messages)
 
                 iteration += 1
             else:
@@ -105,14 +178,14 @@ class ResponseGenerator:
         return messages, response
 
 
-    def _insert_response(
+    async def _insert_response(
         self,
         chatroom_id: str,
         content: str
     ) -> dict:
         settings = get_settings()
         try:
-            response = (
+            response = await (
                 self.supabase.table("messages")
                 .insert({
                     "sender_id": settings.GROUPGPT_USER_ID,
@@ -121,26 +194,38 @@ class ResponseGenerator:
                 })
                 .execute()
             )
+            get_read_cache().invalidate(CHATROOM_MESSAGES, chatroom_id)
             return response
         except Exception as e:
             self.logger.exception(e)
 
 
-    def __call__(self, state: ChatState) -> ChatState:
+    async def __call__(self, state: ChatState) -> ChatState:
         """
         Generates the final response using all available information.
         """
+        system_prompt = RESPONSE_GENERATOR_PROMPT.format(current_datetime=datetime.now().strftime("%A, %B %-d, %Y at %I:%M:%S %p"))
+        if state.get("conversation_summary"):
+            system_prompt += CONVERSATION_SUMMARY_PROMPT.format(summary=state["conversation_summary"])
+
         # Build message sequence
         messages = [
             # TODO: Figure out a way to include any executed Python code in generated response
-            SystemMessage(
-                content=RESPONSE_GENERATOR_PROMPT.format(current_datetime=datetime.now().strftime("%A, %B %-d, %Y at %I:%M:%S %p"))
-            )
+            SystemMessage(content=system_prompt)
         ]
         messages.extend(state.get("chat_history", []))
 
+        streamer = None
+        if get_settings().GROUPGPT_STREAM_RESPONSES:
+            try:
+                streamer = ChatroomResponseStreamer(supabase=self.supabase, chatroom_id=state["chatroom_id"])
+                await streamer.start()
+            except Exception as e:
+                self.logger.exception(f"Error starting response stream, falling back to a single insert: {e}")
+                streamer = None
+
         try:
-            messages, response = self._handle_tool_calls(messages, state["chatroom_id"])
+            messages, response = await self._handle_tool_calls(messages, state["chatroom_id"], streamer)
 
             final_response = response.content.strip()
 
@@ -157,10 +242,13 @@ class ResponseGenerator:
             final_response = "I apologize, but I encountered an error while generating a response. Please try again."
 
         try:
-            self._insert_response(
-                chatroom_id=state["chatroom_id"],
-                content=final_response
-            )
+            if streamer is not None:
+                await streamer.finish(final_response)
+            else:
+                await self._insert_response(
+                    chatroom_id=state["chatroom_id"],
+                    content=final_response
+                )
         except Exception as e:
             self.logger.exception(f"Error inserting response into database: {e}")
 
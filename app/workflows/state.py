@@ -10,5 +10,6 @@ class ChatState(TypedDict):
     chatroom_id: str  # Unique identifier for the chatroom, for fetching history
     query: str  # Query sent by the user
     chat_history: List[AIMessage | HumanMessage]  # List of chat messages exchanged in the chatroom
+    conversation_summary: str  # Summary of earlier messages that are no longer part of chat_history
     files_data: List[Dict[str, str]]  # List of files attached by the user, each dict contains mime_type and base64 data
     final_response: str  # Final response to be returned to the user
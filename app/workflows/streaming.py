@@ -0,0 +1,110 @@
+import logging
+import time
+from typing import Optional
+
+from supabase import AsyncClient
+
+from app import metrics
+from app.cache import CHATROOM_MESSAGES
+from app.constants import (
+    STREAM_FLUSH_EVERY_N_TOKENS,
+    STREAM_FLUSH_INTERVAL_MS,
+    STREAM_PLACEHOLDER_CONTENT
+)
+from app.dependencies import get_read_cache, get_settings
+
+
+class ChatroomResponseStreamer:
+    """
+    Writes GroupGPT's response into the chatroom while it is being generated.
+
+    A placeholder message is inserted when generation starts, and is then updated in throttled batches
+    (every `STREAM_FLUSH_EVERY_N_TOKENS` tokens or `STREAM_FLUSH_INTERVAL_MS` milliseconds) as tokens arrive.
+    Clients receive the updates through Realtime UPDATE events on the `messages` table.
+    """
+    def __init__(self, supabase: AsyncClient, chatroom_id: str):
+        self.supabase = supabase
+        self.chatroom_id = chatroom_id
+
+        self.message_id: Optional[str] = None
+        self._content = ""
+        self._pending_tokens = 0
+        self._last_flush_time = 0.0
+        self._start_time = time.perf_counter()
+        self._first_token_time: Optional[float] = None
+
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+
+    async def start(self) -> None:
+        """Inserts the placeholder message that is filled in as tokens arrive."""
+        settings = get_settings()
+        response = await (
+            self.supabase.table("messages")
+            .insert({
+                "sender_id": settings.GROUPGPT_USER_ID,
+                "chatroom_id": self.chatroom_id,
+                "content": STREAM_PLACEHOLDER_CONTENT
+            })
+            .execute()
+        )
+        self.message_id = response.data[0]["message_id"]
+        get_read_cache().invalidate(CHATROOM_MESSAGES, self.chatroom_id)
+        self._last_flush_time = time.perf_counter()
+
+
+    async def append(self, token: str) -> None:
+        """Adds a token of the final answer, flushing to the database if the batch is full or stale."""
+        if not token:
+            return
+
+        if self._first_token_time is None:
+            self._first_token_time = time.perf_counter()
+            metrics.observe("groupgpt_time_to_first_token_seconds", self._first_token_time - self._start_time)
+
+        self._content += token
+        self._pending_tokens += 1
+
+        elapsed_ms = (time.perf_counter() - self._last_flush_time) * 1000
+        if self._pending_tokens >= STREAM_FLUSH_EVERY_N_TOKENS or elapsed_ms >= STREAM_FLUSH_INTERVAL_MS:
+            await self._flush(self._visible_content(self._content))
+
+
+    async def discard(self) -> None:
+        """Drops any streamed tokens, e.g., when the model turn turned out to be a tool call."""
+        if self._content:
+            self._content = ""
+            await self._flush(STREAM_PLACEHOLDER_CONTENT)
+
+
+    async def finish(self, final_content: str) -> None:
+        """Writes the complete response into the placeholder message."""
+        await self._flush(final_content)
+        self.logger.debug(f"Finished streaming response {self.message_id} in {time.perf_counter() - self._start_time:.2f}s")
+
+
+    def _visible_content(self, content: str) -> str:
+        # Remove any "GroupGPT:" prefix, as is done for the final response
+        content = content.lstrip()
+        if content.startswith("GroupGPT:"):
+            content = content[len("GroupGPT:"):].lstrip()
+        return content or STREAM_PLACEHOLDER_CONTENT
+
+
+    async def _flush(self, content: str) -> None:
+        self._pending_tokens = 0
+        self._last_flush_time = time.perf_counter()
+
+        if self.message_id is None:
+            return
+
+        try:
+            await (
+                self.supabase.table("messages")
+                .update({"content": content})
+                .eq("message_id", self.message_id)
+                .execute()
+            )
+            get_read_cache().invalidate(CHATROOM_MESSAGES, self.chatroom_id)
+        except Exception as e:
+            self.logger.exception(f"Error updating streamed response {self.message_id}: {e}")
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 from langchain_community.utilities import ArxivAPIWrapper
@@ -35,3 +36,8 @@ class ArxivSearchTool(BaseTool):
         except Exception as e:
             logger.exception(f"Error executing arXiv search: {e}")
             return f"Error executing arXiv search: {str(e)}"
+
+    async def _arun(self, query: str) -> str:
+        """Search arXiv without blocking the event loop."""
+        # The arxiv client library is synchronous, so the search runs in a worker thread
+        return await asyncio.to_thread(self._run, query)
@@ -1,11 +1,34 @@
+import asyncio
 import logging
+from typing import List
 
-from langchain_openai import OpenAIEmbeddings
 from langchain_core.tools import BaseTool
+import numpy as np
 from pydantic import BaseModel, Field
+from supabase import AsyncClient, Client
 
-from app.constants import EMBEDDING_MODEL_NAME
-from app.dependencies import get_supabase
+from app.constants import (
+    EMBEDDING_MODEL_NAME,
+    HYBRID_SEARCH_EF_SEARCH,
+    HYBRID_SEARCH_QUANTIZATION,
+    HYBRID_SEARCH_RERANK_FACTOR,
+    HYBRID_SEARCH_RRF_K,
+    HYBRID_SEARCH_TEXT_WEIGHT,
+    HYBRID_SEARCH_VECTOR_WEIGHT,
+    RERANK_CANDIDATE_FACTOR,
+    RERANK_MAX_CANDIDATES
+)
+from app.dependencies import (
+    get_async_supabase,
+    get_embedding_service,
+    get_local_index,
+    get_query_embedding_cache,
+    get_reranker,
+    get_retrieval_cache,
+    get_settings,
+    get_supabase
+)
+from app.embeddings import encode_vector
 
 
 class ChunkRetrieverInput(BaseModel):
@@ -25,38 +48,132 @@ class ChunkRetrieverTool(BaseTool):
     description: str = "Retrieve relevant document chunks from the knowledge base using hybrid search. Use this when you need to find specific information or context from the knowledge base related to a query."
     args_schema: type[BaseModel] = ChunkRetrieverInput
 
+    def _format_chunks(self, document_chunks: List[dict]) -> str:
+        return "\n\n".join([
+            f"Filename: {chunk['filename']}\n"
+            + (f"Relevance score: {round(chunk['rerank_score'], 3)}\n" if "rerank_score" in chunk else f"RRF score: {round(chunk['rrf_score'], 3)}\n")
+            + f"Content: {chunk['content']}"
+            for chunk in document_chunks
+        ]) if document_chunks else "No relevant document chunks found."
+
+    def _num_candidates(self, num_chunks: int) -> int:
+        """Number of chunks to search for, over-fetching candidates for the reranker if enabled."""
+        if get_reranker() is None:
+            return int(num_chunks)
+        return max(int(num_chunks), min(int(num_chunks) * RERANK_CANDIDATE_FACTOR, RERANK_MAX_CANDIDATES))
+
+    def _hybrid_search_params(self, chatroom_id: str, query: str, query_embedding: np.ndarray, num_chunks: int) -> dict:
+        return {
+            "p_chatroom_id": chatroom_id,
+            "query_embedding": encode_vector(query_embedding),
+            "search_query": query,
+            "match_count": int(num_chunks),  # Number of relevant chunks to retrieve
+            "rrf_k": HYBRID_SEARCH_RRF_K,
+            "vector_weight": HYBRID_SEARCH_VECTOR_WEIGHT,
+            "text_weight": HYBRID_SEARCH_TEXT_WEIGHT,
+            "ef_search": HYBRID_SEARCH_EF_SEARCH,
+            "quantization": HYBRID_SEARCH_QUANTIZATION,
+            "rerank_factor": HYBRID_SEARCH_RERANK_FACTOR
+        }
+
+    def _knowledge_base_version_query(self, supabase: Client | AsyncClient, chatroom_id: str):
+        return supabase.table("chatrooms").select("knowledge_base_version").eq("chatroom_id", chatroom_id)
+
+    def _knowledge_base_version(self, response) -> int:
+        """Version of the chatroom's chunks in Supabase, bumped by triggers on every change (see migration 006)."""
+        return response.data[0]["knowledge_base_version"] if response.data else 0
+
+    def _uses_local_index(self) -> bool:
+        return get_settings().RETRIEVAL_BACKEND == "local"
+
+    def _hybrid_search_query(self, supabase: Client | AsyncClient, chatroom_id: str, query: str, query_embedding: np.ndarray, num_chunks: int):
+        return supabase.rpc("hybrid_search", self._hybrid_search_params(chatroom_id, query, query_embedding, self._num_candidates(num_chunks)))
+
+    def _search_local_index(self, chatroom_id: str, query: str, query_embedding: np.ndarray, num_chunks: int) -> List[dict]:
+        """Same search as hybrid_search, over the local shards of the chatroom's chunks (`RETRIEVAL_BACKEND=local`)."""
+        return get_local_index().search(
+            chatroom_id,
+            query_embedding,
+            query,
+            match_count=self._num_candidates(num_chunks),
+            rrf_k=HYBRID_SEARCH_RRF_K,
+            vector_weight=HYBRID_SEARCH_VECTOR_WEIGHT,
+            text_weight=HYBRID_SEARCH_TEXT_WEIGHT
+        )
+
+    def _rerank_and_cache(self, chatroom_id: str, version, query: str, num_chunks: int, candidates: List[dict]) -> List[dict]:
+        """Reranks the searched candidates if a reranker is enabled, and caches the results under `version`."""
+        reranker = get_reranker()
+        # Reranked results are cached, so repeated queries skip the reranker as well
+        document_chunks = reranker.rerank(query, candidates, int(num_chunks)) if reranker is not None else candidates
+        get_retrieval_cache().set(chatroom_id, version, query, int(num_chunks), document_chunks)
+        return document_chunks
+
+    def _format_results(self, logger: logging.Logger, chatroom_id: str, query: str, num_chunks: int, document_chunks: List[dict]) -> str:
+        chunks_text = self._format_chunks(document_chunks)
+        logger.debug(f"Chunk retrieval executed with the following parameters:\n"
+                     f"Chatroom ID: {chatroom_id}\n"
+                     f"Query: {query}\n"
+                     f"Number of Chunks: {num_chunks}")
+        logger.debug(f"Retrieved document chunks:\n{chunks_text}")
+        return chunks_text
+
+    def _format_error(self, logger: logging.Logger, error: Exception) -> str:
+        logger.exception(f"Error retrieving chunks: {error}")
+        return f"Error retrieving chunks: {str(error)}"
+
     def _run(self, chatroom_id: str, query: str, num_chunks: int = 5) -> str:
         """
         Searches knowledge base for relevant document chunks and returns the results.
         """
         logger = logging.getLogger(self.__class__.__name__)
         supabase = get_supabase()
-        embedding_model = OpenAIEmbeddings(model=EMBEDDING_MODEL_NAME)
 
         try:
-            query_embedding = embedding_model.embed_query(query)
-            response = (
-                supabase.rpc("hybrid_search", {
-                    "p_chatroom_id": chatroom_id,
-                    "query_embedding": query_embedding,
-                    "search_query": query,
-                    "match_count": int(num_chunks)  # Number of relevant chunks to retrieve
-                })
-                .execute()
-            )
-            document_chunks = response.data
-            chunks_text = "\n\n".join([
-                f"Filename: {chunk['filename']}\nRRF score: {round(chunk['rrf_score'], 3)}\nContent: {chunk['content']}"
-                for chunk in document_chunks
-            ]) if document_chunks else "No relevant document chunks found."
-
-            logger.debug(f"Chunk retrieval executed with the following parameters:\n"
-                         f"Chatroom ID: {chatroom_id}\n"
-                         f"Query: {query}\n"
-                         f"Number of Chunks: {num_chunks}")
-            logger.debug(f"Retrieved document chunks:\n{chunks_text}")
-
-            return chunks_text
+            # Read the version before searching, so that results racing with a knowledge base change are not cached
+            if self._uses_local_index():
+                version = get_local_index().version(chatroom_id)
+            else:
+                version = self._knowledge_base_version(self._knowledge_base_version_query(supabase, chatroom_id).execute())
+
+            document_chunks = get_retrieval_cache().get(chatroom_id, version, query, int(num_chunks))
+            if document_chunks is None:
+                # Repeated queries within a response and across chatrooms reuse the cached embedding
+                query_embedding = get_query_embedding_cache().embed_query(get_embedding_service(), EMBEDDING_MODEL_NAME, query)
+                if self._uses_local_index():
+                    candidates = self._search_local_index(chatroom_id, query, query_embedding, num_chunks)
+                else:
+                    candidates = self._hybrid_search_query(supabase, chatroom_id, query, query_embedding, num_chunks).execute().data
+                document_chunks = self._rerank_and_cache(chatroom_id, version, query, num_chunks, candidates)
+
+            return self._format_results(logger, chatroom_id, query, num_chunks, document_chunks)
+        except Exception as e:
+            return self._format_error(logger, e)
+
+    async def _arun(self, chatroom_id: str, query: str, num_chunks: int = 5) -> str:
+        """
+        Asynchronously searches knowledge base for relevant document chunks and returns the results.
+        """
+        logger = logging.getLogger(self.__class__.__name__)
+        supabase = get_async_supabase()
+
+        try:
+            if self._uses_local_index():
+                version = get_local_index().version(chatroom_id)
+            else:
+                version = self._knowledge_base_version(await self._knowledge_base_version_query(supabase, chatroom_id).execute())
+
+            document_chunks = get_retrieval_cache().get(chatroom_id, version, query, int(num_chunks))
+            if document_chunks is None:
+                query_embedding = await get_query_embedding_cache().aembed_query(get_embedding_service(), EMBEDDING_MODEL_NAME, query)
+                if self._uses_local_index():
+                    # Loading or syncing shards reads from disk, so keep it off the event loop
+                    candidates = await asyncio.to_thread(self._search_local_index, chatroom_id, query, query_embedding, num_chunks)
+                else:
+                    candidates = (await self._hybrid_search_query(supabase, chatroom_id, query, query_embedding, num_chunks).execute()).data
+                # Scoring, especially by a cross-encoder, is CPU-bound
+                document_chunks = await asyncio.to_thread(self._rerank_and_cache, chatroom_id, version, query, num_chunks, candidates)
+
+            return self._format_results(logger, chatroom_id, query, num_chunks, document_chunks)
         except Exception as e:
-            logger.exception(f"Error retrieving chunks: {e}")
-            return f"Error retrieving chunks: {str(e)}"
+            return self._format_error(logger, e)
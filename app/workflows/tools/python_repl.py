@@ -1,9 +1,17 @@
+import asyncio
 import logging
+import subprocess
+import sys
 
 from langchain_core.tools import BaseTool
-from langchain_experimental.utilities import PythonREPL
 from pydantic import BaseModel, Field
 
+from app.constants import PYTHON_REPL_TIMEOUT_SECONDS
+
+# Isolated mode: ignores PYTHON* environment variables and the user site directory, and does not add the app's
+# working directory to sys.path; the code is read from stdin
+PYTHON_COMMAND = [sys.executable, "-I", "-"]
+
 
 class PythonREPLInput(BaseModel):
     """
@@ -15,23 +23,73 @@ class PythonREPLInput(BaseModel):
 class PythonREPLTool(BaseTool):
     """
     Tool for executing Python code in a REPL environment.
+
+    The code runs in a separate Python process, whose output is captured through a pipe. Unlike executing it in the
+    app's process, this never redirects the process-wide `sys.stdout`, so other requests and tool calls are
+    unaffected.
     """
     name: str = "python_repl"
     description: str = "Execute Python code in a REPL environment. Use this when you need to run Python code to perform calculations."
     args_schema: type[BaseModel] = PythonREPLInput
 
+    def _format_result(self, returncode: int, stdout: bytes, stderr: bytes) -> str:
+        output = stdout.decode(errors="replace")
+        if returncode != 0:
+            # Like the REPL, report the exception (the last line of the traceback) after any printed output
+            lines = stderr.decode(errors="replace").strip().splitlines()
+            output += lines[-1] if lines else f"Process exited with code {returncode}"
+        return output
+
     def _run(self, code: str) -> str:
         """Execute the provided Python code and return the output."""
         logger = logging.getLogger(self.__class__.__name__)
-        repl = PythonREPL()
 
         try:
-            result = repl.run(code)
+            completed = subprocess.run(PYTHON_COMMAND, input=code.encode(), capture_output=True, timeout=PYTHON_REPL_TIMEOUT_SECONDS)
+            result = self._format_result(completed.returncode, completed.stdout, completed.stderr)
+
+            logger.debug(f"Executed Python code: {code}")
+            logger.debug(f"Python REPL result: {result}")
+
+            return result
+        except subprocess.TimeoutExpired:
+            logger.warning(f"Python code timed out after {PYTHON_REPL_TIMEOUT_SECONDS} seconds: {code}")
+            return f"Error executing Python code: timed out after {PYTHON_REPL_TIMEOUT_SECONDS} seconds"
+        except Exception as e:
+            logger.exception(f"Error executing Python code: {e}")
+            return f"Error executing Python code: {str(e)}"
+
+    async def _arun(self, code: str) -> str:
+        """Asynchronously execute the provided Python code and return the output."""
+        logger = logging.getLogger(self.__class__.__name__)
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *PYTHON_COMMAND,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except Exception as e:
+            logger.exception(f"Error executing Python code: {e}")
+            return f"Error executing Python code: {str(e)}"
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(code.encode()), PYTHON_REPL_TIMEOUT_SECONDS)
+            result = self._format_result(process.returncode, stdout, stderr)
 
             logger.debug(f"Executed Python code: {code}")
             logger.debug(f"Python REPL result: {result}")
 
             return result
+        except asyncio.TimeoutError:
+            logger.warning(f"Python code timed out after {PYTHON_REPL_TIMEOUT_SECONDS} seconds: {code}")
+            return f"Error executing Python code: timed out after {PYTHON_REPL_TIMEOUT_SECONDS} seconds"
         except Exception as e:
             logger.exception(f"Error executing Python code: {e}")
             return f"Error executing Python code: {str(e)}"
+        finally:
+            # Also reached when the tool call is cancelled, e.g., by the tool call timeout
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import Any, Dict, List
 
@@ -50,3 +51,9 @@ class WebSearchTool(BaseTool):
         except Exception as e:
             logger.exception(f"Error executing web search: {e}")
             return f"Error executing web search: {str(e)}"
+
+
+    async def _arun(self, query: str, num_results: int = 5) -> str:
+        """Search the web without blocking the event loop."""
+        # The Google API client is synchronous, so the search runs in a worker thread
+        return await asyncio.to_thread(self._run, query, num_results)
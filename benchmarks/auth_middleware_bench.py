@@ -0,0 +1,155 @@
+"""
+Compares the requests-per-second of the legacy `BaseHTTPMiddleware` auth layer (sync Supabase client)
+against the pure ASGI `AuthMiddleware` (async Supabase client) using a local stub of the Supabase
+Auth and PostgREST endpoints.
+
+Usage (from the repository root):
+    python -m benchmarks.auth_middleware_bench --requests 2000 --concurrency 50 --latency-ms 20
+"""
+import argparse
+import asyncio
+import os
+import socket
+import threading
+import time
+
+# Settings are read from the environment on import, so point the app at the stub before importing it
+STUB_PORT = 54329
+os.environ.update({
+    "SUPABASE_URL": f"http://127.0.0.1:{STUB_PORT}",
+    "SUPABASE_SERVICE_ROLE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.stub",
+    "SUPABASE_JWT_SECRET_KEY": "stub-secret",
+    "SUPABASE_JWT_VERIFY_LOCALLY": "false",
+})
+for key in [
+    "GROUPGPT_USER_ID", "ANTHROPIC_API_KEY", "GEMINI_API_KEY", "OPENAI_API_KEY", "LANGSMITH_ENDPOINT",
+    "LANGSMITH_API_KEY", "LANGSMITH_PROJECT", "GOOGLE_API_KEY", "GOOGLE_CSE_ID"
+]:
+    os.environ.setdefault(key, "stub")
+os.environ.setdefault("LANGSMITH_TRACING", "false")
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app import auth
+from app.dependencies import get_supabase
+from app.middlewares import AuthMiddleware
+
+STUB_USER = {
+    "id": "00000000-0000-0000-0000-000000000001",
+    "aud": "authenticated",
+    "role": "authenticated",
+    "app_metadata": {},
+    "user_metadata": {},
+    "created_at": "2025-01-01T00:00:00Z"
+}
+
+
+def build_stub_server(latency_s: float) -> FastAPI:
+    stub = FastAPI()
+
+    @stub.get("/auth/v1/user")
+    async def get_user():
+        await asyncio.sleep(latency_s)
+        return STUB_USER
+
+    @stub.get("/rest/v1/users")
+    async def get_users():
+        await asyncio.sleep(latency_s)
+        return [{"user_id": "user-1", "username": "bench"}]
+
+    return stub
+
+
+def start_stub_server(latency_s: float) -> uvicorn.Server:
+    config = uvicorn.Config(build_stub_server(latency_s), host="127.0.0.1", port=STUB_PORT, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", STUB_PORT)) == 0:
+                return server
+        time.sleep(0.05)
+    raise RuntimeError("Stub server failed to start")
+
+
+async def legacy_auth_middleware(request: Request, call_next) -> Response:
+    """Auth middleware as it was before the ASGI rewrite: sync client, two round trips per request."""
+    auth_header = request.headers.get("Authorization", None)
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Authorization header")
+
+    token = auth_header.split(' ')[1]
+    supabase = get_supabase()
+    auth_user_response = supabase.auth.get_user(token)
+    user_response = (
+        supabase
+        .from_("users")
+        .select("user_id, username")
+        .eq("auth_id", auth_user_response.user.id)
+        .execute()
+    )
+    request.state.user_id = user_response.data[0]["user_id"]
+    request.state.username = user_response.data[0]["username"]
+
+    return await call_next(request)
+
+
+def build_app(use_asgi_middleware: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    async def ping(request: Request):
+        return JSONResponse(content={"user_id": request.state.user_id})
+
+    if use_asgi_middleware:
+        app.add_middleware(AuthMiddleware)
+    else:
+        app.add_middleware(BaseHTTPMiddleware, dispatch=legacy_auth_middleware)
+
+    return app
+
+
+async def measure(app: FastAPI, num_requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": "Bearer stub-token"}
+    remaining = iter(range(num_requests))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for _ in remaining:
+                response = await client.get("/api/ping", headers=headers)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    return num_requests / elapsed
+
+
+async def main(args: argparse.Namespace) -> None:
+    start_stub_server(args.latency_ms / 1000)
+
+    results = {}
+    for label, use_asgi in [("before (BaseHTTPMiddleware, sync client)", False), ("after (ASGI, async client)", True)]:
+        auth._user_cache.clear()
+        await measure(build_app(use_asgi), min(50, args.requests), args.concurrency)  # Warm-up
+        results[label] = await measure(build_app(use_asgi), args.requests, args.concurrency)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, stub latency {args.latency_ms} ms")
+    for label, rps in results.items():
+        print(f"{label:<45} {rps:>10.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+"""
+Compares embedding a set of documents concurrently with one embeddings request per chunk (as `legacy/embed.py` used to)
+against the shared `EmbeddingService`, using a local fake embedding server with a requests per minute limit.
+
+Usage (from the repository root):
+    python -m benchmarks.embedding_service_bench --documents 8 --chunks 200 --rpm 600
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import socket
+import threading
+import time
+
+# Settings are read from the environment on import, so point the app at the fake server before importing it
+SERVER_PORT = 54331
+os.environ["OPENAI_EMBEDDINGS_BASE_URL"] = f"http://127.0.0.1:{SERVER_PORT}/v1"
+for key in [
+    "SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY", "SUPABASE_JWT_SECRET_KEY", "GROUPGPT_USER_ID", "ANTHROPIC_API_KEY",
+    "GEMINI_API_KEY", "OPENAI_API_KEY", "LANGSMITH_ENDPOINT", "LANGSMITH_API_KEY", "LANGSMITH_PROJECT",
+    "GOOGLE_API_KEY", "GOOGLE_CSE_ID"
+]:
+    os.environ.setdefault(key, "stub")
+os.environ.setdefault("LANGSMITH_TRACING", "false")
+
+import httpx
+from openai import OpenAI, RateLimitError
+import uvicorn
+
+from app import metrics
+from app.constants import EMBEDDING_MODEL_NAME
+from app.embeddings import EmbeddingService
+from benchmarks.fake_embedding_server import create_app
+
+
+def start_fake_server(args: argparse.Namespace) -> None:
+    app = create_app(latency_ms=args.latency_ms, requests_per_minute=args.rpm)
+    config = uvicorn.Config(app, host="127.0.0.1", port=SERVER_PORT, log_level="error")
+    threading.Thread(target=uvicorn.Server(config).run, daemon=True).start()
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", SERVER_PORT)) == 0:
+                return
+        time.sleep(0.05)
+    raise RuntimeError("Fake embedding server failed to start")
+
+
+def build_documents(num_documents: int, num_chunks: int) -> list[list[str]]:
+    return [
+        [f"Document {d}, chunk {c}: " + "lorem ipsum dolor sit amet " * 40 for c in range(num_chunks)]
+        for d in range(num_documents)
+    ]
+
+
+def embed_per_chunk(client: OpenAI, chunks: list[str]) -> int:
+    """Embeds the chunks one request at a time, like the legacy pipeline. Returns the number of 429 responses."""
+    num_rate_limited = 0
+    for chunk in chunks:
+        while True:
+            try:
+                client.embeddings.create(model=EMBEDDING_MODEL_NAME, input=[chunk], encoding_format="float")
+                break
+            except RateLimitError:
+                num_rate_limited += 1
+                time.sleep(1)
+    return num_rate_limited
+
+
+def run(label: str, embed, documents: list[list[str]]) -> list:
+    server_stats = httpx.get(f"http://127.0.0.1:{SERVER_PORT}/stats").json()
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(documents)) as executor:
+        results = list(executor.map(embed, documents))
+    elapsed = time.perf_counter() - start_time
+
+    new_stats = httpx.get(f"http://127.0.0.1:{SERVER_PORT}/stats").json()
+    num_chunks = sum(len(chunks) for chunks in documents)
+    num_requests = new_stats["requests"] - server_stats["requests"]
+    num_rate_limited = new_stats["rate_limited"] - server_stats["rate_limited"]
+    print(f"{label:<24} {elapsed:>7.2f} s   {num_chunks / elapsed:>8.0f} chunks/s   {num_requests:>6} requests   {num_rate_limited:>5} rate limited")
+    return results
+
+
+def main(args: argparse.Namespace) -> None:
+    start_fake_server(args)
+    documents = build_documents(args.documents, args.chunks)
+    print(f"{args.documents} documents of {args.chunks} chunks, fake server at {args.latency_ms:.0f} ms per request and {args.rpm} requests per minute")
+
+    client = OpenAI(api_key="stub", base_url=os.environ["OPENAI_EMBEDDINGS_BASE_URL"], max_retries=0)
+    if not args.skip_per_chunk:
+        run("One request per chunk", lambda chunks: embed_per_chunk(client, chunks), documents)
+
+    # Stay within the server's limit instead of discovering it through 429 responses
+    service = EmbeddingService(client, EMBEDDING_MODEL_NAME, requests_per_minute=args.rpm, tokens_per_minute=10_000_000)
+    results = run("EmbeddingService", service.embed_documents, documents)
+    service.close()
+
+    assert all(len(embeddings) == len(chunks) for embeddings, chunks in zip(results, documents))
+    snapshot = metrics.snapshot()
+    batch_tokens = snapshot["observations"].get("embedding_batch_tokens", {"count": 0, "sum": 0})
+    latency = snapshot["observations"].get("embedding_request_latency_seconds", {"count": 0, "sum": 0, "max": 0})
+    print(f"EmbeddingService: {batch_tokens['count']} batches of {batch_tokens['sum'] / max(1, batch_tokens['count']):.0f} tokens on average, "
+          f"request latency mean {latency['sum'] / max(1, latency['count']):.2f} s, max {latency['max']:.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--skip-per-chunk", action="store_true", help="Skip the slow one request per chunk baseline")
+    main(parser.parse_args())
@@ -0,0 +1,96 @@
+"""
+Local fake of the OpenAI embeddings endpoint, for testing the embedding service without calling the API.
+
+Returns deterministic vectors derived from each input's SHA-256, after a configurable latency per request and per
+input, and rejects requests over the configured requests or tokens per minute with 429 and a Retry-After header.
+
+Usage (from the repository root):
+    python -m benchmarks.fake_embedding_server --port 8089 --rpm 600 --tpm 200000
+    OPENAI_EMBEDDINGS_BASE_URL=http://127.0.0.1:8089/v1 uvicorn app.main:app
+"""
+import argparse
+from collections import deque
+import hashlib
+from threading import Lock
+import time
+from typing import List
+
+import numpy as np
+import uvicorn
+from fastapi import Body, FastAPI
+from fastapi.responses import ORJSONResponse
+
+
+def fake_embedding(text: str, dimensions: int) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def create_app(
+    dimensions: int = 1536,
+    latency_ms: float = 50,
+    latency_per_input_ms: float = 0.5,
+    requests_per_minute: int | None = None,
+    tokens_per_minute: int | None = None
+) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = deque()  # (time, num_tokens) of the requests accepted within the last minute
+    app.state.stats = {"requests": 0, "inputs": 0, "rate_limited": 0}
+    lock = Lock()
+
+    # Sync endpoint, so that concurrent requests are served from the threadpool while sleeping
+    @app.post("/v1/embeddings")
+    def create_embeddings(body: dict = Body(...)):
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        num_tokens = sum(len(str(text)) // 4 + 1 for text in inputs)  # Approximation, good enough for rate limiting
+
+        with lock:
+            now = time.monotonic()
+            window = app.state.requests
+            while window and now - window[0][0] > 60:
+                window.popleft()
+            over_requests = requests_per_minute is not None and len(window) >= requests_per_minute
+            over_tokens = tokens_per_minute is not None and sum(tokens for _, tokens in window) + num_tokens > tokens_per_minute
+            if over_requests or over_tokens:
+                app.state.stats["rate_limited"] += 1
+                retry_after = max(0.1, 60 - (now - window[0][0])) if window else 1.0
+                return ORJSONResponse(
+                    status_code=429,
+                    content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                    headers={"retry-after": f"{retry_after:.2f}"}
+                )
+            window.append((now, num_tokens))
+            app.state.stats["requests"] += 1
+            app.state.stats["inputs"] += len(inputs)
+
+        time.sleep((latency_ms + latency_per_input_ms * len(inputs)) / 1000)
+
+        return ORJSONResponse({
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(str(text), dimensions)}
+                for i, text in enumerate(inputs)
+            ],
+            "model": body["model"],
+            "usage": {"prompt_tokens": num_tokens, "total_tokens": num_tokens}
+        })
+
+    @app.get("/stats")
+    def get_stats():
+        return app.state.stats
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--rpm", type=int, default=None)
+    parser.add_argument("--tpm", type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app(args.dimensions, args.latency_ms, requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
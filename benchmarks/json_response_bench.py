@@ -0,0 +1,124 @@
+"""
+Compares response latency of GET /api/messages for a large chatroom when the PostgREST result is
+re-encoded with `JSONResponse` (stdlib json), encoded with `ORJSONResponse`, or streamed to the client
+as is (`POSTGREST_PASSTHROUGH_RESPONSES`), using a local stub of the PostgREST RPC endpoint.
+
+Usage (from the repository root):
+    python -m benchmarks.json_response_bench --messages 10000 --requests 50
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+from uuid import uuid4
+
+# Settings are read from the environment on import, so point the app at the stub before importing it
+STUB_PORT = 54330
+os.environ.update({
+    "SUPABASE_URL": f"http://127.0.0.1:{STUB_PORT}",
+    "SUPABASE_SERVICE_ROLE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.stub",
+    "SUPABASE_JWT_SECRET_KEY": "stub-secret",
+})
+for key in [
+    "GROUPGPT_USER_ID", "ANTHROPIC_API_KEY", "GEMINI_API_KEY", "OPENAI_API_KEY", "LANGSMITH_ENDPOINT",
+    "LANGSMITH_API_KEY", "LANGSMITH_PROJECT", "GOOGLE_API_KEY", "GOOGLE_CSE_ID"
+]:
+    os.environ.setdefault(key, "stub")
+os.environ.setdefault("LANGSMITH_TRACING", "false")
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.dependencies import get_settings
+from app.routers import messages
+
+
+def build_messages(num_messages: int) -> bytes:
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        {
+            "message_id": str(uuid4()),
+            "username": f"user{i % 5}",
+            "content": f"Message {i}: " + "lorem ipsum dolor sit amet " * 8,
+            "sent_at": (start + timedelta(seconds=i)).isoformat(),
+            "attachments": [{"attachment_id": str(uuid4()), "mime_type": "application/pdf", "filename": "notes.pdf"}] if i % 50 == 0 else []
+        }
+        for i in range(num_messages)
+    ]
+    return json.dumps(rows).encode()
+
+
+def start_stub_server(body: bytes) -> uvicorn.Server:
+    stub = FastAPI()
+
+    @stub.post("/rest/v1/rpc/get_chatroom_messages")
+    async def get_chatroom_messages():
+        return Response(content=body, media_type="application/json")
+
+    config = uvicorn.Config(stub, host="127.0.0.1", port=STUB_PORT, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", STUB_PORT)) == 0:
+                return server
+        time.sleep(0.05)
+    raise RuntimeError("Stub server failed to start")
+
+
+async def measure(num_requests: int) -> list[float]:
+    app = FastAPI()
+    app.include_router(messages.router)
+    transport = httpx.ASGITransport(app=app)
+
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(num_requests):
+            start = time.perf_counter()
+            response = await client.get("/api/messages", params={"chatroom_id": str(uuid4())})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    return latencies
+
+
+async def main(args: argparse.Namespace) -> None:
+    body = build_messages(args.messages)
+    start_stub_server(body)
+    settings = get_settings()
+
+    modes = [
+        ("JSONResponse (stdlib json)", JSONResponse, False),
+        ("ORJSONResponse", ORJSONResponse, False),
+        ("PostgREST passthrough", ORJSONResponse, True),
+    ]
+
+    results = {}
+    for label, response_class, passthrough in modes:
+        messages.ORJSONResponse = response_class
+        settings.POSTGREST_PASSTHROUGH_RESPONSES = passthrough
+        await measure(min(5, args.requests))  # Warm-up
+        results[label] = await measure(args.requests)
+
+    messages.ORJSONResponse = ORJSONResponse
+    settings.POSTGREST_PASSTHROUGH_RESPONSES = False
+
+    print(f"{args.messages} messages ({len(body) / 1_000_000:.1f} MB), {args.requests} sequential requests")
+    for label, latencies in results.items():
+        print(f"{label:<30} mean {statistics.mean(latencies) * 1000:>8.1f} ms   p95 {sorted(latencies)[int(0.95 * len(latencies)) - 1] * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,93 @@
+"""
+Checks that the local retrieval backend (`RETRIEVAL_BACKEND=local`) returns the same chunks as hybrid_search, and
+compares their latency, for a chatroom in the configured Supabase project.
+
+The chatroom's chunks are synced into a temporary local index, and each query is embedded once and searched with
+both backends. Differences are expected where BM25 and `ts_rank_cd` rank the lexical matches differently, or where
+Postgres stems words that the local tokenizer does not.
+
+Usage (from the repository root, with the app's .env):
+    python -m benchmarks.local_index_parity --chatroom-id <chatroom_id> \\
+        --queries "What is attention?" "How is the model trained?" --match-count 5
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.constants import (
+    EMBEDDING_MODEL_NAME,
+    HYBRID_SEARCH_EF_SEARCH,
+    HYBRID_SEARCH_QUANTIZATION,
+    HYBRID_SEARCH_RERANK_FACTOR,
+    HYBRID_SEARCH_RRF_K,
+    HYBRID_SEARCH_TEXT_WEIGHT,
+    HYBRID_SEARCH_VECTOR_WEIGHT
+)
+from app.dependencies import close_embedding_service, get_embedding_service, get_query_embedding_cache, get_supabase
+from app.embeddings import encode_vector
+from app.retrieval import LocalChunkIndex
+
+
+def main(args: argparse.Namespace) -> None:
+    supabase = get_supabase()
+
+    with tempfile.TemporaryDirectory() as root:
+        local_index = LocalChunkIndex(root, supabase, max_loaded_chatrooms=1)
+        start_time = time.perf_counter()
+        local_index.sync_chatroom(args.chatroom_id)
+        print(f"Synced chatroom {args.chatroom_id} in {time.perf_counter() - start_time:.2f}s")
+
+        overlaps, rpc_latencies, local_latencies = [], [], []
+        for query in args.queries:
+            query_embedding = get_query_embedding_cache().embed_query(get_embedding_service(), EMBEDDING_MODEL_NAME, query)
+
+            start_time = time.perf_counter()
+            rpc_chunks = supabase.rpc("hybrid_search", {
+                "p_chatroom_id": args.chatroom_id,
+                "query_embedding": encode_vector(query_embedding),
+                "search_query": query,
+                "match_count": args.match_count,
+                "rrf_k": HYBRID_SEARCH_RRF_K,
+                "vector_weight": HYBRID_SEARCH_VECTOR_WEIGHT,
+                "text_weight": HYBRID_SEARCH_TEXT_WEIGHT,
+                "ef_search": HYBRID_SEARCH_EF_SEARCH,
+                "quantization": HYBRID_SEARCH_QUANTIZATION,
+                "rerank_factor": HYBRID_SEARCH_RERANK_FACTOR
+            }).execute().data
+            rpc_latencies.append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            local_chunks = local_index.search(
+                args.chatroom_id,
+                query_embedding,
+                query,
+                match_count=args.match_count,
+                rrf_k=HYBRID_SEARCH_RRF_K,
+                vector_weight=HYBRID_SEARCH_VECTOR_WEIGHT,
+                text_weight=HYBRID_SEARCH_TEXT_WEIGHT
+            )
+            local_latencies.append(time.perf_counter() - start_time)
+
+            rpc_ids = [chunk["chunk_id"] for chunk in rpc_chunks]
+            local_ids = [chunk["chunk_id"] for chunk in local_chunks]
+            overlap = len(set(rpc_ids) & set(local_ids)) / max(1, len(rpc_ids))
+            overlaps.append(overlap)
+            print(f"{overlap:>6.2f} overlap, same order: {rpc_ids == local_ids!s:<5}  {query}")
+
+    print(f"Mean overlap@{args.match_count}: {statistics.mean(overlaps):.3f}")
+    print(f"hybrid_search RPC   mean {statistics.mean(rpc_latencies) * 1000:>8.2f} ms")
+    print(f"Local index         mean {statistics.mean(local_latencies) * 1000:>8.2f} ms (first query includes loading shards)")
+    close_embedding_service()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chatroom-id", required=True)
+    parser.add_argument("--queries", nargs="+", required=True)
+    parser.add_argument("--match-count", type=int, default=5)
+    main(parser.parse_args())
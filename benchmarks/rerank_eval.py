@@ -0,0 +1,170 @@
+"""
+Offline evaluation of the chunk retriever's reranking stage (RERANKER setting) against plain RRF ordering.
+
+For each labelled query, the over-fetched candidates (as requested by the chunk retriever with a reranker enabled)
+are ordered by each configuration, and the top `--k` are scored:
+- hit@k: Queries with at least one relevant chunk in the results, i.e., that the model need not rephrase and retry
+- recall@k, MRR and nDCG@k against the labelled relevant chunks
+- Chunks and prompt tokens per tool result, formatted as the chunk retriever returns them to the model
+
+Datasets are JSONL files with one query per line, e.g.
+    {"query": "...", "relevant": ["<chunk_id>", ...], "candidates": [{"chunk_id", "filename", "content", "rrf_score"}, ...]}
+Lines with a "chatroom_id" instead of "candidates" are searched with hybrid_search in the configured Supabase project.
+Without `--dataset`, a synthetic dataset is generated, which only exercises the harness and the scorers.
+
+Usage (from the repository root, with the app's .env):
+    python -m benchmarks.rerank_eval --dataset eval/queries.jsonl --k 5
+    python -m benchmarks.rerank_eval --synthetic-queries 200 --cross-encoder
+"""
+import argparse
+import json
+import math
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import numpy as np
+import tiktoken
+
+from app.constants import (
+    EMBEDDING_MODEL_NAME,
+    HYBRID_SEARCH_EF_SEARCH,
+    HYBRID_SEARCH_QUANTIZATION,
+    HYBRID_SEARCH_RERANK_FACTOR,
+    HYBRID_SEARCH_RRF_K,
+    HYBRID_SEARCH_TEXT_WEIGHT,
+    HYBRID_SEARCH_VECTOR_WEIGHT,
+    RERANK_CANDIDATE_FACTOR,
+    RERANK_CROSS_ENCODER_PRIOR_WEIGHT,
+    RERANK_LEXICAL_PRIOR_WEIGHT,
+    RERANK_MAX_CANDIDATES,
+    RERANK_MIN_RELATIVE_SCORE
+)
+from app.embeddings import encode_vector
+from app.retrieval import CrossEncoderReranker, LexicalReranker
+from app.workflows.tools.chunk_retriever import ChunkRetrieverTool
+
+
+def generate_synthetic(rng: np.random.Generator, num_queries: int, num_candidates: int, vocabulary_size: int) -> List[dict]:
+    """
+    Generates queries of three terms, each with two relevant chunks containing the query terms, partial matches
+    containing one of them, and unrelated chunks. The relevant chunks are placed anywhere in the RRF order.
+    """
+    vocabulary = np.array([f"term{i}" for i in range(vocabulary_size)])
+    samples = []
+    for q in range(num_queries):
+        query_terms = rng.choice(vocabulary, size=3, replace=False).tolist()
+        candidates = []
+        for i in range(num_candidates):
+            filler = rng.choice(vocabulary, size=120).tolist()
+            if i < 2:
+                # Relevant chunks contain all query terms, the first one also as a phrase
+                terms = [" ".join(query_terms)] if i == 0 else query_terms
+            elif i < num_candidates // 2:
+                terms = [str(rng.choice(query_terms))]
+            else:
+                terms = []
+            for term in terms:
+                filler.insert(int(rng.integers(0, len(filler))), term)
+            candidates.append({"chunk_id": f"{q}-{i}", "filename": f"document_{i % 7}.pdf", "content": " ".join(filler)})
+
+        order = rng.permutation(num_candidates)
+        for rank, i in enumerate(order, start=1):
+            candidates[i]["rrf_score"] = 1 / (HYBRID_SEARCH_RRF_K + rank)
+        samples.append({
+            "query": " ".join(query_terms),
+            "relevant": [f"{q}-0", f"{q}-1"],
+            "candidates": sorted(candidates, key=lambda chunk: -chunk["rrf_score"])
+        })
+    return samples
+
+
+def fetch_candidates(samples: List[dict], num_candidates: int) -> None:
+    """Searches the candidates of samples labelled with a chatroom ID, like the chunk retriever does."""
+    from app.dependencies import close_embedding_service, get_embedding_service, get_query_embedding_cache, get_supabase
+
+    for sample in samples:
+        if "candidates" in sample:
+            continue
+        query_embedding = get_query_embedding_cache().embed_query(get_embedding_service(), EMBEDDING_MODEL_NAME, sample["query"])
+        sample["candidates"] = get_supabase().rpc("hybrid_search", {
+            "p_chatroom_id": sample["chatroom_id"],
+            "query_embedding": encode_vector(query_embedding),
+            "search_query": sample["query"],
+            "match_count": num_candidates,
+            "rrf_k": HYBRID_SEARCH_RRF_K,
+            "vector_weight": HYBRID_SEARCH_VECTOR_WEIGHT,
+            "text_weight": HYBRID_SEARCH_TEXT_WEIGHT,
+            "ef_search": HYBRID_SEARCH_EF_SEARCH,
+            "quantization": HYBRID_SEARCH_QUANTIZATION,
+            "rerank_factor": HYBRID_SEARCH_RERANK_FACTOR
+        }).execute().data
+    close_embedding_service()
+
+
+def evaluate(name: str, rank: Callable[[str, List[dict], int], List[dict]], samples: List[dict], k: int, encoding) -> None:
+    formatter = ChunkRetrieverTool()
+    hits, recalls, reciprocal_ranks, ndcgs, num_chunks, num_tokens, latencies = [], [], [], [], [], [], []
+    for sample in samples:
+        start_time = time.perf_counter()
+        results = rank(sample["query"], sample["candidates"], k)
+        latencies.append(time.perf_counter() - start_time)
+
+        relevant = set(sample["relevant"])
+        gains = [1.0 if chunk["chunk_id"] in relevant else 0.0 for chunk in results]
+        hits.append(float(any(gains)))
+        recalls.append(sum(gains) / max(1, len(relevant)))
+        reciprocal_ranks.append(next((1 / rank for rank, gain in enumerate(gains, start=1) if gain), 0.0))
+        dcg = sum(gain / math.log2(rank + 1) for rank, gain in enumerate(gains, start=1))
+        ideal_dcg = sum(1 / math.log2(rank + 1) for rank in range(1, min(len(relevant), k) + 1))
+        ndcgs.append(dcg / ideal_dcg if ideal_dcg else 0.0)
+        num_chunks.append(len(results))
+        num_tokens.append(len(encoding.encode(formatter._format_chunks(results))))
+
+    print(
+        f"  {name:<28} hit@{k} {statistics.mean(hits):>6.3f}   recall@{k} {statistics.mean(recalls):>6.3f}   "
+        f"MRR {statistics.mean(reciprocal_ranks):>6.3f}   nDCG@{k} {statistics.mean(ndcgs):>6.3f}   "
+        f"{statistics.mean(num_chunks):>5.2f} chunks   {statistics.mean(num_tokens):>7.0f} tokens   "
+        f"{statistics.mean(latencies) * 1000:>7.2f} ms"
+    )
+
+
+def main(args: argparse.Namespace) -> None:
+    # Candidates requested by the chunk retriever when a reranker is enabled
+    num_candidates = max(args.k, min(args.k * RERANK_CANDIDATE_FACTOR, RERANK_MAX_CANDIDATES))
+    if args.dataset is not None:
+        with open(args.dataset) as f:
+            samples = [json.loads(line) for line in f if line.strip()]
+        fetch_candidates(samples, num_candidates)
+    else:
+        samples = generate_synthetic(np.random.default_rng(args.seed), args.synthetic_queries, num_candidates, args.vocabulary)
+
+    configurations: Dict[str, Callable[[str, List[dict], int], List[dict]]] = {
+        "RRF order (no reranker)": lambda query, candidates, k: sorted(candidates, key=lambda chunk: -chunk["rrf_score"])[:k],
+        "lexical, all top-k": LexicalReranker(RERANK_LEXICAL_PRIOR_WEIGHT, min_relative_score=0.0).rerank,
+        "lexical": LexicalReranker(RERANK_LEXICAL_PRIOR_WEIGHT, RERANK_MIN_RELATIVE_SCORE).rerank
+    }
+    if args.cross_encoder:
+        configurations["cross-encoder, all top-k"] = CrossEncoderReranker(args.model, RERANK_CROSS_ENCODER_PRIOR_WEIGHT, min_relative_score=0.0).rerank
+        configurations["cross-encoder"] = CrossEncoderReranker(args.model, RERANK_CROSS_ENCODER_PRIOR_WEIGHT, RERANK_MIN_RELATIVE_SCORE).rerank
+
+    encoding = tiktoken.get_encoding("cl100k_base")
+    print(f"{len(samples)} queries, top {args.k} of up to {num_candidates} candidates each")
+    for name, rank in configurations.items():
+        evaluate(name, rank, samples, args.k, encoding)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=None, help="JSONL file of labelled queries; synthetic queries if omitted")
+    parser.add_argument("--k", type=int, default=5, help="Chunks requested per query (num_chunks of the chunk retriever)")
+    parser.add_argument("--cross-encoder", action="store_true", help="Also evaluate the cross-encoder (requires sentence-transformers)")
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--synthetic-queries", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,57 @@
+DROP FUNCTION IF EXISTS get_chatroom_messages_page(UUID, INT, TIMESTAMPTZ, UUID);
+
+-- Returns up to p_limit of the newest messages sent before the given (sent_at, message_id) cursor, in chronological order.
+-- Attachments are only aggregated for the returned page.
+CREATE OR REPLACE FUNCTION get_chatroom_messages_page(
+  p_chatroom_id UUID,
+  p_limit INT,
+  p_before_sent_at TIMESTAMPTZ DEFAULT NULL,  -- Cursor of the oldest message already loaded; NULL for the newest page
+  p_before_message_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+  message_id UUID,
+  username TEXT,
+  content TEXT,
+  sent_at TIMESTAMPTZ,
+  attachments JSONB
+)
+LANGUAGE sql
+AS $$
+  SELECT
+    page.message_id,
+    u.username,
+    page.content,
+    page.sent_at,
+    COALESCE(
+      (
+        SELECT JSONB_AGG(
+          JSONB_BUILD_OBJECT(
+            'attachment_id', a.attachment_id,
+            'mime_type', a.mime_type,
+            'filename', a.filename
+          ) ORDER BY a.filename
+        )
+        FROM attachments AS a
+        WHERE a.message_id = page.message_id
+      ),
+      '[]'::JSONB
+    ) AS attachments
+  FROM (
+    SELECT
+      m.message_id,
+      m.sender_id,
+      m.content,
+      m.sent_at
+    FROM messages AS m
+    WHERE m.chatroom_id = p_chatroom_id
+      AND m.sent_at < CURRENT_TIMESTAMP
+      AND (
+        p_before_sent_at IS NULL
+        OR (m.sent_at, m.message_id) < (p_before_sent_at, p_before_message_id)
+      )
+    ORDER BY m.sent_at DESC, m.message_id DESC
+    LIMIT p_limit
+  ) AS page
+  LEFT JOIN users AS u ON page.sender_id = u.user_id
+  ORDER BY page.sent_at ASC, page.message_id ASC;
+$$;
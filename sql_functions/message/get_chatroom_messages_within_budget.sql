@@ -0,0 +1,73 @@
+-- Supersedes get_chatroom_messages_after, which only fetched by cursor without the budget
+DROP FUNCTION IF EXISTS get_chatroom_messages_after(UUID, TIMESTAMPTZ, UUID);
+DROP FUNCTION IF EXISTS get_chatroom_messages_within_budget(UUID, INT, TIMESTAMPTZ, UUID);
+DROP FUNCTION IF EXISTS get_chatroom_messages_within_budget(UUID, INT, TIMESTAMPTZ);
+
+-- Returns the newest messages of a chatroom whose combined "username: content" lines fit within p_max_chars,
+-- optionally restricted to messages sent at or after p_after_sent_at.
+-- The newest message is always returned, with its content cut to the budget if it exceeds the budget on its own.
+-- is_truncated is TRUE if older messages (since p_after_sent_at) were left out, or content was cut, to stay within
+-- the budget.
+-- sent_at is set on insert, not on commit, so callers pass a cursor with some overlap and skip messages already seen.
+CREATE OR REPLACE FUNCTION get_chatroom_messages_within_budget(
+  p_chatroom_id UUID,
+  p_max_chars INT,
+  p_after_sent_at TIMESTAMPTZ DEFAULT NULL  -- NULL to fetch from the start
+)
+RETURNS TABLE (
+  message_id UUID,
+  username TEXT,
+  content TEXT,
+  sent_at TIMESTAMPTZ,
+  is_truncated BOOLEAN
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_message RECORD;
+  v_chars INT;
+  v_used_chars INT := 0;
+  v_is_truncated BOOLEAN := FALSE;
+  v_message_ids UUID[] := '{}';
+  v_usernames TEXT[] := '{}';
+  v_contents TEXT[] := '{}';
+  v_sent_ats TIMESTAMPTZ[] := '{}';
+BEGIN
+  -- Walks messages_chatroom_id_sent_at_idx newest first and stops at the first message over the budget, so only
+  -- the returned messages (plus one) are read, however old the chatroom is
+  FOR v_message IN
+    SELECT m.message_id, u.username, m.content, m.sent_at
+    FROM messages AS m
+    LEFT JOIN users AS u ON m.sender_id = u.user_id
+    WHERE m.chatroom_id = p_chatroom_id
+      AND m.sent_at < CURRENT_TIMESTAMP
+      AND (p_after_sent_at IS NULL OR m.sent_at >= p_after_sent_at)
+    ORDER BY m.sent_at DESC, m.message_id DESC
+  LOOP
+    v_chars := COALESCE(LENGTH(v_message.username), 0) + LENGTH(v_message.content) + 3;
+
+    IF v_used_chars + v_chars > p_max_chars THEN
+      v_is_truncated := TRUE;
+      IF v_used_chars = 0 THEN
+        -- The newest message alone exceeds the budget; return its beginning rather than no history at all
+        v_message.content := LEFT(v_message.content, GREATEST(p_max_chars - COALESCE(LENGTH(v_message.username), 0) - 3, 0));
+      ELSE
+        EXIT;
+      END IF;
+    END IF;
+
+    v_used_chars := v_used_chars + v_chars;
+    v_message_ids := v_message_ids || v_message.message_id;
+    v_usernames := v_usernames || v_message.username;
+    v_contents := v_contents || v_message.content;
+    v_sent_ats := v_sent_ats || v_message.sent_at;
+
+    EXIT WHEN v_is_truncated;
+  END LOOP;
+
+  RETURN QUERY
+  SELECT t.message_id, t.username, t.content, t.sent_at, v_is_truncated
+  FROM unnest(v_message_ids, v_usernames, v_contents, v_sent_ats) AS t(message_id, username, content, sent_at)
+  ORDER BY t.sent_at ASC, t.message_id ASC;
+END;
+$$;
@@ -0,0 +1,62 @@
+DROP FUNCTION IF EXISTS get_similar_chunk_ids(UUID, VECTOR(1536), INT, INT, TEXT, INT);
+
+CREATE OR REPLACE FUNCTION get_similar_chunk_ids(
+    p_chatroom_id UUID,
+    query_embedding VECTOR(1536),
+    match_count INT DEFAULT 5,
+    ef_search INT DEFAULT 40,  -- Size of the HNSW candidate list; higher values trade latency for recall
+    quantization TEXT DEFAULT 'halfvec',  -- Index searched for candidates: 'halfvec' or 'binary'
+    rerank_factor INT DEFAULT 10  -- Candidates per result found through the compact index, reranked on full precision
+)
+RETURNS TABLE(
+    chunk_id UUID,
+    distance FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    num_candidates INT := match_count * rerank_factor;
+BEGIN
+    -- Settings only apply to the current transaction, i.e., this call
+    -- pgvector rejects ef_search values over 1000; larger candidate lists are completed by the iterative scan below
+    PERFORM set_config('hnsw.ef_search', LEAST(GREATEST(ef_search, num_candidates), 1000)::TEXT, true);
+    -- Keep scanning the index until enough chunks of the chatroom are found, instead of filtering a fixed candidate list
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+
+    IF quantization = 'binary' THEN
+        RETURN QUERY
+        WITH candidates AS MATERIALIZED (
+            SELECT c.chunk_id
+            FROM chunks AS c
+            WHERE c.chatroom_id = p_chatroom_id
+            ORDER BY binary_quantize(c.embedding)::bit(1536) <~> binary_quantize(query_embedding)::bit(1536)
+            LIMIT num_candidates
+        )
+        SELECT
+            c.chunk_id,
+            (c.embedding <=> query_embedding)::FLOAT AS distance
+        FROM candidates AS ca
+        JOIN chunks AS c ON c.chunk_id = ca.chunk_id
+        ORDER BY 2
+        LIMIT match_count;
+    ELSE
+        RETURN QUERY
+        WITH candidates AS MATERIALIZED (
+            SELECT c.chunk_id
+            FROM chunks AS c
+            WHERE c.chatroom_id = p_chatroom_id
+            ORDER BY c.embedding::halfvec(1536) <=> query_embedding::halfvec(1536)
+            LIMIT num_candidates
+        )
+        -- halfvec distances are approximate and iterative scans may return slightly out of order results, so candidates
+        -- are reranked on full precision
+        SELECT
+            c.chunk_id,
+            (c.embedding <=> query_embedding)::FLOAT AS distance
+        FROM candidates AS ca
+        JOIN chunks AS c ON c.chunk_id = ca.chunk_id
+        ORDER BY 2
+        LIMIT match_count;
+    END IF;
+END;
+$$;
@@ -1,9 +1,14 @@
 DROP FUNCTION IF EXISTS get_similar_embeddings(UUID, VECTOR(1536), INT);
+DROP FUNCTION IF EXISTS get_similar_embeddings(UUID, VECTOR(1536), INT, INT);
+DROP FUNCTION IF EXISTS get_similar_embeddings(UUID, VECTOR(1536), INT, INT, TEXT, INT);
 
 CREATE OR REPLACE FUNCTION get_similar_embeddings(
     p_chatroom_id UUID,
     query_embedding VECTOR(1536),
-    match_count INT DEFAULT 5
+    match_count INT DEFAULT 5,
+    ef_search INT DEFAULT 40,  -- See get_similar_chunk_ids
+    quantization TEXT DEFAULT 'halfvec',
+    rerank_factor INT DEFAULT 10
 )
 RETURNS TABLE(
     chunk_id UUID,
@@ -16,14 +21,13 @@ AS $$
 BEGIN
     RETURN QUERY
     SELECT
-        c.chunk_id,
+        s.chunk_id,
         d.filename,
         c.content,
-        (c.embedding <=> query_embedding) AS distance
-    FROM chunks AS c
+        s.distance
+    FROM get_similar_chunk_ids(p_chatroom_id, query_embedding, match_count, ef_search, quantization, rerank_factor) AS s
+    JOIN chunks AS c ON c.chunk_id = s.chunk_id
     JOIN documents AS d ON c.document_id = d.document_id
-    WHERE d.chatroom_id = p_chatroom_id
-    ORDER BY distance ASC       
-    LIMIT match_count;
+    ORDER BY s.distance ASC;
 END;
 $$;
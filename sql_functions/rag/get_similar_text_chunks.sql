@@ -22,7 +22,7 @@ BEGIN
         ts_rank_cd(c.content_tsv, plainto_tsquery('english', search_query))::FLOAT AS rank_score
     FROM chunks AS c
     JOIN documents AS d ON c.document_id = d.document_id
-    WHERE d.chatroom_id = p_chatroom_id
+    WHERE c.chatroom_id = p_chatroom_id
       AND c.content_tsv @@ plainto_tsquery('english', search_query)
     ORDER BY rank_score DESC
     LIMIT match_count;
@@ -1,12 +1,21 @@
 DROP FUNCTION IF EXISTS hybrid_search(UUID, VECTOR(1536), TEXT, INT);
+DROP FUNCTION IF EXISTS hybrid_search(UUID, VECTOR(1536), TEXT, INT, INT, FLOAT, FLOAT, INT);
+DROP FUNCTION IF EXISTS hybrid_search(UUID, VECTOR(1536), TEXT, INT, INT, FLOAT, FLOAT, INT, TEXT, INT);
 
 CREATE OR REPLACE FUNCTION hybrid_search(
     p_chatroom_id UUID,
     query_embedding VECTOR(1536),
     search_query TEXT,
-    match_count INT DEFAULT 5
+    match_count INT DEFAULT 5,
+    rrf_k INT DEFAULT 60,  -- Smoothing constant of reciprocal rank fusion; higher values flatten the rank differences
+    vector_weight FLOAT DEFAULT 1.0,
+    text_weight FLOAT DEFAULT 1.0,
+    ef_search INT DEFAULT 40,  -- See get_similar_chunk_ids
+    quantization TEXT DEFAULT 'halfvec',
+    rerank_factor INT DEFAULT 10
 )
 RETURNS TABLE(
+    chunk_id UUID,
     filename TEXT,
     content TEXT,
     rrf_score FLOAT
@@ -15,41 +24,51 @@ LANGUAGE plpgsql
 AS $$
 BEGIN
     RETURN QUERY
-    -- Get similar chunks using vector search (cosine distance)
+    -- Both searches only rank chunk IDs; content and filenames are fetched for the final results only
     WITH vector_results AS (
         SELECT
-            v.chunk_id,
-            v.filename,
-            v.content,
-            ROW_NUMBER() OVER (ORDER BY v.distance ASC) AS rank
-        FROM get_similar_embeddings(p_chatroom_id, query_embedding, match_count * 3) v
+            s.chunk_id,
+            ROW_NUMBER() OVER (ORDER BY s.distance ASC) AS rank
+        FROM get_similar_chunk_ids(p_chatroom_id, query_embedding, match_count * 3, ef_search, quantization, rerank_factor) AS s
     ),
-    -- Get similar chunks using full-text search (string matching)
     text_results AS (
         SELECT
-            t.chunk_id,
-            t.filename,
-            t.content,
-            ROW_NUMBER() OVER (ORDER BY t.rank_score DESC) AS rank
-        FROM get_similar_text_chunks(p_chatroom_id, search_query, match_count * 3) t
+            c.chunk_id,
+            ROW_NUMBER() OVER (ORDER BY ts_rank_cd(c.content_tsv, plainto_tsquery('english', search_query)) DESC) AS rank
+        FROM chunks AS c
+        WHERE c.chatroom_id = p_chatroom_id
+          AND c.content_tsv @@ plainto_tsquery('english', search_query)
+        ORDER BY rank
+        LIMIT match_count * 3
     ),
-    -- Combine results from both searches using reciprocal rank fusion (RRF)
-    rrf_combined AS (
+    -- Combine results from both searches using weighted reciprocal rank fusion (RRF)
+    rrf_scores AS (
         SELECT
             COALESCE(v.chunk_id, t.chunk_id) AS chunk_id,
-            COALESCE(v.filename, t.filename) AS filename,
-            COALESCE(v.content, t.content) AS content,
-            (COALESCE(1.0 / (60 + v.rank), 0) + COALESCE(1.0 / (60 + t.rank), 0))::FLOAT AS rrf_score
-        FROM vector_results v
-        FULL OUTER JOIN text_results t ON v.chunk_id = t.chunk_id
+            (
+                COALESCE(vector_weight / (rrf_k + v.rank), 0)
+                + COALESCE(text_weight / (rrf_k + t.rank), 0)
+            )::FLOAT AS score
+        FROM vector_results AS v
+        FULL OUTER JOIN text_results AS t ON v.chunk_id = t.chunk_id
+    ),
+    rrf_combined AS (
+        SELECT
+            rs.chunk_id,
+            rs.score
+        FROM rrf_scores AS rs
+        WHERE rs.score > 0
+        ORDER BY rs.score DESC
+        LIMIT match_count
     )
-    SELECT 
-        rc.filename,
-        rc.content,
-        rc.rrf_score
+    SELECT
+        rc.chunk_id,
+        d.filename,
+        c.content,
+        rc.score
     FROM rrf_combined AS rc
-    WHERE rc.rrf_score > 0
-    ORDER BY rc.rrf_score DESC
-    LIMIT match_count;
+    JOIN chunks AS c ON c.chunk_id = rc.chunk_id
+    JOIN documents AS d ON d.document_id = c.document_id
+    ORDER BY rc.score DESC;
 END;
 $$;
@@ -0,0 +1,10 @@
+-- Rolling per-chatroom summaries of older chat history, maintained by HistorySummarizer
+CREATE TABLE IF NOT EXISTS chatroom_summaries (
+  chatroom_id UUID PRIMARY KEY REFERENCES chatrooms(chatroom_id) ON DELETE CASCADE,
+  summary TEXT NOT NULL,
+  summarized_until TIMESTAMPTZ NOT NULL,  -- sent_at of the newest message covered by the summary
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Only accessed by the backend with the service role key
+ALTER TABLE chatroom_summaries ENABLE ROW LEVEL SECURITY;
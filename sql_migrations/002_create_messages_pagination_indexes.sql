@@ -0,0 +1,8 @@
+-- Supports keyset pagination and history windows over a chatroom's messages, newest first
+-- (get_chatroom_messages_page, get_chatroom_messages_within_budget)
+CREATE INDEX IF NOT EXISTS messages_chatroom_id_sent_at_idx
+  ON messages (chatroom_id, sent_at DESC, message_id DESC);
+
+-- Supports aggregating the attachments of a page of messages
+CREATE INDEX IF NOT EXISTS attachments_message_id_idx
+  ON attachments (message_id);
@@ -0,0 +1,41 @@
+-- Denormalizes the chatroom of each chunk, so that vector and full-text searches filter chunks without joining documents
+ALTER TABLE chunks
+  ADD COLUMN IF NOT EXISTS chatroom_id UUID REFERENCES chatrooms(chatroom_id) ON DELETE CASCADE;
+
+UPDATE chunks AS c
+SET chatroom_id = d.chatroom_id
+FROM documents AS d
+WHERE c.document_id = d.document_id
+  AND c.chatroom_id IS NULL;
+
+-- Fills in the chatroom of chunks inserted without one, so that the column is always consistent with documents
+CREATE OR REPLACE FUNCTION set_chunk_chatroom_id()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF NEW.chatroom_id IS NULL THEN
+    SELECT d.chatroom_id INTO NEW.chatroom_id
+    FROM documents AS d
+    WHERE d.document_id = NEW.document_id;
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS chunks_set_chatroom_id ON chunks;
+CREATE TRIGGER chunks_set_chatroom_id
+  BEFORE INSERT ON chunks
+  FOR EACH ROW EXECUTE FUNCTION set_chunk_chatroom_id();
+
+ALTER TABLE chunks ALTER COLUMN chatroom_id SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS chunks_chatroom_id_idx
+  ON chunks (chatroom_id);
+
+-- Approximate nearest neighbour index for cosine distance (get_similar_embeddings).
+-- Filtered searches rely on iterative index scans, which require pgvector 0.8.0 or later.
+-- Building the index over many chunks may need a higher maintenance_work_mem, e.g., SET maintenance_work_mem = '2GB'.
+CREATE INDEX IF NOT EXISTS chunks_embedding_hnsw_idx
+  ON chunks USING hnsw (embedding vector_cosine_ops)
+  WITH (m = 16, ef_construction = 64);
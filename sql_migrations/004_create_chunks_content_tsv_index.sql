@@ -0,0 +1,3 @@
+-- Supports the full-text branch of hybrid_search, combined with chunks_chatroom_id_idx through a bitmap AND
+CREATE INDEX IF NOT EXISTS chunks_content_tsv_idx
+  ON chunks USING gin (content_tsv);
@@ -0,0 +1,17 @@
+-- Compact approximate nearest neighbour index over chunks.embedding (get_similar_chunk_ids). The column keeps full
+-- precision, so that candidates found through the compact index are reranked on exact cosine distance.
+-- Only the index selected by HYBRID_SEARCH_QUANTIZATION is created, so that chunk inserts maintain a single index:
+--   halfvec (default): half the size of the float32 index, with negligible recall loss
+--   binary:            1/32 of the size, relying on reranking more candidates (HYBRID_SEARCH_RERANK_FACTOR)
+DROP INDEX IF EXISTS chunks_embedding_hnsw_idx;
+DROP INDEX IF EXISTS chunks_embedding_binary_hnsw_idx;
+
+CREATE INDEX IF NOT EXISTS chunks_embedding_halfvec_hnsw_idx
+  ON chunks USING hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops)
+  WITH (m = 16, ef_construction = 64);
+
+-- With HYBRID_SEARCH_QUANTIZATION = "binary", replace the index above with:
+-- DROP INDEX IF EXISTS chunks_embedding_halfvec_hnsw_idx;
+-- CREATE INDEX IF NOT EXISTS chunks_embedding_binary_hnsw_idx
+--   ON chunks USING hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops)
+--   WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,37 @@
+-- Version of each chatroom's knowledge base, bumped by every change to its chunks. Retrieval results are cached per
+-- version (app/retrieval/cache.py), so that all workers stop serving cached results once a change is committed.
+ALTER TABLE chatrooms
+  ADD COLUMN IF NOT EXISTS knowledge_base_version BIGINT NOT NULL DEFAULT 0;
+
+-- Statement-level, so that inserting all chunks of a document bumps the version once
+CREATE OR REPLACE FUNCTION bump_knowledge_base_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  UPDATE chatrooms
+  SET knowledge_base_version = knowledge_base_version + 1
+  WHERE chatroom_id IN (SELECT DISTINCT chatroom_id FROM changed_chunks);
+  RETURN NULL;
+END;
+$$;
+
+-- Transition tables are only allowed on triggers with a single event
+DROP TRIGGER IF EXISTS chunks_insert_bump_knowledge_base_version ON chunks;
+CREATE TRIGGER chunks_insert_bump_knowledge_base_version
+  AFTER INSERT ON chunks
+  REFERENCING NEW TABLE AS changed_chunks
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_knowledge_base_version();
+
+DROP TRIGGER IF EXISTS chunks_update_bump_knowledge_base_version ON chunks;
+CREATE TRIGGER chunks_update_bump_knowledge_base_version
+  AFTER UPDATE ON chunks
+  REFERENCING NEW TABLE AS changed_chunks
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_knowledge_base_version();
+
+-- Also fires for chunks deleted by cascade with their document
+DROP TRIGGER IF EXISTS chunks_delete_bump_knowledge_base_version ON chunks;
+CREATE TRIGGER chunks_delete_bump_knowledge_base_version
+  AFTER DELETE ON chunks
+  REFERENCING OLD TABLE AS changed_chunks
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_knowledge_base_version();
@@ -0,0 +1,162 @@
+import math
+from typing import List, Tuple
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from app.retrieval import BM25Index, LocalChunkIndex, reciprocal_rank_fusion
+from app.retrieval.local_index import tokenize
+from app.retrieval.stemmer import stem
+
+TEXTS = [
+    "The runners were running quickly",
+    "A quick guide to running shoes",
+    "Cooking pasta at home",
+    "Shoes for trail runs and hiking"
+]
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("running", "run"),
+    ("runners", "runner"),
+    ("quickly", "quick"),
+    ("happiness", "happi"),
+    ("relational", "relat"),
+    ("generously", "generous"),
+    ("agreed", "agre"),
+    ("hopping", "hop"),
+    ("filing", "file"),
+    ("cries", "cri"),
+    ("ties", "tie"),
+    ("gas", "gas"),
+    ("skies", "sky"),
+    ("proceed", "proceed")
+])
+def test_stem_matches_snowball_english(word, expected):
+    assert stem(word) == expected
+
+
+def test_tokenize_stems_and_drops_stopwords():
+    assert tokenize("The runners were running quickly") == ["runner", "run", "quick"]
+
+
+def test_bm25_matches_inflected_forms():
+    assert BM25Index(["The runners were running quickly"]).search("run", 10) == [0]
+
+    index = BM25Index(TEXTS)
+    assert index.search("running shoes", 10) == [1, 3]
+    assert index.search("run", 10) == [0, 1, 3]
+    assert index.search("pasta", 10) == [2]
+    assert index.search("flying", 10) == []  # All query terms must match, like plainto_tsquery
+
+
+def test_reciprocal_rank_fusion():
+    scores = reciprocal_rank_fusion([([2, 0, 1], 1.0), ([1, 2], 0.5)], rrf_k=60)
+
+    assert scores == pytest.approx({
+        2: 1 / 61 + 0.5 / 62,
+        0: 1 / 62,
+        1: 1 / 63 + 0.5 / 61
+    })
+
+
+def test_local_index_search_fuses_vector_and_text_rankings(tmp_path):
+    index = LocalChunkIndex(tmp_path, supabase=mock.Mock(), max_loaded_chatrooms=4)
+    embeddings = np.eye(4, dtype=np.float32).tolist()
+    index.add_document("chatroom", "document-1", "a.pdf", ["c0", "c1"], TEXTS[:2], embeddings[:2])
+    index.add_document("chatroom", "document-2", "b.pdf", ["c2", "c3"], TEXTS[2:], embeddings[2:])
+    (tmp_path / "chatroom" / LocalChunkIndex.SYNCED_MARKER).touch()
+
+    # Vector ranking: c2, c3, c1, c0; text ranking: c1, c3
+    results = index.search(
+        "chatroom",
+        np.array([0.1, 0.2, 0.9, 0.3], dtype=np.float32),
+        "running shoes",
+        match_count=3,
+        rrf_k=60,
+        vector_weight=1.0,
+        text_weight=1.0
+    )
+
+    assert [(chunk["chunk_id"], chunk["filename"]) for chunk in results] == [("c1", "a.pdf"), ("c3", "b.pdf"), ("c2", "b.pdf")]
+    assert [chunk["rrf_score"] for chunk in results] == pytest.approx([1 / 63 + 1 / 61, 1 / 62 + 1 / 62, 1 / 61])
+
+
+def hybrid_search_reference(
+    embeddings: np.ndarray,
+    text_order: List[int],
+    query_embedding: np.ndarray,
+    match_count: int,
+    rrf_k: int,
+    vector_weight: float,
+    text_weight: float
+) -> List[Tuple[int, float]]:
+    """
+    Python transcription of hybrid_search's fusion (sql_functions/rag/hybrid_search.sql), returning (row, score) pairs.
+
+    `text_order` lists the rows matching all query terms, best first, standing in for the ts_rank_cd order. Ties in
+    the fused score, which hybrid_search leaves unordered, are ordered by vector rank, then text rank.
+    """
+    distances = 1 - embeddings @ query_embedding / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query_embedding))
+    vector_ranks = {int(row): rank for rank, row in enumerate(np.argsort(distances, kind="stable")[:match_count * 3], start=1)}
+    text_ranks = {row: rank for rank, row in enumerate(text_order[:match_count * 3], start=1)}
+
+    scores = {
+        row: (vector_weight / (rrf_k + vector_ranks[row]) if row in vector_ranks else 0)
+        + (text_weight / (rrf_k + text_ranks[row]) if row in text_ranks else 0)
+        for row in vector_ranks.keys() | text_ranks.keys()
+    }
+    rows = sorted(
+        (row for row, score in scores.items() if score > 0),
+        key=lambda row: (-scores[row], vector_ranks.get(row, math.inf), text_ranks.get(row, math.inf))
+    )
+    return [(row, scores[row]) for row in rows[:match_count]]
+
+
+@pytest.fixture(scope="module")
+def parity_fixture(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    vocabulary = ["index", "vector", "search", "query", "chunk", "document", "ranking", "fusion", "score", "embedding"]
+    texts = [" ".join(rng.choice(vocabulary, size=6)) for _ in range(45)]
+    embeddings = rng.normal(size=(len(texts), 16)).astype(np.float32)
+
+    root = tmp_path_factory.mktemp("local_index")
+    index = LocalChunkIndex(root, supabase=mock.Mock(), max_loaded_chatrooms=4)
+    for document, start in enumerate(range(0, len(texts), 15)):
+        rows = range(start, start + 15)
+        index.add_document(
+            "chatroom",
+            f"document-{document}",
+            f"document-{document}.pdf",
+            [f"chunk-{row}" for row in rows],
+            [texts[row] for row in rows],
+            embeddings[start:start + 15].tolist()
+        )
+    (root / "chatroom" / LocalChunkIndex.SYNCED_MARKER).touch()
+    return index, texts, embeddings, rng.normal(size=16).astype(np.float32)
+
+
+@pytest.mark.parametrize("query", ["vector search", "ranking", "fusion score query", "unmatched terms"])
+@pytest.mark.parametrize("match_count", [1, 4, 20])
+# Equal weights give vector-only and text-only rows of the same rank equal scores; a zero weight leaves rows at score 0
+@pytest.mark.parametrize("rrf_k, vector_weight, text_weight", [(60, 1.0, 1.0), (1, 0.7, 0.3), (60, 1.0, 0.0), (60, 0.0, 1.0)])
+def test_local_index_search_matches_hybrid_search(parity_fixture, query, match_count, rrf_k, vector_weight, text_weight):
+    index, texts, embeddings, query_embedding = parity_fixture
+    # Rows matching all query terms, in BM25 order, like the text branch of hybrid_search in ts_rank_cd order
+    text_order = BM25Index(texts).search(query, len(texts))
+
+    expected = hybrid_search_reference(embeddings, text_order, query_embedding, match_count, rrf_k, vector_weight, text_weight)
+    results = index.search(
+        "chatroom",
+        query_embedding,
+        query,
+        match_count=match_count,
+        rrf_k=rrf_k,
+        vector_weight=vector_weight,
+        text_weight=text_weight
+    )
+
+    assert [chunk["chunk_id"] for chunk in results] == [f"chunk-{row}" for row, _ in expected]
+    assert [chunk["rrf_score"] for chunk in results] == pytest.approx([score for _, score in expected])
+    assert [chunk["filename"] for chunk in results] == [f"document-{row // 15}.pdf" for row, _ in expected]